@@ -2,7 +2,7 @@
 Pydantic models for the Sentinel API, generated from the OpenAPI spec.
 These models are used for request and response validation.
 """
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field, UUID4, RootModel
 from enum import Enum
@@ -44,6 +44,11 @@ class ParentType(str, Enum):
     PORTFOLIO = "PORTFOLIO"
     HOLDING = "HOLDING"
 
+class RuleSetSource(str, Enum):
+    """ Reference: product_spec.md#632-r_2000-effective-rule-set-retrieval """
+    SPECIFIC = "SPECIFIC"
+    INHERITED = "INHERITED"
+
 class RuleType(str, Enum):
     """ Reference: product_spec.md#621-stored-data-models """
     BUY = "BUY"
@@ -77,6 +82,12 @@ class NotificationStatus(str, Enum):
     SENT = "SENT"
     FAILED = "FAILED"
 
+class DeletionJobStatus(str, Enum):
+    """ Reference: product_spec.md#3341-p_4000-portfolio-deletion-entire-portfolio """
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
 class AnnotatedTransactionAction(str, Enum):
     """ Reference: product_spec.md#335-p_5000-unified-transaction-import """
     CREATE = "CREATE"
@@ -162,6 +173,15 @@ class PortfolioSummary(BaseModel):
     name: str
     currentValue: float
 
+class PortfolioDeletionProgress(BaseModel):
+    """ Reference: product_spec.md#3341-p_4000-portfolio-deletion-entire-portfolio """
+    portfolioId: UUID4
+    status: DeletionJobStatus
+    deletedCounts: Dict[str, int]
+    failedCount: int
+    startedAt: datetime
+    modifiedAt: datetime
+
 class PortfolioUpdateRequest(BaseModel):
     """ Reference: product_spec.md#3331-p_3000-portfolio-update-manual """
     name: str = Field(..., min_length=1, max_length=127)
@@ -338,6 +358,11 @@ class RuleSetUpdateRequest(BaseModel):
     """ Reference: product_spec.md#633-r_3000-rule-set-update """
     rules: List[Rule]
 
+class EffectiveRuleSet(BaseModel):
+    """ Reference: product_spec.md#632-r_2000-effective-rule-set-retrieval """
+    source: Optional[RuleSetSource] = None
+    ruleSet: Optional[RuleSet] = None
+
 # #############################################################################
 # ALERT MODELS
 # #############################################################################
@@ -379,3 +404,26 @@ class AlertUpdateRequest(BaseModel):
     """ Reference: product_spec.md#743-a_3000-mark-alerts-as-read """
     alertId: UUID4
     isRead: bool = True
+
+# #############################################################################
+# MONITORING MODELS
+# #############################################################################
+
+class MonitoringStageTiming(BaseModel):
+    """ Reference: product_spec.md#711-backend-business-process-alert-generation """
+    batches: int
+    busySeconds: float
+    finishedAfterSeconds: float
+
+class MonitoringRun(BaseModel):
+    """ Reference: product_spec.md#731-m_1000-daily-data-synchronization-and-calculation """
+    day: date
+    tickers: int
+    holdings: int
+    failedTickers: List[str]
+    holdingSnapshots: int
+    portfolioSnapshots: int
+    snapshotFailures: int
+    alerts: int
+    stages: Dict[str, MonitoringStageTiming]
+    elapsedSeconds: float
@@ -0,0 +1,63 @@
+"""
+A compact probabilistic set for fast negative lookups.
+"""
+import hashlib
+import math
+import threading
+
+class BloomFilter:
+    """
+    A Bloom filter sized for `capacity` items at the given false-positive rate.
+
+    `key in bloom` is never False for a key that was added, but may be True
+    for a key that was not. Once more than `capacity` keys have been added,
+    the filter rotates: the current generation becomes the previous one and a
+    fresh generation is started, so memory stays bounded and keys from two
+    generations ago are forgotten. Callers must therefore treat a negative
+    answer as "probably new", never as proof.
+    """
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity = capacity
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str):
+        # Kirsch-Mitzenmacher: derive k positions from two 64-bit hashes.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    @staticmethod
+    def _test(bits: bytearray, positions) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add(self, key: str) -> None:
+        positions = self._positions(key)
+        with self._lock:
+            if self._count >= self.capacity:
+                self._previous = self._current
+                self._current = bytearray(len(self._previous))
+                self._count = 0
+            for p in positions:
+                self._current[p >> 3] |= 1 << (p & 7)
+            self._count += 1
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        with self._lock:
+            return self._test(self._current, positions) or self._test(self._previous, positions)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._current = bytearray(len(self._current))
+            self._previous = bytearray(len(self._current))
+            self._count = 0
@@ -0,0 +1,97 @@
+"""
+Small in-process caches shared by the API layer.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+@dataclass
+class CacheStats:
+    """A point-in-time view of a cache's counters."""
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire individually.
+
+    Every entry carries an absolute expiry (seconds since the epoch). Expired
+    entries are treated as misses and dropped on access; when the cache is full
+    the least recently used entry is evicted.
+    """
+    def __init__(self, maxsize: int, ttl_seconds: float, clock: Callable[[], float] = time.time):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value for `key`, or `default` if it is absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        """
+        Stores `value` under `key`.
+
+        The entry expires at `expires_at` if given, but never later than the
+        cache's own TTL.
+        """
+        now = self._clock()
+        max_expiry = now + self.ttl_seconds
+        expiry = max_expiry if expires_at is None else min(expires_at, max_expiry)
+        if expiry <= now:
+            return
+        with self._lock:
+            self._entries[key] = (expiry, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Removes `key` from the cache if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes all entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                size=len(self._entries),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
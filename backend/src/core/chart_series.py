@@ -0,0 +1,191 @@
+"""
+Precomputed, downsampled chart series of portfolios and holdings.
+
+A chart reading every `dailySnapshots` document of its range would pull
+thousands of documents for 'all'. The snapshot job therefore also keeps, per
+portfolio and holding, the last snapshot of each day, week and month in one
+document, `/{collection}/{itemId}/chartSeries/series`, as packed
+little-endian columns (see price_history.py). Each resolution keeps a
+bounded number of points, so any range is one read of one field of that
+document, and its point count is bounded too:
+
+    1m, 3m        daily   (at most CHART_RESOLUTIONS['daily'] points)
+    6m, 1y, 5y    weekly
+    all           monthly
+
+A snapshot value is a level, not a flow, so a week's or month's point is
+simply its last snapshot.
+Reference: product_spec.md#3323-p_2400-portfolio-chart-data-retrieval
+"""
+import asyncio
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .valuation import Valuation
+
+# Bumped whenever the stored layout changes; series of another version are rebuilt.
+CHART_SERIES_VERSION = 1
+# (column, dtype); dates are days since the Unix epoch.
+CHART_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("date", "<i8"),
+    ("totalCost", "<f8"),
+    ("currentValue", "<f8"),
+    ("capitalGainTax", "<f8"),
+)
+# Resolution -> most points kept. Daily covers 3 months of trading days,
+# weekly a little over 5 years and monthly a century.
+CHART_RESOLUTIONS: Dict[str, int] = {"daily": 100, "weekly": 270, "monthly": 1200}
+# Range -> (resolution, calendar days shown before the latest point; None for all).
+CHART_RANGES: Dict[str, Tuple[str, Optional[int]]] = {
+    "1m": ("daily", 31),
+    "3m": ("daily", 92),
+    "6m": ("weekly", 183),
+    "1y": ("weekly", 366),
+    "5y": ("weekly", 1827),
+    "all": ("monthly", None),
+}
+# Snapshot fields read to rebuild a series.
+_SNAPSHOT_FIELDS = ["date", "totalCost", "currentValue", "preTaxGainLoss", "afterTaxGainLoss"]
+
+def _epoch_day(day: date) -> int:
+    return int(np.datetime64(day, "D").astype(np.int64))
+
+def _periods(resolution: str, days: np.ndarray) -> np.ndarray:
+    """The period (day, Monday-based week or month) of each epoch day."""
+    if resolution == "daily":
+        return days
+    if resolution == "weekly":
+        # Day 0 (1970-01-01) was a Thursday.
+        return (days + 3) // 7
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+def _empty() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in CHART_COLUMNS}
+
+class ChartSeries:
+    """
+    The chart points of one portfolio or holding at every resolution, oldest
+    first. `stored` tells whether the item already has a series document.
+    """
+    def __init__(self, resolutions: Optional[Dict[str, Dict[str, np.ndarray]]] = None, stored: bool = False):
+        self.resolutions = resolutions or {resolution: _empty() for resolution in CHART_RESOLUTIONS}
+        self.stored = stored
+
+    @classmethod
+    def from_daily(cls, columns: Dict[str, np.ndarray]) -> "ChartSeries":
+        """Downsamples daily points (CHART_COLUMNS arrays, in any order) to every resolution."""
+        order = np.argsort(columns["date"], kind="stable")
+        daily = {name: np.asarray(columns[name], dtype=dtype)[order] for name, dtype in CHART_COLUMNS}
+        resolutions = {}
+        for resolution, max_points in CHART_RESOLUTIONS.items():
+            periods = _periods(resolution, daily["date"])
+            last_of_period = np.append(periods[1:] != periods[:-1], True) if len(periods) else periods.astype(bool)
+            resolutions[resolution] = {name: values[last_of_period][-max_points:] for name, values in daily.items()}
+        return cls(resolutions)
+
+    def add(self, day: date, valuation: Valuation):
+        """Adds the snapshot of `day`, replacing the point of the same period; older days are ignored."""
+        point = {"date": _epoch_day(day), "totalCost": valuation.totalCost, "currentValue": valuation.currentValue, "capitalGainTax": valuation.capitalGainTax}
+        for resolution, max_points in CHART_RESOLUTIONS.items():
+            columns = self.resolutions[resolution]
+            keep = len(columns["date"])
+            if keep:
+                last_day = int(columns["date"][-1])
+                if point["date"] < last_day:
+                    continue
+                if _periods(resolution, np.array([last_day]))[0] == _periods(resolution, np.array([point["date"]]))[0]:
+                    keep -= 1
+            self.resolutions[resolution] = {
+                name: np.append(columns[name][:keep], np.array([point[name]], dtype=dtype))[-max_points:]
+                for name, dtype in CHART_COLUMNS
+            }
+
+    def points(self, chart_range: str) -> List[Tuple[date, Valuation]]:
+        """The points of a range of CHART_RANGES, up to the latest point."""
+        resolution, days = CHART_RANGES[chart_range]
+        columns = self.resolutions[resolution]
+        start = 0
+        if days is not None and len(columns["date"]):
+            start = int(np.searchsorted(columns["date"], columns["date"][-1] - days))
+        dates = columns["date"][start:].astype("datetime64[D]").astype(date)
+        return [
+            (day, Valuation(float(cost), float(value), float(tax)))
+            for day, cost, value, tax in zip(dates, columns["totalCost"][start:], columns["currentValue"][start:], columns["capitalGainTax"][start:])
+        ]
+
+    def to_document(self) -> dict:
+        document = {"version": CHART_SERIES_VERSION}
+        for resolution, columns in self.resolutions.items():
+            document[resolution] = {name: np.ascontiguousarray(columns[name], dtype=dtype).tobytes() for name, dtype in CHART_COLUMNS}
+        return document
+
+    @classmethod
+    def from_document(cls, document: dict) -> Optional["ChartSeries"]:
+        """The series of a stored document (possibly read with only some resolutions), or None if it is outdated."""
+        if document.get("version") != CHART_SERIES_VERSION:
+            return None
+        return cls({
+            resolution: {name: np.frombuffer(document[resolution][name], dtype=dtype) for name, dtype in CHART_COLUMNS}
+            if resolution in document else _empty()
+            for resolution in CHART_RESOLUTIONS
+        }, stored=True)
+
+def chart_series_ref(db_client, collection: str, item_id: str):
+    return db_client.collection(collection).document(item_id).collection("chartSeries").document("series")
+
+class ChartSeriesStore:
+    """
+    Reads the chart series of portfolios ('portfolios') and holdings ('holdings').
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+    """
+    def __init__(self, db_client):
+        self.db = db_client
+
+    async def load(self, collection: str, item_id: str, chart_range: str) -> ChartSeries:
+        """Loads only the resolution `chart_range` is drawn from; a missing series is empty."""
+        resolution, _ = CHART_RANGES[chart_range]
+        doc = await chart_series_ref(self.db, collection, item_id).get(field_paths=["version", resolution])
+        series = ChartSeries.from_document(doc.to_dict()) if doc.exists else None
+        return series or ChartSeries()
+
+    async def load_many(self, collection: str, item_ids: Iterable[str]) -> Dict[str, ChartSeries]:
+        """
+        Loads the series of many items in one batched read. Items without a
+        usable series (the first run after they got snapshots, or a layout
+        change) get one rebuilt from their daily snapshots.
+        """
+        item_ids = list(dict.fromkeys(item_ids))
+        if not item_ids:
+            return {}
+        refs = [chart_series_ref(self.db, collection, item_id) for item_id in item_ids]
+        # Paths are '{collection}/{itemId}/chartSeries/series'.
+        owners = {ref.path: item_id for ref, item_id in zip(refs, item_ids)}
+        series: Dict[str, ChartSeries] = {}
+        outdated = set()
+        async for doc in self.db.get_all(refs):
+            if doc.exists:
+                stored = ChartSeries.from_document(doc.to_dict())
+                if stored is not None:
+                    series[owners[doc.reference.path]] = stored
+                else:
+                    outdated.add(owners[doc.reference.path])
+        missing = [item_id for item_id in item_ids if item_id not in series]
+        rebuilt = await asyncio.gather(*[self._rebuild(collection, item_id) for item_id in missing])
+        for item_id, item_series in zip(missing, rebuilt):
+            item_series.stored = item_id in outdated
+            series[item_id] = item_series
+        return series
+
+    async def _rebuild(self, collection: str, item_id: str) -> ChartSeries:
+        query = self.db.collection(collection).document(item_id).collection("dailySnapshots").select(_SNAPSHOT_FIELDS)
+        snapshots = [doc.to_dict() async for doc in query.stream()]
+        if not snapshots:
+            return ChartSeries()
+        return ChartSeries.from_daily({
+            "date": np.array([_epoch_day(snapshot["date"].date()) for snapshot in snapshots], dtype=np.int64),
+            "totalCost": np.array([snapshot["totalCost"] for snapshot in snapshots]),
+            "currentValue": np.array([snapshot["currentValue"] for snapshot in snapshots]),
+            "capitalGainTax": np.array([snapshot["preTaxGainLoss"] - snapshot["afterTaxGainLoss"] for snapshot in snapshots]),
+        })
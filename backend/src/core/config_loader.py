@@ -0,0 +1,28 @@
+"""
+Loads the YAML configuration files in `backend/config`.
+
+Each file is read and validated once per process; the models are defined in
+config_models.py.
+"""
+from functools import lru_cache
+from pathlib import Path
+
+import yaml
+
+from .config_models import MarketMonitorConfig, TaxConfig
+
+CONFIG_DIR = Path(__file__).parent.parent.parent / "config"
+
+def _load_yaml(file_name: str) -> dict:
+    with open(CONFIG_DIR / file_name, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+@lru_cache(maxsize=None)
+def get_tax_config() -> TaxConfig:
+    """The tax rules per asset class from `tax_config.yaml`."""
+    return TaxConfig(**_load_yaml("tax_config.yaml"))
+
+@lru_cache(maxsize=None)
+def get_market_monitor_config() -> MarketMonitorConfig:
+    """The monitoring settings from `market_monitor_config.yaml`."""
+    return MarketMonitorConfig(**_load_yaml("market_monitor_config.yaml"))
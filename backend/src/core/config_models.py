@@ -1,10 +1,17 @@
 """
 Pydantic models for loading and validating configuration files.
 """
+import operator
+import re
 from typing import List, Optional, Dict
+import numpy as np
 from pydantic import BaseModel, Field
 from src.api.models import AssetClass
 
+# Tax rule conditions have the form "<variable> <comparison> <number>".
+_CONDITION_PATTERN = re.compile(r"^\s*(\w+)\s*(>=|<=|>|<|==)\s*(-?\d+(?:\.\d+)?)\s*$")
+_COMPARISONS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq}
+
 class TaxRule(BaseModel):
     """
     Defines a single tax rule for an asset class.
@@ -14,6 +21,19 @@ class TaxRule(BaseModel):
     taxRate: float = Field(..., ge=0, le=100)
     condition: Optional[str] = None
 
+    def applies(self, **variables: float) -> bool:
+        """
+        Whether the rule's condition holds for the given variables
+        (e.g. `holdingDurationDays`). Rules without a condition always apply.
+        """
+        if self.condition is None:
+            return True
+        match = _CONDITION_PATTERN.match(self.condition)
+        if match is None or match.group(1) not in variables:
+            raise ValueError(f"Unsupported tax rule condition: {self.condition!r}")
+        name, comparison, bound = match.groups()
+        return _COMPARISONS[comparison](variables[name], float(bound))
+
 class TaxConfig(BaseModel):
     """
     Represents the structure of the tax_config.yaml file.
@@ -22,6 +42,32 @@ class TaxConfig(BaseModel):
     CRYPTO: List[TaxRule]
     COMMODITY: List[TaxRule]
 
+    def tax_rate(self, asset_class: AssetClass, holding_duration_days: int) -> float:
+        """
+        The rate (in percent) of the first rule of the asset class whose
+        condition holds. Asset classes without rules are not taxed.
+        """
+        for rule in getattr(self, AssetClass(asset_class).value, []):
+            if rule.applies(holdingDurationDays=holding_duration_days):
+                return rule.taxRate
+        return 0.0
+
+    def tax_rates(self, asset_classes: np.ndarray, holding_duration_days: np.ndarray) -> np.ndarray:
+        """
+        `tax_rate` for arrays of asset classes and holding durations (one
+        entry per lot), evaluating each rule once for all lots.
+        """
+        rates = np.zeros(len(holding_duration_days), dtype=np.float64)
+        for asset_class in AssetClass:
+            pending = asset_classes == asset_class.value
+            for rule in getattr(self, asset_class.value, []):
+                if not pending.any():
+                    break
+                applies = pending & rule.applies(holdingDurationDays=holding_duration_days)
+                rates[applies] = rule.taxRate
+                pending &= ~applies
+        return rates
+
 class MarketMonitorConfig(BaseModel):
     """
     Represents the structure of the market_monitor_config.yaml file.
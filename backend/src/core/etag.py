@@ -0,0 +1,47 @@
+"""
+Conditional GETs for the read endpoints the frontend polls on every navigation.
+
+An endpoint derives a weak ETag from what versions its response (the
+document's `modifiedAt`, or the aggregate's own version) as soon as it has
+read it. If the request's `If-None-Match` already names that ETag, it
+answers 304 right away, skipping the mapping to API models, their
+validation and serialization, and the body. Otherwise the ETag and
+`Cache-Control` go out with the 200.
+
+The tags are weak: two responses with the same tag carry the same data, but
+not necessarily the same bytes.
+"""
+import hashlib
+
+from fastapi import Request, Response, status
+
+# Responses are per user and must be revalidated on every use, which is
+# cheap thanks to the ETag.
+CACHE_CONTROL = "private, no-cache"
+
+def weak_etag(*parts) -> str:
+    """A weak ETag identifying a response by the values that version it."""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def _opaque(tag: str) -> str:
+    # Weak comparison (RFC 9110, section 8.8.3.2) ignores the W/ prefix.
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match names `etag` (or is '*')."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def set_etag(response: Response, etag: str):
+    """Adds the validator headers to a 200 response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
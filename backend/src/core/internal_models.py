@@ -20,7 +20,8 @@ from src.api.models import (
     ConditionType,
     RuleStatus,
     NotificationStatus,
-    NotificationChannel
+    NotificationChannel,
+    DeletionJobStatus
 )
 
 class CurrentUser(BaseModel):
@@ -56,6 +57,13 @@ class CashReserveDB(BaseModel):
     totalAmount: float
     warChestAmount: float
 
+class PortfolioValuationDB(BaseModel):
+    """ The valuation of a portfolio's holdings, kept in the portfolio document for the portfolio list. """
+    """ Reference: product_spec.md#321-primary-stored-models """
+    costBasis: float = 0.0
+    lastValuation: float = 0.0
+    lastPriceDate: Optional[datetime] = None
+
 class PortfolioDB(BaseModel):
     """ Represents a portfolio document in the 'portfolios' collection. """
     """ Reference: product_spec.md#321-primary-stored-models """
@@ -66,9 +74,19 @@ class PortfolioDB(BaseModel):
     defaultCurrency: Currency
     cashReserve: CashReserveDB
     ruleSetId: Optional[UUID] = None # Changed to UUID
+    valuation: PortfolioValuationDB = Field(default_factory=PortfolioValuationDB)
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     modifiedAt: datetime = Field(default_factory=datetime.utcnow)
 
+class PortfolioSummaryDB(BaseModel):
+    """ A projection of a portfolio document holding only the fields the portfolio list needs. """
+    """ Reference: product_spec.md#3322-p_2200-portfolio-list-retrieval """
+    portfolioId: UUID
+    name: str
+    cashReserveTotal: float = 0.0
+    valuation: PortfolioValuationDB = Field(default_factory=PortfolioValuationDB)
+    modifiedAt: Optional[datetime] = None
+
 class DailyPortfolioSnapshotDB(BaseModel):
     """ Represents a daily snapshot in the 'dailySnapshots' subcollection of a portfolio. """
     """ Reference: product_spec.md#322-time-series-subcollections """
@@ -163,6 +181,29 @@ class RuleSetDB(BaseModel):
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     modifiedAt: datetime = Field(default_factory=datetime.utcnow)
 
+class MarketDataDB(BaseModel):
+    """ Represents a daily document in the '/marketData/{ticker}/daily' subcollection. """
+    """ Reference: product_spec.md#72-data-models """
+    date: datetime
+    ticker: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+    sma7: Optional[float] = None
+    sma20: Optional[float] = None
+    sma50: Optional[float] = None
+    sma200: Optional[float] = None
+    vwma7: Optional[float] = None
+    vwma20: Optional[float] = None
+    vwma50: Optional[float] = None
+    vwma200: Optional[float] = None
+    rsi14: Optional[float] = None
+    atr14: Optional[float] = None
+    macd: Optional[Dict[str, float]] = Field(None, description="Contains 'value', 'signal' and 'histogram'.")
+    high52Weeks: Optional[float] = Field(None, description="The highest high of the last 252 trading days, this one included.")
+
 class MarketDataSnapshotDB(BaseModel):
     """ Reference: product_spec.md#72-data-models """
     closePrice: float
@@ -205,3 +246,14 @@ class IdempotencyKeyDB(BaseModel):
     createdAt: datetime = Field(default_factory=datetime.utcnow, description="Timestamp of the original request.")
     response: Dict[str, Any] = Field(..., description="The JSON response body of the original request.")
     status_code: int = Field(..., description="The HTTP status code of the original request.")
+
+class PortfolioDeletionJobDB(BaseModel):
+    """ Represents the progress of a cascading deletion in the 'portfolioDeletions' collection. """
+    """ Reference: product_spec.md#3341-p_4000-portfolio-deletion-entire-portfolio """
+    portfolioId: UUID = Field(..., description="UUID of the deleted portfolio, the document ID.")
+    userId: str = Field(..., description="Firebase Auth UID of the owner.")
+    status: DeletionJobStatus = DeletionJobStatus.RUNNING
+    deletedCounts: Dict[str, int] = Field(default_factory=dict)
+    failedCount: int = 0
+    startedAt: datetime = Field(default_factory=datetime.utcnow)
+    modifiedAt: datetime = Field(default_factory=datetime.utcnow)
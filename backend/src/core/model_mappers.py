@@ -1,12 +1,17 @@
 from src.api.models import (
     User, NotificationPreferences, Portfolio, CashReserve,
     UpdateUserSettingsRequest, PortfolioCreationRequest,
-    PortfolioUpdateRequest, PortfolioSummary, DailyPortfolioSnapshot
+    PortfolioUpdateRequest, PortfolioSummary, DailyPortfolioSnapshot,
+    PortfolioDeletionProgress, MonitoringRun, MonitoringStageTiming,
+    RuleSet, RuleSetSource, EffectiveRuleSet, ComputedInfoLot, Lot, Holding, HoldingSummary
 )
-from src.core.internal_models import UserDB, PortfolioDB, CashReserveDB, DailyPortfolioSnapshotDB
-from typing import Optional, Dict, Any, List
+from src.core.internal_models import UserDB, PortfolioDB, PortfolioSummaryDB, CashReserveDB, DailyPortfolioSnapshotDB, PortfolioDeletionJobDB, RuleSetDB, HoldingDB, LotDB
+from src.core.valuation import BookValuation, LotBook, Valuation
+from typing import Optional, Dict, Any, List, Tuple, TYPE_CHECKING
 from uuid import UUID
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+if TYPE_CHECKING:
+    from src.monitoring.pipeline import MonitoringRunResult
 
 def userdb_to_user(user_db: UserDB) -> User:
     """Convert a UserDB (internal) to a User (API) model."""
@@ -93,19 +98,29 @@ def portfolio_db_to_portfolio_summary(portfolio_db: PortfolioDB) -> PortfolioSum
     Convert a PortfolioDB (internal) to a PortfolioSummary (API) model.
     Reference: product_spec.md#3322-p_2200-portfolio-list-retrieval
     """
-    # Note: currentValue is a computed field. For the summary list, it's an aggregation
-    # of all holding values. Since holding management is not yet implemented,
-    # we will stub this with the cash reserve amount for now.
+    # currentValue aggregates the holdings' values; the portfolio document
+    # carries it in `valuation`, maintained by lot writes and the daily run.
     return PortfolioSummary.model_validate({
         "portfolioId": portfolio_db.portfolioId,
         "name": portfolio_db.name,
-        "currentValue": portfolio_db.cashReserve.totalAmount
+        "currentValue": portfolio_db.valuation.lastValuation
     })
 
 def portfolio_db_list_to_portfolio_summary_list(portfolio_db_list: List[PortfolioDB]) -> List[PortfolioSummary]:
     """Convert a list of PortfolioDB (internal) to a list of PortfolioSummary (API) models."""
     return [portfolio_db_to_portfolio_summary(p) for p in portfolio_db_list]
 
+def portfolio_summary_db_to_portfolio_summary(summary_db: PortfolioSummaryDB) -> PortfolioSummary:
+    """
+    Convert a PortfolioSummaryDB (projected internal) to a PortfolioSummary (API) model.
+    Reference: product_spec.md#3322-p_2200-portfolio-list-retrieval
+    """
+    return PortfolioSummary.model_validate({
+        "portfolioId": summary_db.portfolioId,
+        "name": summary_db.name,
+        "currentValue": summary_db.valuation.lastValuation
+    })
+
 def daily_portfolio_snapshot_db_to_api(snapshot_db: DailyPortfolioSnapshotDB) -> DailyPortfolioSnapshot:
     """
     Convert a DailyPortfolioSnapshotDB (internal) to a DailyPortfolioSnapshot (API) model.
@@ -116,4 +131,129 @@ def daily_portfolio_snapshot_db_to_api(snapshot_db: DailyPortfolioSnapshotDB) ->
 
 def daily_portfolio_snapshot_db_list_to_api_list(snapshot_db_list: List[DailyPortfolioSnapshotDB]) -> List[DailyPortfolioSnapshot]:
     """Convert a list of DailyPortfolioSnapshotDB to a list of DailyPortfolioSnapshot (API) models."""
-    return [daily_portfolio_snapshot_db_to_api(s) for s in snapshot_db_list]
\ No newline at end of file
+    return [daily_portfolio_snapshot_db_to_api(s) for s in snapshot_db_list]
+
+def chart_points_to_daily_portfolio_snapshot_list(points: List[Tuple[date, Valuation]]) -> List[DailyPortfolioSnapshot]:
+    """
+    Convert downsampled chart points to DailyPortfolioSnapshot (API) models.
+    Reference: product_spec.md#3323-p_2400-portfolio-chart-data-retrieval
+    """
+    return [
+        DailyPortfolioSnapshot(date=datetime(day.year, day.month, day.day, tzinfo=timezone.utc), **valuation.fields())
+        for day, valuation in points
+    ]
+
+def portfolio_deletion_job_db_to_progress(job_db: PortfolioDeletionJobDB) -> PortfolioDeletionProgress:
+    """Convert a PortfolioDeletionJobDB (internal) to a PortfolioDeletionProgress (API) model."""
+    return PortfolioDeletionProgress.model_validate({
+        "portfolioId": job_db.portfolioId,
+        "status": job_db.status,
+        "deletedCounts": job_db.deletedCounts,
+        "failedCount": job_db.failedCount,
+        "startedAt": job_db.startedAt,
+        "modifiedAt": job_db.modifiedAt
+    })
+
+def monitoring_run_result_to_monitoring_run(result: "MonitoringRunResult") -> MonitoringRun:
+    """Convert a MonitoringRunResult (internal) to a MonitoringRun (API) model."""
+    return MonitoringRun(
+        day=result.day,
+        tickers=result.tickers,
+        holdings=result.holdings,
+        failedTickers=sorted(result.failed_tickers),
+        holdingSnapshots=result.holding_snapshots,
+        portfolioSnapshots=result.portfolio_snapshots,
+        snapshotFailures=len(result.snapshot_failures),
+        alerts=result.alerts,
+        stages={
+            name: MonitoringStageTiming(
+                batches=timing.batches,
+                busySeconds=timing.busy_seconds,
+                finishedAfterSeconds=timing.finished_after_seconds,
+            )
+            for name, timing in result.stages.items()
+        },
+        elapsedSeconds=result.elapsed_seconds,
+    )
+
+def rule_set_db_to_rule_set(rule_set_db: RuleSetDB) -> RuleSet:
+    """Convert a RuleSetDB (internal) to a RuleSet (API) model."""
+    return RuleSet.model_validate({
+        "ruleSetId": rule_set_db.ruleSetId,
+        "userId": rule_set_db.userId,
+        "parentId": str(rule_set_db.parentId),
+        "parentType": rule_set_db.parentType,
+        "rules": [rule.model_dump() for rule in rule_set_db.rules],
+        "createdAt": rule_set_db.createdAt,
+        "modifiedAt": rule_set_db.modifiedAt
+    })
+
+def rule_set_db_to_effective_rule_set(rule_set_db: Optional[RuleSetDB], source: Optional[RuleSetSource]) -> EffectiveRuleSet:
+    """Convert a holding's resolved RuleSetDB (internal), if any, to an EffectiveRuleSet (API) model."""
+    if rule_set_db is None:
+        return EffectiveRuleSet()
+    return EffectiveRuleSet(source=source, ruleSet=rule_set_db_to_rule_set(rule_set_db))
+
+def book_valuation_to_computed_info_lot(valuation: BookValuation, row: int) -> Optional[ComputedInfoLot]:
+    """
+    The ComputedInfoLot of the lot at `row` of a LotBook, or None while its ticker has no price.
+    Reference: product_spec.md#522-on-the-fly-computed-models
+    """
+    price = float(valuation.lot_price[row])
+    if price != price:  # NaN
+        return None
+    value, cost, tax = float(valuation.lot_value[row]), float(valuation.lot_cost[row]), float(valuation.lot_tax[row])
+    return ComputedInfoLot(
+        currentPrice=price,
+        currentValue=value,
+        preTaxProfit=value - cost,
+        capitalGainTax=tax,
+        afterTaxProfit=value - cost - tax,
+    )
+
+def lot_db_to_lot(lot_db: LotDB, computed_info: Optional[ComputedInfoLot] = None) -> Lot:
+    """Convert a LotDB (internal) to a Lot (API) model."""
+    return Lot(**lot_db.model_dump(), computedInfo=computed_info)
+
+def holding_db_to_holding(book: LotBook, valuation: BookValuation, index: int) -> Holding:
+    """
+    Convert the HoldingDB (internal) at `index` of a LotBook to a Holding (API)
+    model whose lots carry their ComputedInfoLot.
+    Reference: product_spec.md#4332-h_2200-single-holding-retrieval-holding-details-view
+    """
+    holding_db: HoldingDB = book.holdings[index]
+    lots = [
+        lot_db_to_lot(lot_db, book_valuation_to_computed_info_lot(valuation, row))
+        for lot_db, row in zip(holding_db.lots, book.lot_rows(index))
+    ]
+    return Holding(**holding_db.model_dump(exclude={"lots", "ruleSetId"}), lots=lots)
+
+def holding_db_to_holding_summary(holding_db: HoldingDB, valuation: Valuation) -> HoldingSummary:
+    """
+    Convert a HoldingDB (internal) and its valuation to a HoldingSummary (API) model.
+    Reference: product_spec.md#4331-h_2000-holding-list-retrieval-portfolio-details-view
+    """
+    return HoldingSummary(
+        holdingId=holding_db.holdingId,
+        ticker=holding_db.ticker,
+        securityType=holding_db.securityType,
+        assetClass=holding_db.assetClass,
+        currency=holding_db.currency,
+        totalCost=valuation.totalCost,
+        currentValue=valuation.currentValue,
+        preTaxGainLoss=valuation.preTaxGainLoss,
+        gainLossPercentage=valuation.gainLossPercentage,
+    )
+
+def lot_book_to_holding_summary_list(book: LotBook, valuation: BookValuation) -> List[HoldingSummary]:
+    """
+    Convert every holding of a LotBook to a HoldingSummary (API) model. A
+    holding whose ticker has no price yet is shown at its cost.
+    """
+    summaries = []
+    for index, holding_db in enumerate(book.holdings):
+        holding_valuation = valuation.holding(index)
+        if not valuation.holding_priced[index]:
+            holding_valuation = Valuation(totalCost=holding_valuation.totalCost, currentValue=holding_valuation.totalCost)
+        summaries.append(holding_db_to_holding_summary(holding_db, holding_valuation))
+    return summaries
@@ -0,0 +1,160 @@
+"""
+Declarative catalog of the Firestore queries issued by the services.
+
+Every filtered or ordered query is described here once, as a QuerySpec, and
+services build their queries from these specs instead of chaining `where()`
+and `order_by()` by hand. Because the catalog is the single list of queries,
+it can derive the composite indexes they need; `util/generate_firestore_indexes.py`
+writes them to `firestore.indexes.json`, and the test suite checks that the
+file is current and that every spec runs.
+Reference: product_spec.md#82-data-models
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+# Ordering by document ID is served by every single-field index.
+DOCUMENT_ID_FIELD = "__name__"
+
+@dataclass(frozen=True)
+class QuerySpec:
+    """
+    The shape of a query: which fields it filters on and how it is ordered.
+
+    `equality` fields are filtered with '==', `membership` fields with 'in',
+    and the optional `range_field` with one or more of '<', '<=', '>', '>='.
+    Values are supplied when the query is built. `subcollection` marks specs
+    that run on a subcollection of each parent document (never as a
+    collection group query, which would need its own index scope).
+    """
+    name: str
+    collection: str
+    equality: Tuple[str, ...] = ()
+    membership: Tuple[str, ...] = ()
+    range_field: Optional[str] = None
+    order_by: Tuple[Tuple[str, str], ...] = ()
+    subcollection: bool = False
+
+    def build(self, source, **values: Any):
+        """
+        Applies the spec's filters and ordering to `source` (a collection
+        reference or query). Equality and membership fields take their value
+        from `values`; the range field takes a list of (operator, value) pairs.
+        """
+        query = source
+        for field in self.equality:
+            query = query.where(filter=FieldFilter(field, "==", values[field]))
+        for field in self.membership:
+            query = query.where(filter=FieldFilter(field, "in", list(values[field])))
+        if self.range_field is not None:
+            for op, value in values[self.range_field]:
+                query = query.where(filter=FieldFilter(self.range_field, op, value))
+        for field, direction in self.order_by:
+            query = query.order_by(field, direction=direction)
+        return query
+
+    def index_fields(self) -> List[Tuple[str, str]]:
+        """
+        The fields of the index serving this query, in Firestore's order:
+        equality and membership fields first, then the range/order field.
+        """
+        fields: List[Tuple[str, str]] = []
+        seen = set()
+        for field in self.equality + self.membership:
+            if field not in seen:
+                fields.append((field, ASCENDING))
+                seen.add(field)
+        ordered = [(field, direction) for field, direction in self.order_by if field != DOCUMENT_ID_FIELD]
+        if self.range_field is not None and self.range_field not in {field for field, _ in ordered}:
+            ordered.insert(0, (self.range_field, ASCENDING))
+        for field, direction in ordered:
+            if field not in seen:
+                fields.append((field, direction))
+                seen.add(field)
+        return fields
+
+    def required_index(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns the composite index definition this query needs, or None if
+        Firestore's automatic single-field indexes serve it.
+
+        Equality-only queries over several fields could be served by merging
+        single-field indexes, but that merge is slow on large collections and
+        can still be rejected, so they get a composite index as well.
+        """
+        fields = self.index_fields()
+        if len(fields) < 2:
+            return None
+        return {
+            "collectionGroup": self.collection,
+            "queryScope": "COLLECTION",
+            "fields": [{"fieldPath": field, "order": direction} for field, direction in fields],
+        }
+
+# --- Portfolios (product_spec.md#321-primary-stored-models) ---
+PORTFOLIOS_BY_USER = QuerySpec("portfolios_by_user", "portfolios", equality=("userId",))
+PORTFOLIOS_BY_USER_AND_NAME = QuerySpec("portfolios_by_user_and_name", "portfolios", equality=("userId", "name"))
+# Paged portfolio list; the document ID breaks ties between equal names.
+PORTFOLIOS_BY_USER_ORDERED_BY_NAME = QuerySpec(
+    "portfolios_by_user_ordered_by_name", "portfolios",
+    equality=("userId",),
+    order_by=(("name", ASCENDING), (DOCUMENT_ID_FIELD, ASCENDING)),
+)
+
+# --- Holdings (product_spec.md#421-primary-stored-models) ---
+HOLDINGS_BY_PORTFOLIO = QuerySpec("holdings_by_portfolio", "holdings", equality=("portfolioId",))
+HOLDINGS_BY_PORTFOLIO_AND_TICKER = QuerySpec("holdings_by_portfolio_and_ticker", "holdings", equality=("portfolioId", "ticker"))
+
+# --- Rule sets (product_spec.md#621-stored-data-models) ---
+RULESETS_BY_PARENTS = QuerySpec("rulesets_by_parents", "rulesets", membership=("parentId",))
+RULESETS_BY_USER = QuerySpec("rulesets_by_user", "rulesets", equality=("userId",))
+
+# --- Alerts (product_spec.md#72-data-models) ---
+ALERTS_BY_USER_AND_READ_STATE = QuerySpec(
+    "alerts_by_user_and_read_state", "alerts",
+    equality=("userId", "isRead"),
+    order_by=(("triggeredAt", DESCENDING),),
+)
+
+# --- Daily snapshots of portfolios and holdings (product_spec.md#322-time-series-subcollections) ---
+DAILY_SNAPSHOTS_IN_RANGE = QuerySpec(
+    "daily_snapshots_in_range", "dailySnapshots",
+    range_field="date",
+    order_by=(("date", ASCENDING),),
+    subcollection=True,
+)
+
+# --- Shared market data cache (product_spec.md#72-data-models) ---
+# Runs on /marketData/{ticker}/daily; served by the single-field index on 'date'.
+MARKET_DATA_DAILY_IN_RANGE = QuerySpec(
+    "market_data_daily_in_range", "daily",
+    range_field="date",
+    order_by=(("date", DESCENDING),),
+    subcollection=True,
+)
+
+QUERY_CATALOG: Sequence[QuerySpec] = (
+    PORTFOLIOS_BY_USER,
+    PORTFOLIOS_BY_USER_AND_NAME,
+    PORTFOLIOS_BY_USER_ORDERED_BY_NAME,
+    HOLDINGS_BY_PORTFOLIO,
+    HOLDINGS_BY_PORTFOLIO_AND_TICKER,
+    RULESETS_BY_PARENTS,
+    RULESETS_BY_USER,
+    ALERTS_BY_USER_AND_READ_STATE,
+    DAILY_SNAPSHOTS_IN_RANGE,
+    MARKET_DATA_DAILY_IN_RANGE,
+)
+
+def firestore_indexes_document(catalog: Sequence[QuerySpec] = QUERY_CATALOG) -> Dict[str, Any]:
+    """Returns the contents of `firestore.indexes.json` for the catalog."""
+    indexes = []
+    for spec in catalog:
+        index = spec.required_index()
+        if index is not None and index not in indexes:
+            indexes.append(index)
+    indexes.sort(key=lambda index: (index["collectionGroup"], [field["fieldPath"] for field in index["fields"]]))
+    return {"indexes": indexes, "fieldOverrides": []}
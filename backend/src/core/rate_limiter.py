@@ -0,0 +1,55 @@
+"""
+An asyncio token bucket for pacing calls to quota-limited external APIs.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+class TokenBucket:
+    """
+    Allows on average `rate` acquisitions per second, with bursts of up to
+    `capacity`.
+
+    The bucket starts full and refills continuously. `acquire()` waits until
+    a token is available; waiters are served in arrival order, so a slow
+    consumer cannot be starved by later ones.
+    """
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: float = 1.0, **kwargs) -> "TokenBucket":
+        return cls(rate=requests_per_minute / 60.0, capacity=burst, **kwargs)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        # Created lazily so the bucket can be built outside a running loop.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Holding the lock while sleeping keeps waiters in FIFO order.
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await self._sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
@@ -0,0 +1,104 @@
+"""
+Firebase ID token verification with a shared, process-wide cache.
+
+Both the idempotency middleware and the `get_current_user` dependency need the
+decoded token of the same request. Verifying a token means a signature check
+and, periodically, a fetch of Google's public certificates, so verified claims
+are cached by token hash until the token's own `exp`.
+
+Cloud Scheduler authenticates to internal endpoints with a Google-signed
+OIDC token instead; `verify_scheduler_token` checks those.
+Reference: product_spec.md#833-u_3000-api-request-authorization
+"""
+import hashlib
+import os
+from typing import Any, Dict
+
+from firebase_admin import auth
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
+from starlette.concurrency import run_in_threadpool
+
+from .cache import CacheStats, TTLCache
+
+# Firebase ID tokens live for one hour; the cache never holds a token longer.
+TOKEN_CACHE_MAX_SIZE = 4096
+TOKEN_CACHE_MAX_TTL_SECONDS = 3600
+
+_verified_tokens = TTLCache(maxsize=TOKEN_CACHE_MAX_SIZE, ttl_seconds=TOKEN_CACHE_MAX_TTL_SECONDS)
+
+def _token_cache_key(token: str) -> str:
+    # Never keep raw bearer tokens in memory longer than needed.
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def verify_id_token(token: str) -> Dict[str, Any]:
+    """
+    Returns the decoded claims of a Firebase ID token.
+
+    In a test environment, the token is treated as a raw UID and a mock
+    decoded token is returned. Otherwise the token is verified with the Admin
+    SDK (which targets the emulator in 'dev') and the claims are cached until
+    the token expires.
+
+    Raises:
+        ValueError, auth.InvalidIdTokenError: If the token is invalid.
+    """
+    if os.environ.get("ENV") == "test":
+        return {"uid": token, "email": f"{token}@example.com"}
+
+    key = _token_cache_key(token)
+    decoded_token = _verified_tokens.get(key)
+    if decoded_token is not None:
+        return decoded_token
+    return _verify_and_cache(key, token)
+
+def _verify_and_cache(key: str, token: str) -> Dict[str, Any]:
+    decoded_token = auth.verify_id_token(token)
+    _verified_tokens.set(key, decoded_token, expires_at=decoded_token.get("exp"))
+    return decoded_token
+
+async def verify_id_token_async(token: str) -> Dict[str, Any]:
+    """
+    Async variant of `verify_id_token` for use on the event loop.
+
+    Cache hits are served inline; a miss runs the blocking Admin SDK
+    verification (which may fetch certificates) in the threadpool.
+    """
+    if os.environ.get("ENV") == "test":
+        return verify_id_token(token)
+
+    key = _token_cache_key(token)
+    decoded_token = _verified_tokens.get(key)
+    if decoded_token is not None:
+        return decoded_token
+    return await run_in_threadpool(_verify_and_cache, key, token)
+
+def verify_scheduler_token(token: str, audience: str) -> Dict[str, Any]:
+    """
+    Returns the claims of a Google-signed OIDC token, such as the one Cloud
+    Scheduler sends for its service account.
+
+    In a test environment, the token is treated as the caller's email.
+
+    Raises:
+        ValueError: If the token is invalid or issued for another audience,
+            or no audience is given (google-auth would then skip the check).
+    """
+    if not audience:
+        raise ValueError("An audience is required to verify a scheduler token.")
+    if os.environ.get("ENV") == "test":
+        return {"email": token, "email_verified": True}
+    return id_token.verify_oauth2_token(token, google_requests.Request(), audience=audience)
+
+async def verify_scheduler_token_async(token: str, audience: str) -> Dict[str, Any]:
+    """Async variant of `verify_scheduler_token`; the verification runs in the threadpool."""
+    if os.environ.get("ENV") == "test":
+        return verify_scheduler_token(token, audience)
+    return await run_in_threadpool(verify_scheduler_token, token, audience)
+
+def get_token_cache_stats() -> CacheStats:
+    """Returns the hit/miss counters of the verified-token cache."""
+    return _verified_tokens.stats()
+
+def clear_token_cache() -> None:
+    _verified_tokens.clear()
@@ -0,0 +1,80 @@
+"""
+Groups related Firestore writes into a single WriteBatch commit.
+
+Services stage their writes on a UnitOfWork instead of calling `set()` or
+`update()` on document references directly. A mutation that touches several
+documents (e.g. a new user and their default portfolio) then costs one commit
+round-trip, and either all of its writes apply or none do.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+# Firestore rejects batches with more than 500 writes.
+MAX_BATCH_WRITES = 500
+
+class UnitOfWork:
+    """
+    Collects writes on a `firestore.AsyncClient` batch until `commit()`.
+
+    Callbacks registered with `after_commit` run only once the batch has been
+    committed, which is where in-process caches should be invalidated.
+    """
+    def __init__(self, db_client):
+        self.db = db_client
+        self._batch = db_client.batch()
+        self._write_count = 0
+        self._after_commit: List[Callable[[], Any]] = []
+        self.committed = False
+
+    def _stage(self):
+        if self.committed:
+            raise RuntimeError("This unit of work has already been committed.")
+        if self._write_count >= MAX_BATCH_WRITES:
+            raise ValueError(f"A unit of work cannot hold more than {MAX_BATCH_WRITES} writes.")
+        self._write_count += 1
+
+    def set(self, doc_ref, data: Dict[str, Any], merge: bool = False):
+        self._stage()
+        self._batch.set(doc_ref, data, merge=merge)
+
+    def create(self, doc_ref, data: Dict[str, Any]):
+        self._stage()
+        self._batch.create(doc_ref, data)
+
+    def update(self, doc_ref, data: Dict[str, Any]):
+        self._stage()
+        self._batch.update(doc_ref, data)
+
+    def delete(self, doc_ref):
+        self._stage()
+        self._batch.delete(doc_ref)
+
+    def after_commit(self, callback: Callable[[], Any]):
+        self._after_commit.append(callback)
+
+    def __len__(self) -> int:
+        return self._write_count
+
+    async def commit(self):
+        """Commits all staged writes in one round-trip. Empty units are a no-op."""
+        if self.committed:
+            return
+        if self._write_count:
+            await self._batch.commit()
+        self.committed = True
+        for callback in self._after_commit:
+            callback()
+
+@asynccontextmanager
+async def unit_of_work(db_client, existing: Optional[UnitOfWork] = None) -> AsyncIterator[UnitOfWork]:
+    """
+    Yields `existing` if the caller is already inside a unit of work, so its
+    writes join the outer commit; otherwise opens a new unit that commits when
+    the block exits without an exception.
+    """
+    if existing is not None:
+        yield existing
+        return
+    uow = UnitOfWork(db_client)
+    yield uow
+    await uow.commit()
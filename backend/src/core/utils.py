@@ -1,3 +1,6 @@
+import base64
+import copy
+import json
 from uuid import UUID
 
 def convert_uuids_to_str(data: dict) -> dict:
@@ -9,4 +12,41 @@ def convert_uuids_to_str(data: dict) -> dict:
             data[key] = convert_uuids_to_str(value)
         elif isinstance(value, list):
             data[key] = [convert_uuids_to_str(item) if isinstance(item, dict) else item for item in value]
-    return data
\ No newline at end of file
+    return data
+def apply_field_updates(document: dict, update_data: dict) -> dict:
+    """
+    Returns a copy of `document` with `update_data` applied the way Firestore's
+    `update()` applies it: top-level keys replace whole fields and dotted keys
+    ("cashReserve.totalAmount") replace nested ones.
+    """
+    merged = copy.deepcopy(document)
+    for field_path, value in update_data.items():
+        target = merged
+        *parents, leaf = field_path.split(".")
+        for parent in parents:
+            if not isinstance(target.get(parent), dict):
+                target[parent] = {}
+            target = target[parent]
+        target[leaf] = copy.deepcopy(value)
+    return merged
+
+def encode_page_token(cursor_values: list) -> str:
+    """Encodes the cursor values of the last returned document as an opaque page token."""
+    payload = json.dumps(cursor_values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+def decode_page_token(page_token: str) -> list:
+    """
+    Decodes a page token created by `encode_page_token`.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        padded = page_token + "=" * (-len(page_token) % 4)
+        cursor_values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid page token") from e
+    if not isinstance(cursor_values, list):
+        raise ValueError("Invalid page token")
+    return cursor_values
@@ -0,0 +1,151 @@
+"""
+Valuation of lots, holdings and portfolios.
+
+ComputedInfoLot, HoldingSummary and the daily snapshots are all sums over
+`HoldingDB.lots`. `LotBook` flattens the lots of any number of holdings
+(one user's, or the whole system's in the daily job) into NumPy arrays with
+one row per lot: quantity, purchase price, purchase day, and the index of
+the lot's holding and portfolio. `LotBook.value` then prices every lot with
+one gather of the tickers' prices, applies the tax rules of
+`tax_config.yaml` to all lots at once, and rolls the lots up into holdings
+and the holdings into portfolios with `np.bincount`.
+Reference: product_spec.md#522-on-the-fly-computed-models
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Mapping, Sequence
+
+import numpy as np
+
+from .config_models import TaxConfig
+from .internal_models import HoldingDB, LotDB
+
+@dataclass
+class Valuation:
+    """Cost, value and gains of a holding or of a whole portfolio."""
+    totalCost: float = 0.0
+    currentValue: float = 0.0
+    capitalGainTax: float = 0.0
+
+    @property
+    def preTaxGainLoss(self) -> float:
+        return self.currentValue - self.totalCost
+
+    @property
+    def afterTaxGainLoss(self) -> float:
+        return self.preTaxGainLoss - self.capitalGainTax
+
+    @property
+    def gainLossPercentage(self) -> float:
+        return self.preTaxGainLoss / self.totalCost * 100 if self.totalCost else 0.0
+
+    def add(self, other: "Valuation"):
+        self.totalCost += other.totalCost
+        self.currentValue += other.currentValue
+        self.capitalGainTax += other.capitalGainTax
+
+    def fields(self) -> dict:
+        return {
+            "totalCost": self.totalCost,
+            "currentValue": self.currentValue,
+            "preTaxGainLoss": self.preTaxGainLoss,
+            "afterTaxGainLoss": self.afterTaxGainLoss,
+            "gainLossPercentage": self.gainLossPercentage,
+        }
+
+@dataclass
+class BookValuation:
+    """
+    The values of a LotBook at one set of prices. Lot arrays are indexed by
+    lot row, holding arrays by the holding's position in the book and
+    portfolio arrays by the portfolio's position in `LotBook.portfolio_ids`.
+    Lots, holdings and portfolios without a price are NaN.
+    """
+    lot_price: np.ndarray
+    lot_cost: np.ndarray
+    lot_value: np.ndarray
+    lot_tax: np.ndarray
+    holding_cost: np.ndarray
+    holding_value: np.ndarray
+    holding_tax: np.ndarray
+    portfolio_cost: np.ndarray
+    portfolio_value: np.ndarray
+    portfolio_tax: np.ndarray
+
+    @property
+    def holding_priced(self) -> np.ndarray:
+        return ~np.isnan(self.holding_value)
+
+    def holding(self, index: int) -> Valuation:
+        return Valuation(float(self.holding_cost[index]), float(self.holding_value[index]), float(self.holding_tax[index]))
+
+    def portfolio(self, index: int) -> Valuation:
+        return Valuation(float(self.portfolio_cost[index]), float(self.portfolio_value[index]), float(self.portfolio_tax[index]))
+
+class LotBook:
+    """The lots of a list of holdings, flattened into arrays."""
+    def __init__(self, holdings: Sequence[HoldingDB]):
+        self.holdings: List[HoldingDB] = list(holdings)
+        self.portfolio_ids: List[str] = list(dict.fromkeys(str(holding.portfolioId) for holding in self.holdings))
+        self.tickers: List[str] = list(dict.fromkeys(holding.ticker for holding in self.holdings))
+        portfolio_index = {portfolio_id: index for index, portfolio_id in enumerate(self.portfolio_ids)}
+        ticker_index = {ticker: index for index, ticker in enumerate(self.tickers)}
+
+        count = len(self.holdings)
+        self.holding_portfolio = np.fromiter((portfolio_index[str(holding.portfolioId)] for holding in self.holdings), dtype=np.intp, count=count)
+        self.holding_ticker = np.fromiter((ticker_index[holding.ticker] for holding in self.holdings), dtype=np.intp, count=count)
+        self.holding_asset_class = np.array([holding.assetClass.value for holding in self.holdings], dtype=str)
+        lot_counts = np.fromiter((len(holding.lots) for holding in self.holdings), dtype=np.intp, count=count)
+        # The lots of holding i are rows lot_offsets[i]:lot_offsets[i + 1].
+        self.lot_offsets = np.concatenate([[0], np.cumsum(lot_counts)]).astype(np.intp)
+
+        self.lots: List[LotDB] = [lot for holding in self.holdings for lot in holding.lots]
+        self.lot_holding = np.repeat(np.arange(count, dtype=np.intp), lot_counts)
+        self.lot_portfolio = self.holding_portfolio[self.lot_holding]
+        self.lot_ticker = self.holding_ticker[self.lot_holding]
+        self.quantity = np.fromiter((lot.quantity for lot in self.lots), dtype=np.float64, count=len(self.lots))
+        self.purchase_price = np.fromiter((lot.purchasePrice for lot in self.lots), dtype=np.float64, count=len(self.lots))
+        self.purchase_day = np.array([lot.purchaseDate.date() for lot in self.lots], dtype="datetime64[D]")
+
+    def __len__(self) -> int:
+        return len(self.holdings)
+
+    def lot_rows(self, index: int) -> range:
+        """The rows of the lots of the holding at `index`, in the order of `HoldingDB.lots`."""
+        return range(self.lot_offsets[index], self.lot_offsets[index + 1])
+
+    def value(self, prices: Mapping[str, float], day: date, tax_config: TaxConfig) -> BookValuation:
+        """
+        Values every lot at its ticker's price in `prices` on `day`; tax is
+        due on lots with a gain, at the rate of the holding's asset class and
+        the lot's holding duration.
+        """
+        ticker_price = np.array([prices.get(ticker, np.nan) for ticker in self.tickers], dtype=np.float64)
+        lot_price = ticker_price[self.lot_ticker]
+        lot_cost = self.quantity * self.purchase_price
+        lot_value = self.quantity * lot_price
+        gain = lot_value - lot_cost
+        holding_days = (np.datetime64(day, "D") - self.purchase_day).astype(np.int64)
+        rates = tax_config.tax_rates(self.holding_asset_class[self.lot_holding], holding_days)
+        lot_tax = np.where(gain > 0, gain * rates / 100, np.where(np.isnan(gain), np.nan, 0.0))
+
+        holdings, portfolios = len(self.holdings), len(self.portfolio_ids)
+        holding_cost = np.bincount(self.lot_holding, weights=lot_cost, minlength=holdings)
+        holding_value = np.bincount(self.lot_holding, weights=lot_value, minlength=holdings)
+        holding_tax = np.bincount(self.lot_holding, weights=lot_tax, minlength=holdings)
+        # A holding without lots has nothing to weigh, but is still unpriced without a price.
+        unpriced = np.isnan(ticker_price[self.holding_ticker])
+        holding_value[unpriced] = np.nan
+        holding_tax[unpriced] = np.nan
+        return BookValuation(
+            lot_price=lot_price,
+            lot_cost=lot_cost,
+            lot_value=lot_value,
+            lot_tax=lot_tax,
+            holding_cost=holding_cost,
+            holding_value=holding_value,
+            holding_tax=holding_tax,
+            portfolio_cost=np.bincount(self.holding_portfolio, weights=holding_cost, minlength=portfolios),
+            portfolio_value=np.bincount(self.holding_portfolio, weights=holding_value, minlength=portfolios),
+            portfolio_tax=np.bincount(self.holding_portfolio, weights=holding_tax, minlength=portfolios),
+        )
@@ -1,21 +1,22 @@
-import os
-from fastapi import Header, HTTPException, status, Depends
+from fastapi import Header, HTTPException, Request, status, Depends
 from pydantic import UUID4
 from firebase_admin import auth
-from uuid import UUID
 
 # Use the correct, consistent import
-from .firebase_setup import get_db_client
+from .firebase_setup import get_async_db_client
 from .core.internal_models import CurrentUser
+from .core.token_verification import verify_id_token_async, verify_scheduler_token_async
+from .settings import settings
 from .services.user_service import UserService
 from .services.portfolio_service import PortfolioService
+from .services.rule_set_service import RuleSetService
 from .services.idempotency_service import IdempotencyService
 
-def get_db():
+async def get_db():
     """
-    Dependency that provides the Firestore client.
+    Dependency that provides the async Firestore client for the running event loop.
     """
-    return get_db_client()
+    return get_async_db_client()
 
 def get_portfolio_service(db_client=Depends(get_db)) -> PortfolioService:
     """
@@ -23,6 +24,12 @@ def get_portfolio_service(db_client=Depends(get_db)) -> PortfolioService:
     """
     return PortfolioService(db_client)
 
+def get_rule_set_service(db_client=Depends(get_db)) -> RuleSetService:
+    """
+    Dependency that provides a RuleSetService instance.
+    """
+    return RuleSetService(db_client)
+
 def get_user_service(db_client=Depends(get_db), portfolio_service: PortfolioService = Depends(get_portfolio_service)) -> UserService:
     """
     Dependency that provides a UserService instance.
@@ -46,10 +53,16 @@ async def require_idempotency_key(idempotency_key: UUID4 = Header(..., alias="Id
         )
     return idempotency_key
 
-async def get_current_user(authorization: str = Header(..., alias="Authorization"), db=Depends(get_db)):
+async def get_authenticated_user(request: Request, authorization: str = Header(..., alias="Authorization")) -> CurrentUser:
     """
     A dependency that verifies the Firebase ID Token from the Authorization header.
     In a test environment, it treats the token as a raw UID.
+    If the idempotency middleware has already verified the token for this
+    request, its decoded claims are reused.
+
+    Unlike `get_current_user`, this does not read the user document, so
+    `defaultPortfolioId` is always None. Use it for endpoints that only need
+    the caller's identity.
     """
     if not authorization:
         raise HTTPException(
@@ -65,40 +78,15 @@ async def get_current_user(authorization: str = Header(..., alias="Authorization
                 detail="Authorization scheme must be Bearer."
             )
         
-        # --- THIS IS THE KEY CHANGE ---
-        # If we are in a test environment, we treat the token as a simple UID
-        # and create a mock "decoded_token" object. This allows tests to run
-        # without needing valid JWTs.
-        # The 'dev' environment now uses the real verification against the emulator
-        # to better mimic production behavior.
-        if os.environ.get("ENV") == "test":
-            uid = token
-            # Create a mock token that has the same structure as a real one
-            decoded_token = {
-                'uid': uid,
-                'email': f'{uid}@example.com' 
-            }
-        else:
-            # In 'dev' or 'production', verify the actual JWT.
-            # The Admin SDK is automatically configured to use the emulator in 'dev' mode.
-            decoded_token = auth.verify_id_token(token)
-        # --- END OF CHANGE ---
-        
-        user_doc_ref = db.collection("users").document(decoded_token["uid"])
-        user_doc = user_doc_ref.get()
-
-        default_portfolio_id = None
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
-            default_portfolio_id = user_data.get("defaultPortfolioId")
-            if default_portfolio_id:
-                default_portfolio_id = UUID(default_portfolio_id)
+        decoded_token = getattr(request.state, "decoded_token", None)
+        if decoded_token is None:
+            decoded_token = await verify_id_token_async(token)
+            request.state.decoded_token = decoded_token
 
         return CurrentUser(
             uid=decoded_token["uid"],
             email=decoded_token["email"],
             username=decoded_token.get("name", decoded_token["email"]),
-            defaultPortfolioId=default_portfolio_id
         )
 
     except (ValueError, auth.InvalidIdTokenError) as e:
@@ -111,3 +99,60 @@ async def get_current_user(authorization: str = Header(..., alias="Authorization
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred during authentication: {e}"
         )
+
+async def get_current_user(
+    authenticated_user: CurrentUser = Depends(get_authenticated_user),
+    user_service: UserService = Depends(get_user_service),
+) -> CurrentUser:
+    """
+    A dependency that returns the authenticated user together with their
+    `defaultPortfolioId`.
+    The user document is read through the request's UserService, so handlers
+    that inject the same service get it from the per-request cache.
+    """
+    try:
+        user_db = await user_service.get_user_by_uid(authenticated_user.uid)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred during authentication: {e}"
+        )
+
+    if user_db is None:
+        return authenticated_user
+    return authenticated_user.model_copy(update={"defaultPortfolioId": user_db.defaultPortfolioId})
+
+async def require_scheduler(authorization: str = Header(..., alias="Authorization")) -> str:
+    """
+    A dependency for internal endpoints called by Cloud Scheduler. It verifies
+    the OIDC token of the configured service account and returns its email.
+    While MONITORING_SCHEDULER_SERVICE_ACCOUNT or MONITORING_TRIGGER_AUDIENCE
+    is not set, every call is refused: without an audience, a token the
+    service account minted for any other service would be accepted.
+    """
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authorization scheme must be Bearer."
+        )
+    if not settings.MONITORING_TRIGGER_AUDIENCE:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The caller is not allowed to trigger internal jobs."
+        )
+    try:
+        claims = await verify_scheduler_token_async(token, settings.MONITORING_TRIGGER_AUDIENCE)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid authentication credentials: {e}"
+        )
+
+    service_account = settings.MONITORING_SCHEDULER_SERVICE_ACCOUNT
+    if not service_account or claims.get("email") != service_account or not claims.get("email_verified"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The caller is not allowed to trigger internal jobs."
+        )
+    return claims["email"]
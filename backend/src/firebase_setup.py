@@ -1,5 +1,8 @@
+import asyncio
+import weakref
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore import AsyncClient
 import os
 from pathlib import Path
 
@@ -58,3 +61,25 @@ def get_db_client():
         initialize_firebase_app()
     return firestore.client()
 
+# Async clients keep a gRPC channel that is bound to the event loop it was
+# first used on, so one client is cached per running loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient]" = weakref.WeakKeyDictionary()
+
+def get_async_db_client() -> AsyncClient:
+    """
+    Returns an async Firestore client for the running event loop.
+    Ensures Firebase is initialized before returning the client.
+    Must be called from within a coroutine.
+    """
+    if not firebase_admin._apps:
+        initialize_firebase_app()
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        app = firebase_admin.get_app()
+        client = AsyncClient(
+            credentials=app.credential.get_credential(),
+            project=app.project_id,
+        )
+        _async_clients[loop] = client
+    return client
@@ -21,8 +21,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .firebase_setup import initialize_firebase_app
 from .middleware import idempotency_middleware
+from .services.market_data_service import alpha_vantage_service
 from .routers.user_router import router as user_router
 from .routers.portfolio_router import router as portfolio_router
+from .routers.rule_set_router import router as rule_set_router
+from .routers.monitoring_router import router as monitoring_router
 # --- End Module Imports ---
 
 @asynccontextmanager
@@ -36,7 +39,8 @@ async def lifespan(app: FastAPI):
     # This ensures all configurations and connections are ready.
     initialize_firebase_app()
     yield
-    # Shutdown logic can be placed here if needed.
+    # Release the pooled connections to the market data provider.
+    await alpha_vantage_service.close_client()
     print("DIAGNOSTIC: Application shutdown.")
 
 app = FastAPI(
@@ -57,6 +61,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the cursor of the paginated portfolio list.
+    expose_headers=["X-Next-Page-Token"],
 )
 # The idempotency middleware should run after CORS but before the request hits the router.
 app.middleware("http")(idempotency_middleware)
@@ -67,9 +73,11 @@ app.middleware("http")(idempotency_middleware)
 # their routers will be included here as well.
 app.include_router(user_router, prefix="/api/v1")
 app.include_router(portfolio_router, prefix="/api/v1")
+app.include_router(rule_set_router, prefix="/api/v1")
+app.include_router(monitoring_router, prefix="/api/v1")
 # --- End of API Routers ---
 
 @app.get("/")
-def read_root():
+async def read_root():
     """A simple health-check endpoint."""
     return {"message": "Welcome to the Sentinel Backend API!"}
@@ -1,17 +1,32 @@
-import json
-import os
-from fastapi import Request, status
-from fastapi.responses import JSONResponse
-from firebase_admin import auth
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 
 # We will create our dependencies manually inside the middleware
-from .firebase_setup import get_db_client
-from .services.idempotency_service import IdempotencyService
+from .firebase_setup import get_async_db_client
+from .settings import settings
+from .core.token_verification import verify_id_token_async
+from .services.idempotency_service import IdempotencyService, Reservation, ReservationOutcome
+
+# How long a request waits for an identical request that is in progress on
+# another instance before giving up with 409 Conflict.
+PENDING_WAIT_SECONDS = 5.0
+PENDING_POLL_INITIAL_DELAY_SECONDS = 0.1
+# Internal endpoints are called by Cloud Scheduler, which authenticates with
+# an OIDC token rather than a user's ID token and sends no Idempotency-Key.
+IDEMPOTENCY_EXEMPT_PATH_PREFIXES = ("/api/v1/internal/",)
+
+# Requests currently running on this instance, keyed by (userId, Idempotency-Key).
+# Each future resolves to the stored response, or None if nothing was stored.
+_in_flight_requests: Dict[Tuple[str, str], "asyncio.Future[Optional[dict]]"] = {}
 
 async def idempotency_middleware(request: Request, call_next):
     # Only apply to state-changing methods
     if request.method not in ["POST", "PUT", "DELETE"]:
         return await call_next(request)
+    if request.url.path.startswith(IDEMPOTENCY_EXEMPT_PATH_PREFIXES):
+        return await call_next(request)
 
     idempotency_key = request.headers.get("Idempotency-Key")
     if not idempotency_key:
@@ -30,17 +45,11 @@ async def idempotency_middleware(request: Request, call_next):
                 content={"detail": "Authorization header is missing."},
             )
         
-        # --- THIS IS THE FIX ---
-        # Add the same logic from get_current_user to handle test tokens
-        # The 'dev' environment now uses real verification against the emulator.
-        if os.environ.get("ENV") == "test":
-            user_id = token
-        else:
-            # In 'dev' or 'production', verify the actual JWT.
-            # The Admin SDK is automatically configured to use the emulator in 'dev' mode.
-            decoded_token = auth.verify_id_token(token)
-            user_id = decoded_token["uid"]
-        # --- END OF FIX ---
+        # Tokens are verified once per request; the decoded claims are attached
+        # to the request so `get_current_user` does not verify them again.
+        decoded_token = await verify_id_token_async(token)
+        request.state.decoded_token = decoded_token
+        user_id = decoded_token["uid"]
 
     except Exception as e:
         return JSONResponse(
@@ -52,40 +61,135 @@ async def idempotency_middleware(request: Request, call_next):
     # --- Dependency Injection for Middleware ---
     # We create the service instance manually here because Depends() doesn't work
     # in middleware signatures in the same way as in endpoints.
-    db_client = get_db_client()
+    db_client = get_async_db_client()
     idempotency_service = IdempotencyService(db_client)
     # --- End Dependency Injection ---
 
-    # 1. Check for a stored response
-    stored_response_data = idempotency_service.get_idempotent_response(idempotency_key, user_id)
-    if stored_response_data:
-        # If found, return the stored response immediately
-        return JSONResponse(
-            status_code=stored_response_data["status_code"],
-            content=json.loads(stored_response_data["body"]),
-        )
+    # 1. Coalesce with an identical request already running on this instance.
+    # Waiters replay the first request's stored response; if it produced
+    # nothing worth storing, they go on to run the request themselves.
+    in_flight_key = (user_id, idempotency_key)
+    while in_flight_key in _in_flight_requests:
+        stored_response_data = await asyncio.shield(_in_flight_requests[in_flight_key])
+        if stored_response_data:
+            return _replay_response(stored_response_data)
 
-    # 2. If no stored response, proceed with the actual endpoint
-    response = await call_next(request)
+    in_flight = asyncio.get_running_loop().create_future()
+    _in_flight_requests[in_flight_key] = in_flight
+    stored_response_data = None
+    try:
+        # 2. Claim the key in Firestore, or find a stored or in-progress request.
+        reservation = await _reserve_idempotency_key(idempotency_service, idempotency_key, user_id)
+        if reservation.outcome == ReservationOutcome.COMPLETED:
+            stored_response_data = reservation.response
+            return _replay_response(stored_response_data)
+        if reservation.outcome == ReservationOutcome.IN_PROGRESS:
+            return JSONResponse(
+                status_code=status.HTTP_409_CONFLICT,
+                content={"detail": "A request with this Idempotency-Key is already being processed."},
+                headers={"Retry-After": "1"},
+            )
 
-    # 3. Store the new response before returning it, but only for success codes
-    if 200 <= response.status_code < 300:
-        response_body = b""
-        async for chunk in response.body_iterator:
-            response_body += chunk
-        
-        response_data_to_store = {
-            "status_code": response.status_code,
-            "body": response_body.decode(),
-        }
-        idempotency_service.store_idempotent_response(idempotency_key, user_id, response_data_to_store)
-
-        # We need to construct a new response because the body of the original
-        # has been consumed by the iterator.
+        # 3. We own the key: proceed with the actual endpoint
+        try:
+            response = await call_next(request)
+        except Exception:
+            await idempotency_service.release(idempotency_key, user_id)
+            raise
+
+        # 4. Store the new response before returning it, but only for success codes
+        if 200 <= response.status_code < 300:
+            body, response = await _capture_response(response, settings.IDEMPOTENCY_MAX_CACHED_BODY_BYTES)
+            if body is None:
+                # Too large to store: the key stays completed, so the request
+                # is not run again, but replays answer 409 instead of the body.
+                stored_response_data = {"status_code": response.status_code, "bodyTooLarge": True}
+            else:
+                stored_response_data = {
+                    "status_code": response.status_code,
+                    "headers": [
+                        [name.decode("latin-1"), value.decode("latin-1")]
+                        for name, value in response.raw_headers
+                        if name != b"content-length"
+                    ],
+                    "body": body,
+                }
+            await idempotency_service.store_idempotent_response(idempotency_key, user_id, stored_response_data)
+            return response
+
+        # Failed requests are not stored; free the key so the client can retry.
+        await idempotency_service.release(idempotency_key, user_id)
+        return response
+    finally:
+        del _in_flight_requests[in_flight_key]
+        in_flight.set_result(stored_response_data)
+
+async def _reserve_idempotency_key(idempotency_service: IdempotencyService, idempotency_key: str, user_id: str) -> Reservation:
+    """
+    Claims the key, waiting a bounded time for a request that is in
+    progress on another instance to finish.
+    """
+    delay = PENDING_POLL_INITIAL_DELAY_SECONDS
+    deadline = asyncio.get_running_loop().time() + PENDING_WAIT_SECONDS
+    while True:
+        reservation = await idempotency_service.reserve(idempotency_key, user_id)
+        if reservation.outcome != ReservationOutcome.IN_PROGRESS:
+            return reservation
+        if asyncio.get_running_loop().time() + delay > deadline:
+            return reservation
+        await asyncio.sleep(delay)
+        delay *= 2
+
+async def _capture_response(response: Response, max_body_bytes: int) -> Tuple[Optional[bytes], Response]:
+    """
+    Reads the response body into a single buffer and returns it together
+    with a response that sends the same bytes and headers to the client.
+
+    If the body grows beyond `max_body_bytes`, buffering stops: the returned
+    body is None and the response streams the buffered chunks followed by
+    the rest of the original iterator.
+    """
+    chunks: List[bytes] = []
+    size = 0
+    body_iterator = response.body_iterator
+    async for chunk in body_iterator:
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > max_body_bytes:
+            async def stream_remaining():
+                for buffered in chunks:
+                    yield buffered
+                async for rest in body_iterator:
+                    yield rest
+
+            streaming = StreamingResponse(stream_remaining(), status_code=response.status_code)
+            streaming.raw_headers = list(response.raw_headers)
+            return None, streaming
+
+    body = b"".join(chunks)
+    captured = Response(content=body, status_code=response.status_code)
+    captured.raw_headers = list(response.raw_headers)
+    return body, captured
+
+def _replay_response(stored_response_data: dict) -> Response:
+    """Rebuilds a stored response, replaying the original bytes unchanged."""
+    if stored_response_data.get("bodyTooLarge"):
         return JSONResponse(
-            status_code=response.status_code,
-            content=json.loads(response_body.decode()) if response_body else None,
-            headers=dict(response.headers),
+            status_code=status.HTTP_409_CONFLICT,
+            content={"detail": "The request with this Idempotency-Key succeeded, but its response is too large to replay."},
         )
+    body = stored_response_data.get("body")
+    if isinstance(body, str):
+        # Responses stored before raw bytes were kept.
+        body = body.encode("utf-8")
+    stored_headers = stored_response_data.get("headers")
+    if stored_headers is None:
+        stored_headers = [["content-type", "application/json"]]
 
+    response = Response(content=body or b"", status_code=stored_response_data["status_code"])
+    # Keep the Content-Length computed for the replayed body.
+    content_length = [header for header in response.raw_headers if header[0] == b"content-length"]
+    response.raw_headers = [
+        (name.encode("latin-1"), value.encode("latin-1")) for name, value in stored_headers
+    ] + content_length
     return response
@@ -0,0 +1,6 @@
+"""
+The daily Monitoring Engine (product_spec.md#711-backend-business-process-alert-generation).
+
+Run it with `python -m src.monitoring`, or through the scheduler trigger
+endpoint in routers/monitoring_router.py.
+"""
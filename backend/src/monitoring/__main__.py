@@ -0,0 +1,48 @@
+"""
+Entry point of the daily monitoring job: `python -m src.monitoring` (run from `backend/`).
+
+Exits with status 1 if the run was aborted because market data was unavailable
+(M_E_1101), so the scheduler records the run as failed.
+"""
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+# --- Environment Loading ---
+# Same as main.py: the .env file for ENV must be loaded before the app modules are imported.
+ENV = os.environ.get("ENV", "dev")
+env_path = Path(__file__).parent.parent.parent / f".env.{ENV}"
+if env_path.exists():
+    print(f"DIAGNOSTIC: Loading environment from: {env_path}")
+    load_dotenv(dotenv_path=env_path)
+# --- End Environment Loading ---
+
+import argparse
+import asyncio
+import sys
+from datetime import date
+
+from ..firebase_setup import get_async_db_client, initialize_firebase_app
+from ..services.market_data_service import alpha_vantage_service
+from .pipeline import MonitoringAbortedError, MonitoringPipeline
+
+async def run(as_of: date = None, recompute: bool = False) -> int:
+    try:
+        await MonitoringPipeline(get_async_db_client()).run(as_of=as_of, recompute=recompute)
+        return 0
+    except MonitoringAbortedError:
+        return 1
+    finally:
+        await alpha_vantage_service.close_client()
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m src.monitoring", description="Runs the daily monitoring job.")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="The day to run for (YYYY-MM-DD); defaults to today.")
+    parser.add_argument("--recompute", action="store_true", help="Recompute all indicators from history instead of streaming them.")
+    args = parser.parse_args()
+
+    initialize_firebase_app()
+    sys.exit(asyncio.run(run(args.date, args.recompute)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Compiles rule sets into predicates for the daily evaluation.
+
+`ConditionDB.parameters` is a free-form dict and `ConditionType` a string
+enum, so checking a condition as stored means looking up, converting and
+branching on its parameters for every holding every day. The compiler does
+that once per rule set:
+
+- each condition becomes a closure whose parameters are validated and
+  converted up front and whose indicator columns are resolved to indexes
+  into `TickerMarket.values`;
+- each rule becomes a tuple of those closures, combined with short-circuiting
+  AND (stop at the first unmet condition) or OR (stop at the first met one).
+
+A condition that fails validation is reported once, when its rule set is
+compiled, and is never met. Compiled rule sets are cached by `ruleSetId` and
+`modifiedAt`, so an edited rule set is recompiled on its next evaluation.
+Reference: product_spec.md#622-supported-conditions
+"""
+from dataclasses import dataclass
+from operator import gt, lt
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from ..api.models import ConditionType, LogicalOperator, RuleStatus
+from ..core.cache import TTLCache
+from ..core.internal_models import ConditionDB, HoldingDB, RuleDB, RuleSetDB
+from ..core.valuation import Valuation
+from .market import COLUMN_INDEX, TickerMarket
+
+# Rule sets compiled per process. The key changes with every edit, so the TTL
+# only bounds how long a deleted rule set's entry lingers.
+COMPILED_RULE_SET_CACHE_MAX_SIZE = 10_000
+COMPILED_RULE_SET_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+LEVEL_OPERATORS = ("below", "above")
+CROSS_OPERATORS = ("cross_above", "cross_below")
+# The indicator periods stored per day (see MarketDataDB).
+SMA_PERIODS = (7, 20, 50, 200)
+RSI_PERIODS = (14,)
+
+_CLOSE = COLUMN_INDEX["close"]
+
+class InvalidConditionError(ValueError):
+    """A condition's parameters do not fit its type."""
+
+@dataclass
+class EvaluationContext:
+    """What the conditions of one holding are evaluated against."""
+    holding: HoldingDB
+    market: TickerMarket
+    valuation: Valuation
+    vix: Optional[TickerMarket] = None
+
+Check = Callable[[EvaluationContext], Optional[float]]
+
+@dataclass(frozen=True)
+class CompiledCondition:
+    """
+    A condition ready to check: `check` returns the actual value that met it,
+    or None. `key` identifies a condition that depends only on market data
+    (equal parameters, equal key); it is None for per-holding conditions.
+    """
+    condition: ConditionDB
+    check: Check
+    key: Optional[Tuple[Hashable, ...]] = None
+
+@dataclass(frozen=True)
+class CompiledRule:
+    rule: RuleDB
+    conditions: Tuple[CompiledCondition, ...]
+    require_all: bool
+
+    def evaluate(
+        self,
+        context: EvaluationContext,
+        check: Optional[Callable[[CompiledCondition, EvaluationContext], Optional[float]]] = None,
+    ) -> Optional[List[Tuple[CompiledCondition, float]]]:
+        """
+        The met conditions with their actual values if the rule triggered,
+        otherwise None. With OR only the first met condition is returned.
+        `check` runs one condition; the engine passes one that shares results.
+        """
+        met = []
+        for compiled in self.conditions:
+            actual = compiled.check(context) if check is None else check(compiled, context)
+            if actual is None:
+                if self.require_all:
+                    return None
+                continue
+            met.append((compiled, actual))
+            if not self.require_all:
+                break
+        return met or None
+
+@dataclass(frozen=True)
+class CompiledRuleSet:
+    """A rule set's ENABLED rules that can trigger, compiled."""
+    rule_set: RuleSetDB
+    rules: Tuple[CompiledRule, ...]
+
+# --- Parameters ---
+
+def _number(parameters: Dict, name: str, default: Optional[float] = None) -> float:
+    value = parameters.get(name, default)
+    if isinstance(value, bool):
+        raise InvalidConditionError(f"'{name}' must be a number, got {value!r}")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise InvalidConditionError(f"'{name}' must be a number, got {value!r}") from None
+
+def _choice(parameters: Dict, name: str, choices: Tuple[str, ...]) -> str:
+    value = parameters.get(name)
+    if value not in choices:
+        raise InvalidConditionError(f"'{name}' must be one of {', '.join(choices)}, got {value!r}")
+    return value
+
+def _period(parameters: Dict, supported: Tuple[int, ...], default: Optional[int] = None) -> int:
+    period = _number(parameters, "period", default)
+    if period not in supported:
+        raise InvalidConditionError(f"'period' must be one of {', '.join(map(str, supported))}, got {parameters.get('period')!r}")
+    return int(period)
+
+# --- Checks ---
+
+def _level(column: int, above: bool, threshold: float, on_vix: bool = False) -> Check:
+    compare = gt if above else lt
+
+    def check(context: EvaluationContext) -> Optional[float]:
+        market = context.vix if on_vix else context.market
+        if market is None:
+            return None
+        value = market.values[-1, column]
+        # NaN (a missing indicator) compares false.
+        return float(value) if compare(value, threshold) else None
+    return check
+
+def _crossover(column: int, reference: int, reported: int, above: bool) -> Check:
+    """Whether `column` crossed `reference` between the previous and the latest day."""
+    def check(context: EvaluationContext) -> Optional[float]:
+        values = context.market.values
+        if len(values) < 2:
+            return None
+        previous, latest = values[-2], values[-1]
+        if above:
+            met = previous[column] <= previous[reference] and latest[column] > latest[reference]
+        else:
+            met = previous[column] >= previous[reference] and latest[column] < latest[reference]
+        return float(latest[reported]) if met else None
+    return check
+
+def _drawdown_at_least(percentage: float, high_of: Callable[[EvaluationContext], Optional[float]]) -> Check:
+    def check(context: EvaluationContext) -> Optional[float]:
+        high = high_of(context)
+        if not high:
+            return None
+        drawdown = (high - context.market.values[-1, _CLOSE]) / high * 100
+        return float(drawdown) if drawdown >= percentage else None
+    return check
+
+def _trailing_stop(percentage: float) -> Check:
+    """
+    Measures each lot's drawdown from the highest price since its own
+    purchaseDate and weighs the lots by cost, so a lot bought after a peak
+    is not held against it.
+    """
+    def check(context: EvaluationContext) -> Optional[float]:
+        close = context.market.values[-1, _CLOSE]
+        weighted = total_cost = 0.0
+        for lot in context.holding.lots:
+            cost = lot.quantity * lot.purchasePrice
+            high = context.market.high_since(lot.purchaseDate.date())
+            # A lot bought after the latest bar has not drawn down yet.
+            if high:
+                weighted += cost * (high - close) / high * 100
+            total_cost += cost
+        if not total_cost:
+            return None
+        drawdown = weighted / total_cost
+        return float(drawdown) if drawdown >= percentage else None
+    return check
+
+def _gain_at_least(percentage: float) -> Check:
+    def check(context: EvaluationContext) -> Optional[float]:
+        valuation = context.valuation
+        gain = valuation.gainLossPercentage
+        return gain if valuation.totalCost and gain >= percentage else None
+    return check
+
+def _loss_at_least(percentage: float) -> Check:
+    def check(context: EvaluationContext) -> Optional[float]:
+        valuation = context.valuation
+        gain = valuation.gainLossPercentage
+        return gain if valuation.totalCost and gain <= -percentage else None
+    return check
+
+def _never(context: EvaluationContext) -> Optional[float]:
+    return None
+
+# --- Compilation ---
+
+def _compile_check(kind: ConditionType, parameters: Dict) -> Tuple[Check, Optional[Tuple[Hashable, ...]]]:
+    """Returns the condition's check and, for market conditions, its normalized parameters."""
+    if kind == ConditionType.RSI_LEVEL:
+        period = _period(parameters, RSI_PERIODS, default=14)
+        operator = _choice(parameters, "operator", LEVEL_OPERATORS)
+        threshold = _number(parameters, "threshold")
+        return _level(COLUMN_INDEX[f"rsi{period}"], operator == "above", threshold), (period, operator, threshold)
+    if kind in (ConditionType.PRICE_VS_SMA, ConditionType.PRICE_VS_VWMA):
+        period = _period(parameters, SMA_PERIODS)
+        operator = _choice(parameters, "operator", CROSS_OPERATORS)
+        average = COLUMN_INDEX[f"{'sma' if kind == ConditionType.PRICE_VS_SMA else 'vwma'}{period}"]
+        return _crossover(_CLOSE, average, _CLOSE, operator == "cross_above"), (period, operator)
+    if kind == ConditionType.MACD_CROSSOVER:
+        operator = _choice(parameters, "operator", CROSS_OPERATORS)
+        check = _crossover(COLUMN_INDEX["macd_value"], COLUMN_INDEX["macd_signal"], COLUMN_INDEX["macd_histogram"], operator == "cross_above")
+        return check, (operator,)
+    if kind == ConditionType.VIX_LEVEL:
+        operator = _choice(parameters, "operator", LEVEL_OPERATORS)
+        threshold = _number(parameters, "threshold")
+        return _level(_CLOSE, operator == "above", threshold, on_vix=True), (operator, threshold)
+    if kind == ConditionType.DRAWDOWN_FROM_HIGH:
+        percentage = _number(parameters, "percentage")
+        return _drawdown_at_least(percentage, lambda context: context.market.high_52_weeks()), (percentage,)
+    if kind == ConditionType.PROFIT_TARGET:
+        return _gain_at_least(_number(parameters, "percentage")), None
+    if kind == ConditionType.STOP_LOSS:
+        return _loss_at_least(_number(parameters, "percentage")), None
+    if kind == ConditionType.TRAILING_STOP_LOSS:
+        return _trailing_stop(_number(parameters, "percentage")), None
+    raise InvalidConditionError(f"unsupported condition type {kind!r}")
+
+def compile_condition(condition: ConditionDB) -> CompiledCondition:
+    """Compiles one condition; an invalid one is reported and compiles to a check that is never met."""
+    try:
+        check, key_parameters = _compile_check(condition.type, condition.parameters)
+    except InvalidConditionError as e:
+        print(f"DIAGNOSTIC: Condition {condition.conditionId} has invalid parameters: {e}")
+        return CompiledCondition(condition, _never)
+    key = (condition.type, *key_parameters) if key_parameters is not None else None
+    return CompiledCondition(condition, check, key)
+
+def compile_rule(rule: RuleDB) -> Optional[CompiledRule]:
+    """
+    Compiles an ENABLED rule. Returns None for a rule that can never trigger:
+    a paused one, one without conditions, or an AND rule with an invalid condition.
+    """
+    if rule.status != RuleStatus.ENABLED or not rule.conditions:
+        return None
+    require_all = rule.logicalOperator == LogicalOperator.AND
+    conditions = [compile_condition(condition) for condition in rule.conditions]
+    if require_all and any(compiled.check is _never for compiled in conditions):
+        return None
+    conditions = tuple(compiled for compiled in conditions if compiled.check is not _never)
+    return CompiledRule(rule, conditions, require_all) if conditions else None
+
+_compiled_rule_sets = TTLCache(maxsize=COMPILED_RULE_SET_CACHE_MAX_SIZE, ttl_seconds=COMPILED_RULE_SET_CACHE_TTL_SECONDS)
+
+def compile_rule_set(rule_set: RuleSetDB) -> CompiledRuleSet:
+    """Compiles a rule set, or returns its cached compilation for the same `modifiedAt`."""
+    key = (str(rule_set.ruleSetId), rule_set.modifiedAt)
+    compiled = _compiled_rule_sets.get(key)
+    if compiled is None:
+        rules = (compile_rule(rule) for rule in rule_set.rules)
+        compiled = CompiledRuleSet(rule_set, tuple(rule for rule in rules if rule is not None))
+        _compiled_rule_sets.set(key, compiled)
+    return compiled
+
+def clear_compiled_rule_sets():
+    _compiled_rule_sets.clear()
@@ -0,0 +1,89 @@
+"""
+M_2000 evaluated ticker by ticker instead of holding by holding.
+
+The sequence in the spec fetches a holding, then its rule set, then checks
+each condition, so a ticker held by many users has its market data read and
+the same conditions checked once per holding. The engine inverts the loop:
+the effective rules of all holdings are grouped by ticker, the ticker's
+market data is read once (see market.py), and each distinct market
+condition of a ticker, e.g. `RSI_LEVEL below 30` on AAPL, is checked once
+and its result fanned out to every rule that contains it. Conditions are
+told apart by the key the compiler derives from their normalized parameters.
+
+Only conditions that depend on nothing but market data are shared. VIX_LEVEL
+conditions depend on no ticker at all and are shared across the whole run;
+PROFIT_TARGET, STOP_LOSS and TRAILING_STOP_LOSS depend on the holding's lots
+and are checked per holding.
+Reference: product_spec.md#732-m_2000-strategy-rule-evaluation
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from ..api.models import ConditionType
+from ..core.internal_models import AlertDB, HoldingDB, RuleSetDB
+from ..core.valuation import Valuation
+from .compiler import CompiledCondition, EvaluationContext, compile_rule_set
+from .evaluation import evaluate_holding
+from .market import TickerMarket
+
+@dataclass
+class Subscription:
+    """A holding subscribed to its ticker through its effective rule set."""
+    holding: HoldingDB
+    rule_set: RuleSetDB
+    valuation: Valuation
+
+@dataclass
+class EngineStats:
+    """How many condition checks were done and how many were answered from a shared result."""
+    evaluated: int = 0
+    reused: int = 0
+    per_holding: int = 0
+
+def group_by_ticker(subscriptions: Iterable[Subscription]) -> Dict[str, List[Subscription]]:
+    grouped: Dict[str, List[Subscription]] = {}
+    for subscription in subscriptions:
+        grouped.setdefault(subscription.holding.ticker, []).append(subscription)
+    return grouped
+
+class RuleEngine:
+    """
+    Evaluates the rules subscribed to each ticker of a run.
+    One instance lives for the whole run, so VIX_LEVEL results are shared by all tickers.
+    """
+    def __init__(self, vix: Optional[TickerMarket] = None):
+        self.vix = vix
+        self.stats = EngineStats()
+        self._vix_results: Dict[Tuple[Hashable, ...], Optional[float]] = {}
+
+    def evaluate_ticker(self, market: TickerMarket, subscriptions: List[Subscription], day: date) -> List[AlertDB]:
+        """Evaluates every subscription of one ticker; returns the alerts of the rules that triggered."""
+        results: Dict[Tuple[Hashable, ...], Optional[float]] = {}
+
+        def check(compiled: CompiledCondition, context: EvaluationContext) -> Optional[float]:
+            if compiled.key is None:
+                self.stats.per_holding += 1
+                return compiled.check(context)
+            shared = self._vix_results if compiled.condition.type == ConditionType.VIX_LEVEL else results
+            if compiled.key in shared:
+                self.stats.reused += 1
+            else:
+                self.stats.evaluated += 1
+                shared[compiled.key] = compiled.check(context)
+            return shared[compiled.key]
+
+        alerts: List[AlertDB] = []
+        for subscription in subscriptions:
+            context = EvaluationContext(subscription.holding, market, subscription.valuation, self.vix)
+            alerts.extend(evaluate_holding(compile_rule_set(subscription.rule_set), context, day, check))
+        return alerts
+
+    def evaluate(self, markets: Dict[str, TickerMarket], subscriptions: Iterable[Subscription], day: date) -> List[AlertDB]:
+        """Evaluates the subscriptions of all tickers in `markets`; others are skipped."""
+        alerts: List[AlertDB] = []
+        for ticker, ticker_subscriptions in group_by_ticker(subscriptions).items():
+            market = markets.get(ticker)
+            if market is not None:
+                alerts.extend(self.evaluate_ticker(market, ticker_subscriptions, day))
+        return alerts
@@ -0,0 +1,97 @@
+"""
+M_2000/M_3000: evaluates each holding's effective rule set and builds alerts.
+
+Rule sets are evaluated in their compiled form (see compiler.py). A
+condition is checked against the holding's ticker (see market.py), the
+system-required VIX proxy, and the holding's own valuation for the
+position-based SELL conditions. A rule triggers when its ENABLED conditions
+are met according to its `logicalOperator`.
+
+Alert IDs are derived from the holding, the rule and the day, so re-running
+the job for a day overwrites that day's alerts instead of duplicating them.
+Reference: product_spec.md#622-supported-conditions
+"""
+import uuid
+from datetime import date, datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from ..api.models import RuleType
+from ..core.internal_models import (
+    AlertDB,
+    ConditionDB,
+    MarketDataSnapshotDB,
+    RuleDB,
+    RuleSetDB,
+    TaxInfoDB,
+    TriggeredConditionDB,
+)
+from ..core.unit_of_work import MAX_BATCH_WRITES, unit_of_work
+from ..core.utils import convert_uuids_to_str
+from .compiler import CompiledCondition, CompiledRuleSet, EvaluationContext, compile_condition, compile_rule
+
+ALERT_ID_NAMESPACE = uuid.UUID("5d3c1f3e-6f55-4c61-9a55-3f4cb0a5e7a1")
+
+def evaluate_condition(condition: ConditionDB, context: EvaluationContext) -> Optional[float]:
+    """
+    Returns the actual value that met the condition, or None if it is not
+    met (or cannot be evaluated, e.g. for lack of data). Compiles the
+    condition on every call; the job evaluates compiled rule sets instead.
+    """
+    return compile_condition(condition).check(context)
+
+def triggered_conditions(met: List[Tuple[CompiledCondition, float]]) -> List[TriggeredConditionDB]:
+    return [
+        TriggeredConditionDB(type=compiled.condition.type, parameters=compiled.condition.parameters, actualValue=actual)
+        for compiled, actual in met
+    ]
+
+def evaluate_rule(rule: RuleDB, context: EvaluationContext) -> Optional[List[TriggeredConditionDB]]:
+    """The conditions that triggered the rule, or None if it did not trigger."""
+    compiled = compile_rule(rule)
+    met = compiled.evaluate(context) if compiled is not None else None
+    return triggered_conditions(met) if met else None
+
+def build_alert(rule_set: RuleSetDB, rule: RuleDB, context: EvaluationContext, triggered: List[TriggeredConditionDB], day: date) -> AlertDB:
+    holding, latest, valuation = context.holding, context.market.latest, context.valuation
+    tax_info = None
+    if rule.ruleType == RuleType.SELL:
+        pre_tax = valuation.preTaxGainLoss
+        tax_info = TaxInfoDB(
+            preTaxProfit=pre_tax,
+            capitalGainTax=valuation.capitalGainTax,
+            afterTaxProfit=valuation.afterTaxGainLoss,
+            appliedTaxRate=valuation.capitalGainTax / pre_tax * 100 if pre_tax > 0 else 0.0,
+        )
+    return AlertDB(
+        alertId=uuid.uuid5(ALERT_ID_NAMESPACE, f"{holding.holdingId}:{rule.ruleId}:{day.isoformat()}"),
+        userId=holding.userId,
+        holdingId=holding.holdingId,
+        ruleSetId=rule_set.ruleSetId,
+        ruleId=rule.ruleId,
+        triggeredAt=datetime.now(timezone.utc),
+        marketDataSnapshot=MarketDataSnapshotDB(closePrice=latest.close, rsi14=latest.rsi14, sma200=latest.sma200),
+        triggeredConditions=triggered,
+        taxInfo=tax_info,
+    )
+
+def evaluate_holding(
+    compiled: CompiledRuleSet,
+    context: EvaluationContext,
+    day: date,
+    check: Optional[Callable[[CompiledCondition, EvaluationContext], Optional[float]]] = None,
+) -> List[AlertDB]:
+    """Evaluates a compiled rule set for one holding; `check` is passed on to CompiledRule.evaluate."""
+    alerts = []
+    for rule in compiled.rules:
+        met = rule.evaluate(context, check)
+        if met:
+            alerts.append(build_alert(compiled.rule_set, rule.rule, context, triggered_conditions(met), day))
+    return alerts
+
+async def write_alerts(db_client, alerts: List[AlertDB]):
+    """Persists alerts to the top-level `alerts` collection (M_I_3001)."""
+    alerts_collection = db_client.collection("alerts")
+    for start in range(0, len(alerts), MAX_BATCH_WRITES):
+        async with unit_of_work(db_client) as uow:
+            for alert in alerts[start:start + MAX_BATCH_WRITES]:
+                uow.set(alerts_collection.document(str(alert.alertId)), convert_uuids_to_str(alert.model_dump()))
@@ -0,0 +1,85 @@
+"""
+The market data a monitoring run evaluates per ticker.
+
+After a ticker's batch is synced, its latest two daily documents (crossover
+conditions compare today with the previous trading day) and its columnar
+price history are read once and shared by the snapshot and evaluation
+stages. The 52-week high comes with the latest document; highs since a
+purchase are answered by a HighsIndex over the history (see highs_index.py).
+Reference: product_spec.md#72-data-models
+"""
+import asyncio
+from dataclasses import dataclass
+from datetime import date
+from functools import cached_property
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..core.internal_models import MarketDataDB
+from ..services.market_data_service.highs_index import HighsIndex
+from ..services.market_data_service.market_data_sync_service import MarketDataSyncService
+from ..services.market_data_service.price_history import PriceHistory
+
+# The columns of TickerMarket.values; compiled conditions refer to them by index.
+INDICATOR_COLUMNS = (
+    "close",
+    "sma7", "sma20", "sma50", "sma200",
+    "vwma7", "vwma20", "vwma50", "vwma200",
+    "rsi14",
+    "macd_value", "macd_signal", "macd_histogram",
+)
+COLUMN_INDEX = {name: index for index, name in enumerate(INDICATOR_COLUMNS)}
+_MACD_FIELDS = ("value", "signal", "histogram")
+
+def _indicator_row(row: MarketDataDB) -> List[float]:
+    """The row's INDICATOR_COLUMNS, NaN where an indicator is missing."""
+    values = [getattr(row, name) for name in INDICATOR_COLUMNS[:COLUMN_INDEX["macd_value"]]]
+    values += [row.macd.get(name) if row.macd else None for name in _MACD_FIELDS]
+    return [np.nan if value is None else float(value) for value in values]
+
+@dataclass
+class TickerMarket:
+    """One ticker's latest daily documents (oldest first) and price history."""
+    ticker: str
+    rows: List[MarketDataDB]
+    history: PriceHistory
+
+    @property
+    def latest(self) -> MarketDataDB:
+        return self.rows[-1]
+
+    @property
+    def previous(self) -> Optional[MarketDataDB]:
+        return self.rows[-2] if len(self.rows) > 1 else None
+
+    @cached_property
+    def values(self) -> np.ndarray:
+        """The rows as a (days, len(INDICATOR_COLUMNS)) float array, oldest first."""
+        return np.array([_indicator_row(row) for row in self.rows], dtype=np.float64).reshape(len(self.rows), len(INDICATOR_COLUMNS))
+
+    @cached_property
+    def highs(self) -> HighsIndex:
+        return HighsIndex(self.history)
+
+    def high_52_weeks(self) -> Optional[float]:
+        """The stored 52-week high of the latest day, or else the index's."""
+        if self.latest.high52Weeks is not None:
+            return self.latest.high52Weeks
+        return self.highs.high_52_weeks()
+
+    def high_since(self, day: date) -> Optional[float]:
+        """The highest price on or after `day`."""
+        return self.highs.high_since(day)
+
+async def load_markets(sync_service: MarketDataSyncService, tickers: List[str], day: date) -> Dict[str, TickerMarket]:
+    """
+    Reads the market of every ticker with stored data up to `day`. The history
+    is cut at `day` too, so a rerun for a past day does not compare that day's
+    close with later highs.
+    """
+    rows, histories = await asyncio.gather(
+        sync_service.load_latest(tickers, day, days=2),
+        sync_service.history_store.load_many(tickers),
+    )
+    return {ticker: TickerMarket(ticker, ticker_rows, histories[ticker].until(day)) for ticker, ticker_rows in rows.items()}
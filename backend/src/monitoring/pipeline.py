@@ -0,0 +1,378 @@
+"""
+The daily monitoring job as a staged asyncio pipeline.
+
+The M_1000/M_2000 sequence is sync, then indicators, then snapshots, then
+evaluation. Run one stage after another over every ticker and the job takes
+as long as the sum of the stages; the download alone is bounded by the
+provider's quota. Here tickers move through the stages in batches:
+
+    sync ──▶ indicators ──▶ snapshots ──▶ evaluation
+         queue          queue         queue
+
+- **sync** requests the missing days of a batch (MarketDataSyncService.fetch).
+- **indicators** computes and stores them (MarketDataSyncService.store), then
+  reads the batch's latest market data once for the stages after it.
+- **snapshots** values the batch's holdings, writes their snapshots, and
+  writes a portfolio's snapshot once all of its holdings are valued. One
+  BulkWriter (see snapshots.py) serves the stage for the whole run.
+- **evaluation** evaluates the effective rules of the batch's holdings
+  ticker by ticker (see engine.py) and writes the alerts.
+
+Each stage is one task, and the queues between them are bounded, so holdings
+of tickers that are already synced are evaluated while later tickers are
+still downloading, and a slow stage holds back the ones before it instead of
+buffering the whole run in memory. The system-required tickers (e.g. the VIX
+proxy) go first, in the first batch, so VIX_LEVEL conditions can be checked
+for every later batch.
+Reference: product_spec.md#711-backend-business-process-alert-generation
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+from ..core.config_loader import get_market_monitor_config, get_tax_config
+from ..core.config_models import TaxConfig
+from ..core.chart_series import ChartSeriesStore
+from ..core.internal_models import HoldingDB
+from ..core.valuation import LotBook, Valuation
+from ..messages import get_message
+from ..services.market_data_service.alpha_vantage_service import MarketDataUnavailableError
+from ..services.market_data_service.market_data_sync_service import MarketDataSyncService, SyncBatch, latest_trading_day
+from ..settings import settings
+from .engine import RuleEngine, Subscription
+from .evaluation import write_alerts
+from .market import TickerMarket, load_markets
+from .snapshots import SnapshotWriter, holding_snapshot, portfolio_snapshot
+from .universe import MonitoringUniverse, load_universe
+
+STAGES = ("sync", "indicators", "snapshots", "evaluation")
+# Marks the end of a queue.
+_DONE = object()
+
+class MonitoringAbortedError(Exception):
+    """The market data provider was unavailable; the run was aborted (M_E_1101)."""
+
+@dataclass
+class StageTiming:
+    """How long a stage spent working, and when it finished relative to the run's start."""
+    batches: int = 0
+    busy_seconds: float = 0.0
+    finished_after_seconds: float = 0.0
+
+@dataclass
+class MonitoringRunResult:
+    """The outcome of one monitoring run."""
+    day: date
+    tickers: int = 0
+    holdings: int = 0
+    failed_tickers: Dict[str, str] = field(default_factory=dict)
+    holding_snapshots: int = 0
+    portfolio_snapshots: int = 0
+    # itemId (holding or portfolio) -> reason (M_W_1052).
+    snapshot_failures: Dict[str, str] = field(default_factory=dict)
+    # Time spent in the BulkWriter writing the snapshots.
+    snapshot_write_seconds: float = 0.0
+    alerts: int = 0
+    # Condition checks done, and those answered from another holding's check of the same ticker.
+    conditions_evaluated: int = 0
+    conditions_reused: int = 0
+    stages: Dict[str, StageTiming] = field(default_factory=lambda: {name: StageTiming() for name in STAGES})
+    elapsed_seconds: float = 0.0
+
+    @property
+    def snapshots_per_second(self) -> float:
+        written = self.holding_snapshots + self.portfolio_snapshots
+        return written / self.snapshot_write_seconds if self.snapshot_write_seconds else 0.0
+
+@dataclass
+class _TickerBatch:
+    """A batch of tickers that has passed the indicators stage."""
+    markets: Dict[str, TickerMarket]
+    holdings: List[HoldingDB]
+    valuations: Dict[str, Valuation] = field(default_factory=dict)
+
+class MonitoringPipeline:
+    """
+    Runs the daily monitoring job over all holdings.
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+    """
+    def __init__(
+        self,
+        db_client,
+        sync_service: Optional[MarketDataSyncService] = None,
+        tax_config: Optional[TaxConfig] = None,
+        system_tickers: Optional[List[str]] = None,
+        batch_size: int = settings.MONITORING_BATCH_SIZE,
+        queue_size: int = settings.MONITORING_QUEUE_SIZE,
+    ):
+        self.db = db_client
+        self.sync_service = sync_service or MarketDataSyncService(db_client)
+        self.tax_config = tax_config or get_tax_config()
+        self.system_tickers = system_tickers if system_tickers is not None else get_market_monitor_config().system_required_tickers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.snapshot_writer = SnapshotWriter(db_client)
+        self.chart_series_store = ChartSeriesStore(db_client)
+
+    def _batches(self, universe: MonitoringUniverse) -> List[List[str]]:
+        """Splits the tickers into batches; the first one holds all system-required tickers."""
+        tickers = universe.tickers()
+        first = max(self.batch_size, len(universe.system_tickers))
+        batches = [tickers[:first]]
+        batches += [tickers[start:start + self.batch_size] for start in range(first, len(tickers), self.batch_size)]
+        return [batch for batch in batches if batch]
+
+    async def run(self, as_of: Optional[date] = None, recompute: bool = False) -> MonitoringRunResult:
+        """
+        Runs all four stages for the trading day of `as_of` (default: today, UTC).
+
+        Raises:
+            MonitoringAbortedError: If a batch could not be fetched at all
+                because the provider was unavailable.
+        """
+        started = time.perf_counter()
+        day = latest_trading_day(as_of or datetime.now(timezone.utc).date())
+        universe = await load_universe(self.db, self.system_tickers)
+        result = MonitoringRunResult(day=day, holdings=len(universe.holdings))
+        batches = self._batches(universe)
+        result.tickers = sum(len(batch) for batch in batches)
+        print(f"DIAGNOSTIC: Monitoring run for {day}: {len(universe.holdings)} holdings, {result.tickers} tickers in {len(batches)} batches")
+
+        fetched: asyncio.Queue = asyncio.Queue(self.queue_size)
+        synced: asyncio.Queue = asyncio.Queue(self.queue_size)
+        valued: asyncio.Queue = asyncio.Queue(self.queue_size)
+        holdings_by_ticker = universe.holdings_by_ticker()
+
+        async def timed(stage: str, work):
+            """Runs one batch of a stage's work and adds its duration to the stage."""
+            start = time.perf_counter()
+            try:
+                return await work
+            finally:
+                timing = result.stages[stage]
+                timing.batches += 1
+                timing.busy_seconds += time.perf_counter() - start
+
+        def finished(stage: str):
+            result.stages[stage].finished_after_seconds = time.perf_counter() - started
+
+        # A stage that fails raises out of the task group, which cancels the
+        # others; the end-of-queue marker is only sent on success.
+        async def sync_stage():
+            for tickers in batches:
+                batch = await timed("sync", self.sync_service.fetch(tickers, day, recompute))
+                self._check_available(batch)
+                await fetched.put(batch)
+            finished("sync")
+            await fetched.put(_DONE)
+
+        async def indicators_stage():
+            while (batch := await fetched.get()) is not _DONE:
+                await synced.put(await timed("indicators", self._store(batch, holdings_by_ticker, result)))
+            finished("indicators")
+            await synced.put(_DONE)
+
+        async def snapshots_stage():
+            snapshots = _PortfolioSnapshots(universe.holdings_per_portfolio())
+            async with self.snapshot_writer:
+                while (batch := await synced.get()) is not _DONE:
+                    await timed("snapshots", self._snapshot(batch, snapshots, day, result))
+                    await valued.put(batch)
+                await self._reset_empty_portfolios(universe.portfolios_without_holdings(), day)
+            self._finish_snapshots(snapshots, result)
+            finished("snapshots")
+            await valued.put(_DONE)
+
+        async def evaluation_stage():
+            engine = RuleEngine()
+            while (batch := await valued.get()) is not _DONE:
+                if engine.vix is None:
+                    engine.vix = next((batch.markets[ticker] for ticker in self.system_tickers if ticker in batch.markets), None)
+                result.alerts += await timed("evaluation", self._evaluate(batch, universe, engine, day))
+            result.conditions_evaluated = engine.stats.evaluated + engine.stats.per_holding
+            result.conditions_reused = engine.stats.reused
+            finished("evaluation")
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for stage in (sync_stage, indicators_stage, snapshots_stage, evaluation_stage):
+                    group.create_task(stage())
+        except* MonitoringAbortedError:
+            print(f"DIAGNOSTIC: {get_message('M_E_1101')}")
+            raise MonitoringAbortedError(get_message("M_E_1101")) from None
+
+        result.elapsed_seconds = time.perf_counter() - started
+        self._report(result)
+        return result
+
+    @staticmethod
+    def _check_available(batch: SyncBatch):
+        """Aborts the run when nothing of a batch could be fetched because the provider is down."""
+        errors = list(batch.fetch_errors.values())
+        fetched_any = bool(batch.updates) or len(batch.result.written) > 0
+        if errors and not fetched_any and all(isinstance(error, MarketDataUnavailableError) for error in errors):
+            raise MonitoringAbortedError(get_message("M_E_1101"))
+
+    async def _store(self, batch: SyncBatch, holdings_by_ticker: Dict[str, List[HoldingDB]], result: MonitoringRunResult) -> _TickerBatch:
+        sync_result = await self.sync_service.store(batch)
+        result.failed_tickers.update(sync_result.failed)
+        ready = [ticker for ticker in [*sync_result.up_to_date, *sync_result.written] if ticker not in sync_result.failed]
+        markets = await load_markets(self.sync_service, ready, batch.target_day)
+        holdings = [
+            holding
+            for ticker in [*ready, *sync_result.failed]
+            for holding in holdings_by_ticker.get(ticker, [])
+        ]
+        return _TickerBatch(markets, holdings)
+
+    async def _snapshot(self, batch: _TickerBatch, snapshots: "_PortfolioSnapshots", day: date, result: MonitoringRunResult):
+        """Values the batch's holdings and writes their snapshots and those of completed portfolios."""
+        book = LotBook(batch.holdings)
+        prices = {ticker: market.latest.close for ticker, market in batch.markets.items()}
+        try:
+            valued = book.value(prices, day, self.tax_config)
+        except ValueError as e:
+            # An invalid tax rule condition affects every holding of the batch.
+            for holding in book.holdings:
+                self._snapshot_failed(result, str(holding.holdingId), e)
+                snapshots.fail(str(holding.portfolioId))
+            return
+        holding_snapshots = []
+        for index, holding in enumerate(book.holdings):
+            holding_id, portfolio_id = str(holding.holdingId), str(holding.portfolioId)
+            try:
+                if not valued.holding_priced[index]:
+                    raise ValueError(f"no market data for {holding.ticker}")
+                valuation = valued.holding(index)
+                holding_snapshots.append((holding_id, holding_snapshot(valuation, batch.markets[holding.ticker].latest, day)))
+            except Exception as e:
+                self._snapshot_failed(result, holding_id, e)
+                snapshots.fail(portfolio_id)
+                continue
+            batch.valuations[holding_id] = valuation
+
+        written = await self.snapshot_writer.write("holdings", holding_snapshots, day)
+        result.snapshot_write_seconds += written.elapsed_seconds
+        failures = written.failures
+        for holding in batch.holdings:
+            holding_id = str(holding.holdingId)
+            if holding_id in failures:
+                self._snapshot_failed(result, holding_id, failures[holding_id])
+                snapshots.fail(str(holding.portfolioId))
+            elif holding_id in batch.valuations:
+                snapshots.add(str(holding.portfolioId), batch.valuations[holding_id])
+        result.holding_snapshots += written.written
+        await self._advance_charts("holdings", {
+            holding_id: valuation for holding_id, valuation in batch.valuations.items() if holding_id not in failures
+        }, day)
+        await self._write_portfolio_snapshots(snapshots.take_completed(), day, result)
+
+    def _finish_snapshots(self, snapshots: "_PortfolioSnapshots", result: MonitoringRunResult):
+        """Reports the portfolios left incomplete by holdings without a snapshot."""
+        for portfolio_id in snapshots.incomplete():
+            self._snapshot_failed(result, portfolio_id, "one or more of its holdings could not be valued")
+
+    async def _write_portfolio_snapshots(self, valuations: Dict[str, Valuation], day: date, result: MonitoringRunResult):
+        if not valuations:
+            return
+        pairs = [(portfolio_id, portfolio_snapshot(valuation, day)) for portfolio_id, valuation in valuations.items()]
+        written = await self.snapshot_writer.write("portfolios", pairs, day)
+        result.snapshot_write_seconds += written.elapsed_seconds
+        for portfolio_id, error in written.failures.items():
+            self._snapshot_failed(result, portfolio_id, error)
+        result.portfolio_snapshots += written.written
+        refreshed = await self.snapshot_writer.refresh_portfolio_valuations(
+            {portfolio_id: valuations[portfolio_id] for portfolio_id, _ in pairs if portfolio_id not in written.failures}, day,
+        )
+        for portfolio_id, error in refreshed.failures.items():
+            print(f"DIAGNOSTIC: Failed to refresh the valuation of portfolio {portfolio_id}: {error}")
+        # A portfolio whose valuation could not be refreshed was most likely deleted during the run.
+        await self._advance_charts("portfolios", {
+            portfolio_id: valuations[portfolio_id] for portfolio_id, _ in pairs
+            if portfolio_id not in written.failures and portfolio_id not in refreshed.failures
+        }, day)
+
+    async def _reset_empty_portfolios(self, portfolio_ids: List[str], day: date):
+        """
+        Zeroes the `valuation` of portfolios without holdings. They get no
+        snapshot, so their last valuation would otherwise stay in the list.
+        """
+        if not portfolio_ids:
+            return
+        refreshed = await self.snapshot_writer.refresh_portfolio_valuations({portfolio_id: Valuation() for portfolio_id in portfolio_ids}, day)
+        for portfolio_id, error in refreshed.failures.items():
+            print(f"DIAGNOSTIC: Failed to reset the valuation of portfolio {portfolio_id}: {error}")
+
+    async def _advance_charts(self, collection: str, valuations: Dict[str, Valuation], day: date):
+        """Adds the day's snapshots to the items' chart series."""
+        series = await self.chart_series_store.load_many(collection, valuations)
+        for item_id, valuation in valuations.items():
+            series[item_id].add(day, valuation)
+        written = await self.snapshot_writer.write_chart_series(collection, series)
+        for item_id, error in written.failures.items():
+            print(f"DIAGNOSTIC: Failed to update the chart series of {item_id}: {error}")
+
+    @staticmethod
+    def _snapshot_failed(result: MonitoringRunResult, item_id: str, error):
+        result.snapshot_failures[item_id] = str(error)
+        print(f"DIAGNOSTIC: {get_message('M_W_1052', itemId=item_id, error=error)}")
+
+    async def _evaluate(self, batch: _TickerBatch, universe: MonitoringUniverse, engine: RuleEngine, day: date) -> int:
+        subscriptions = []
+        for holding in batch.holdings:
+            valuation = batch.valuations.get(str(holding.holdingId))
+            rule_set = universe.effective_rule_set(holding)
+            if rule_set is not None and valuation is not None:
+                subscriptions.append(Subscription(holding, rule_set, valuation))
+        alerts = engine.evaluate(batch.markets, subscriptions, day)
+        await write_alerts(self.db, alerts)
+        return len(alerts)
+
+    @staticmethod
+    def _report(result: MonitoringRunResult):
+        for name, timing in result.stages.items():
+            print(
+                f"DIAGNOSTIC: Monitoring stage '{name}': {timing.batches} batches, "
+                f"busy {timing.busy_seconds:.2f}s, done after {timing.finished_after_seconds:.2f}s"
+            )
+        if result.failed_tickers:
+            print(f"DIAGNOSTIC: {get_message('M_W_1051', failed_tickers=', '.join(sorted(result.failed_tickers)))}")
+        print(
+            f"DIAGNOSTIC: {get_message('M_I_1001')} {result.holding_snapshots} holding and "
+            f"{result.portfolio_snapshots} portfolio snapshots, {result.alerts} alerts in {result.elapsed_seconds:.2f}s"
+        )
+        print(
+            f"DIAGNOSTIC: Snapshots written in {result.snapshot_write_seconds:.2f}s "
+            f"({result.snapshots_per_second:.0f} docs/s), {len(result.snapshot_failures)} failed"
+        )
+        print(f"DIAGNOSTIC: Rule conditions: {result.conditions_evaluated} evaluated, {result.conditions_reused} reused")
+
+class _PortfolioSnapshots:
+    """Sums holding valuations per portfolio until every holding of a portfolio is in."""
+    def __init__(self, holdings_per_portfolio: Dict[str, int]):
+        self.remaining = dict(holdings_per_portfolio)
+        self.totals: Dict[str, Valuation] = {}
+        self.failed: set = set()
+
+    def add(self, portfolio_id: str, valuation: Valuation):
+        self.totals.setdefault(portfolio_id, Valuation()).add(valuation)
+        self.remaining[portfolio_id] -= 1
+
+    def fail(self, portfolio_id: str):
+        self.failed.add(portfolio_id)
+        self.remaining[portfolio_id] -= 1
+
+    def take_completed(self) -> Dict[str, Valuation]:
+        completed = {
+            portfolio_id: self.totals.pop(portfolio_id)
+            for portfolio_id, remaining in self.remaining.items()
+            if remaining == 0 and portfolio_id not in self.failed and portfolio_id in self.totals
+        }
+        for portfolio_id in completed:
+            del self.remaining[portfolio_id]
+        return completed
+
+    def incomplete(self) -> List[str]:
+        return sorted(self.failed)
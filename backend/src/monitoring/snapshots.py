@@ -0,0 +1,184 @@
+"""
+Stage 2 of M_1000: the daily performance snapshots of holdings and portfolios.
+
+A holding is valued at its ticker's latest close by the valuation engine
+shared with the API (see core/valuation.py). A portfolio's snapshot sums its
+holdings' valuations, so it is written once every holding of the portfolio
+has been valued.
+Reference: product_spec.md#731-m_1000-daily-data-synchronization-and-calculation
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions, SendMode
+from google.rpc import code_pb2
+
+from ..core.chart_series import ChartSeries, chart_series_ref
+from ..core.internal_models import DailyHoldingSnapshotDB, DailyPortfolioSnapshotDB, MACD_DB, MarketDataDB
+from ..core.valuation import Valuation
+from ..settings import settings
+
+# Indicator fields copied from the market data into a holding's snapshot.
+SNAPSHOT_INDICATOR_FIELDS = ("sma7", "sma20", "sma50", "sma200", "vwma7", "vwma20", "vwma50", "vwma200", "rsi14")
+# A write the BulkWriter cannot apply after this many attempts is counted as failed.
+MAX_SNAPSHOT_WRITE_ATTEMPTS = 5
+# Only contention and transient errors are retried. Anything else (NOT_FOUND
+# for an item deleted during the run, ALREADY_EXISTS, ...) fails at once
+# instead of spending the whole backoff inside the BulkWriter's flush.
+RETRYABLE_WRITE_CODES = frozenset({
+    code_pb2.ABORTED,
+    code_pb2.UNAVAILABLE,
+    code_pb2.RESOURCE_EXHAUSTED,
+    code_pb2.DEADLINE_EXCEEDED,
+})
+
+def snapshot_datetime(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def holding_snapshot(valuation: Valuation, market: MarketDataDB, day: date) -> DailyHoldingSnapshotDB:
+    indicators = {name: getattr(market, name) for name in SNAPSHOT_INDICATOR_FIELDS}
+    return DailyHoldingSnapshotDB(
+        date=snapshot_datetime(day),
+        macd=MACD_DB(**market.macd) if market.macd else None,
+        **valuation.fields(),
+        **indicators,
+    )
+
+def portfolio_snapshot(valuation: Valuation, day: date) -> DailyPortfolioSnapshotDB:
+    return DailyPortfolioSnapshotDB(date=snapshot_datetime(day), **valuation.fields())
+
+@dataclass
+class SnapshotWriteResult:
+    """The outcome of writing one collection's snapshots."""
+    written: int = 0
+    # itemId -> error of every snapshot the BulkWriter gave up on (M_W_1052).
+    failures: Dict[str, str] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.written / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+class SnapshotWriter:
+    """
+    Writes snapshot documents to the `dailySnapshots` subcollections through
+    a Firestore BulkWriter, which sends them in parallel, ramps up to
+    MONITORING_SNAPSHOT_MAX_OPS_PER_SECOND and retries contended writes
+    with exponential backoff.
+
+    Used as an async context manager, one BulkWriter serves every write
+    of the run, so its ramp-up is not restarted for each batch.
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+    """
+    def __init__(self, db_client, options: Optional[BulkWriterOptions] = None):
+        self.db = db_client
+        self.options = options or BulkWriterOptions(
+            initial_ops_per_second=settings.MONITORING_SNAPSHOT_INITIAL_OPS_PER_SECOND,
+            max_ops_per_second=settings.MONITORING_SNAPSHOT_MAX_OPS_PER_SECOND,
+            mode=SendMode.parallel,
+            retry=BulkRetry.exponential,
+        )
+        self._writer = None
+
+    async def __aenter__(self) -> "SnapshotWriter":
+        self._writer = await asyncio.to_thread(self.db.bulk_writer, self.options)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        writer, self._writer = self._writer, None
+        await asyncio.to_thread(writer.close)
+
+    def _ref(self, collection: str, item_id: str, day: date):
+        return self.db.collection(collection).document(item_id).collection("dailySnapshots").document(day.isoformat())
+
+    async def write(self, collection: str, snapshots: Iterable[Tuple[str, object]], day: date) -> SnapshotWriteResult:
+        """
+        Writes (itemId, snapshot) pairs of one collection ('holdings' or
+        'portfolios'), with the day as document ID. All documents are built
+        before the first one is sent.
+
+        Returns:
+            The number of snapshots written, the error of every item whose
+            write failed after MAX_SNAPSHOT_WRITE_ATTEMPTS, and the time taken.
+        """
+        documents = [(item_id, self._ref(collection, item_id, day), snapshot.model_dump()) for item_id, snapshot in snapshots]
+        return await self._send("set", documents)
+
+    async def refresh_portfolio_valuations(self, valuations: Dict[str, Valuation], day: date) -> SnapshotWriteResult:
+        """
+        Replaces the `valuation` of each portfolio document with the one of
+        its snapshot, so the portfolio list shows the day's values. A portfolio
+        deleted in the meantime fails here instead of being recreated.
+        Reference: product_spec.md#321-primary-stored-models
+        """
+        documents = [
+            (portfolio_id, self.db.collection("portfolios").document(portfolio_id), {"valuation": {
+                "costBasis": valuation.totalCost,
+                "lastValuation": valuation.currentValue,
+                "lastPriceDate": snapshot_datetime(day),
+            }})
+            for portfolio_id, valuation in valuations.items()
+        ]
+        return await self._send("update", documents)
+
+    async def write_chart_series(self, collection: str, series: Dict[str, ChartSeries]) -> SnapshotWriteResult:
+        """
+        Stores the advanced chart series of items of one collection (see
+        core/chart_series.py). A stored series is updated and a new one
+        created, so the series of an item deleted in the meantime (which the
+        deletion removes) fails here instead of being recreated.
+        """
+        result = SnapshotWriteResult()
+        for method, stored in (("update", True), ("create", False)):
+            documents = [
+                (item_id, chart_series_ref(self.db, collection, item_id), item_series.to_document())
+                for item_id, item_series in series.items() if item_series.stored == stored
+            ]
+            if documents:
+                sent = await self._send(method, documents)
+                result.written += sent.written
+                result.failures.update(sent.failures)
+                result.elapsed_seconds += sent.elapsed_seconds
+        return result
+
+    async def _send(self, method: str, documents: List[Tuple[str, object, dict]]) -> SnapshotWriteResult:
+        """Applies `method` ('set', 'create' or 'update') to (itemId, reference, data) triples."""
+        if self._writer is None:
+            async with self:
+                return await self._send(method, documents)
+
+        item_ids = {ref.path: item_id for item_id, ref, _ in documents}
+        result = SnapshotWriteResult()
+        # The BulkWriter invokes callbacks from its own worker threads.
+        lock = threading.Lock()
+
+        def on_result(reference, write_result, bulk_writer):
+            if reference.path in item_ids:
+                with lock:
+                    result.written += 1
+
+        def on_error(failure, bulk_writer) -> bool:
+            if failure.code in RETRYABLE_WRITE_CODES and failure.attempts < MAX_SNAPSHOT_WRITE_ATTEMPTS:
+                return True
+            item_id = item_ids.get(failure.operation.reference.path)
+            if item_id is not None:
+                with lock:
+                    result.failures[item_id] = failure.message
+            return False
+
+        def _run():
+            self._writer.on_write_result(on_result)
+            self._writer.on_write_error(on_error)
+            write = getattr(self._writer, method)
+            for _, ref, data in documents:
+                write(ref, data)
+            self._writer.flush()
+
+        started = time.perf_counter()
+        await asyncio.to_thread(_run)
+        result.elapsed_seconds = time.perf_counter() - started
+        return result
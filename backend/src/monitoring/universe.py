@@ -0,0 +1,72 @@
+"""
+Everything a monitoring run works on, read once at its start.
+
+The run needs every holding and the effective rule set of each. The rule
+sets are resolved in bulk (see rule_set_service.py): all rule sets and the
+rule set IDs of all portfolios are read with one query each, concurrently
+with the holdings, rather than per holding. Market data is read per ticker
+batch later.
+Reference: product_spec.md#732-m_2000-strategy-rule-evaluation
+"""
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ..core.internal_models import HoldingDB, RuleSetDB
+from ..services.rule_set_service import EffectiveRuleSets, RuleSetService
+
+@dataclass
+class MonitoringUniverse:
+    """The holdings of all users and the resolver of their effective rule sets."""
+    holdings: List[HoldingDB] = field(default_factory=list)
+    rule_sets: EffectiveRuleSets = field(default_factory=EffectiveRuleSets)
+    system_tickers: List[str] = field(default_factory=list)
+
+    def tickers(self) -> List[str]:
+        """The system-required tickers first, then every distinct held ticker in sorted order."""
+        return list(dict.fromkeys([*self.system_tickers, *sorted({holding.ticker for holding in self.holdings})]))
+
+    def holdings_by_ticker(self) -> Dict[str, List[HoldingDB]]:
+        grouped: Dict[str, List[HoldingDB]] = defaultdict(list)
+        for holding in self.holdings:
+            grouped[holding.ticker].append(holding)
+        return dict(grouped)
+
+    def holdings_per_portfolio(self) -> Dict[str, int]:
+        counts: Dict[str, int] = defaultdict(int)
+        for holding in self.holdings:
+            counts[str(holding.portfolioId)] += 1
+        return dict(counts)
+
+    def portfolios_without_holdings(self) -> List[str]:
+        """
+        The portfolios that hold nothing, out of all portfolios the rule set
+        resolver's projected scan has read.
+        """
+        held = self.holdings_per_portfolio()
+        return [portfolio_id for portfolio_id in self.rule_sets.portfolio_rule_sets if portfolio_id not in held]
+
+    def effective_rule_set(self, holding: HoldingDB) -> Optional[RuleSetDB]:
+        """
+        The holding's own rule set if it has one, otherwise its portfolio's
+        (product_spec.md#612-managing-holding-level-rules-override).
+        """
+        return self.rule_sets.effective_rule_set(holding)
+
+async def _load_holdings(db_client) -> List[HoldingDB]:
+    holdings = []
+    async for doc in db_client.collection("holdings").stream():
+        try:
+            holdings.append(HoldingDB(**doc.to_dict()))
+        except Exception as e:
+            print(f"DIAGNOSTIC: Skipping holding {doc.id} with invalid data: {e}")
+    return holdings
+
+async def load_universe(db_client, system_tickers: List[str]) -> MonitoringUniverse:
+    """Reads all holdings, all rule sets and the rule set ID of every portfolio, concurrently."""
+    holdings, rule_sets = await asyncio.gather(
+        _load_holdings(db_client),
+        RuleSetService(db_client).load_effective_rule_sets(),
+    )
+    return MonitoringUniverse(holdings=holdings, rule_sets=rule_sets, system_tickers=list(system_tickers))
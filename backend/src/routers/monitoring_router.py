@@ -0,0 +1,59 @@
+import asyncio
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from src.api.models import MonitoringRun
+from src.dependencies import get_db, require_scheduler
+from src.monitoring.pipeline import MonitoringAbortedError, MonitoringPipeline
+import src.core.model_mappers as model_mappers
+from src.messages import get_message
+
+# One monitoring run per instance at a time; the scheduler retries a refused call.
+_run_lock = asyncio.Lock()
+
+router = APIRouter(
+    prefix="/internal/monitoring",
+    tags=["Monitoring"],
+)
+
+@router.post(
+    "/runs",
+    response_model=MonitoringRun,
+    summary="Run the daily monitoring job",
+    description="Reference: product_spec.md#711-backend-business-process-alert-generation",
+    responses={
+        401: {"description": "The OIDC token is missing or invalid."},
+        403: {"description": "The caller is not the scheduler's service account."},
+        409: {"description": "A monitoring run is already in progress."},
+        503: {"description": "Market data was unavailable; the run was aborted."},
+    }
+)
+async def trigger_monitoring_run(
+    as_of: Optional[date] = Query(None, alias="date", description="The day to run for; defaults to today."),
+    recompute: bool = Query(False, description="Recompute all indicators from history instead of streaming them."),
+    _caller: str = Depends(require_scheduler),
+    db_client=Depends(get_db),
+) -> MonitoringRun:
+    """
+    Runs sync, indicators, snapshots and evaluation for all holdings and
+    returns the per-stage timings. Called by Cloud Scheduler once a day;
+    it is exempt from the Idempotency-Key requirement.
+    - **M_I_1001**: Run completed.
+    - **M_E_1101**: Market data unavailable; run aborted (503).
+    """
+    if _run_lock.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A monitoring run is already in progress.",
+        )
+    async with _run_lock:
+        try:
+            result = await MonitoringPipeline(db_client).run(as_of=as_of, recompute=recompute)
+        except MonitoringAbortedError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=get_message("M_E_1101"),
+            )
+    return model_mappers.monitoring_run_result_to_monitoring_run(result)
@@ -1,19 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status, Response
 from pydantic import UUID4
-from typing import List
+from typing import List, Optional
 
 from src.api.models import (
     Portfolio,
     PortfolioCreationRequest,
     PortfolioSummary,
     PortfolioUpdateRequest,
-    DailyPortfolioSnapshot
+    PortfolioDeletionProgress,
+    DailyPortfolioSnapshot,
+    DeletionJobStatus
 )
+from src.core.chart_series import CHART_RANGES
+from src.core.etag import etag_matches, not_modified, set_etag, weak_etag
 from src.core.internal_models import CurrentUser
-from src.dependencies import get_current_user, get_portfolio_service, get_user_service, require_idempotency_key
+from src.dependencies import get_authenticated_user, get_current_user, get_portfolio_service, get_user_service, require_idempotency_key
 from src.services.portfolio_service import PortfolioService
+from src.services.user_service import UserService
 import src.core.model_mappers as model_mappers
 from src.messages import get_message
+from src.settings import settings
+
+DEFAULT_PORTFOLIO_PAGE_SIZE = 50
+MAX_PORTFOLIO_PAGE_SIZE = 100
+NEXT_PAGE_TOKEN_HEADER = "X-Next-Page-Token"
 
 router = APIRouter(
     prefix="/users/me/portfolios",
@@ -33,10 +43,10 @@ router = APIRouter(
         400: {"description": "Invalid request data."},
     }
 )
-def create_portfolio(
+async def create_portfolio(
     request: PortfolioCreationRequest,
     idempotency_key: UUID4 = Depends(require_idempotency_key),
-    current_user: CurrentUser = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_authenticated_user),
     portfolio_service: PortfolioService = Depends(get_portfolio_service),
 ) -> Portfolio:
     """
@@ -47,14 +57,14 @@ def create_portfolio(
     - **P_E_1105**: Idempotency key missing/invalid (handled by dependency).
     """
     # P_E_1103: Check if a portfolio with the same name already exists for the user.
-    if portfolio_service.get_portfolio_by_name(current_user.uid, request.name):
+    if await portfolio_service.get_portfolio_by_name(current_user.uid, request.name):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=get_message("P_E_1103", name=request.name),
         )
 
     portfolio_dict = model_mappers.portfolio_creation_request_to_dict(request)
-    new_portfolio_db = portfolio_service.create_portfolio(current_user.uid, portfolio_dict)
+    new_portfolio_db = await portfolio_service.create_portfolio(current_user.uid, portfolio_dict)
     return model_mappers.portfolio_db_to_portfolio(new_portfolio_db)
 
 
@@ -64,17 +74,40 @@ def create_portfolio(
     summary="Retrieve a list of all portfolios for the authenticated user",
     description="Reference: product_spec.md#3.3.2.2-P_2200-Portfolio-List-Retrieval",
 )
-def list_portfolios(
-    current_user: CurrentUser = Depends(get_current_user),
+async def list_portfolios(
+    request: Request,
+    response: Response,
+    pageSize: int = Query(DEFAULT_PORTFOLIO_PAGE_SIZE, ge=1, le=MAX_PORTFOLIO_PAGE_SIZE),
+    pageToken: Optional[str] = Query(None),
+    current_user: CurrentUser = Depends(get_authenticated_user),
     portfolio_service: PortfolioService = Depends(get_portfolio_service),
 ) -> List[PortfolioSummary]:
     """
-    Retrieves a summary list of all portfolios owned by the authenticated user.
+    Retrieves one page of the portfolios owned by the authenticated user,
+    ordered by name. The token of the next page, if any, is returned in the
+    `X-Next-Page-Token` header.
     - **P_I_2201**: List retrieval succeeds.
     - **P_E_2301**: User unauthorized (handled by dependency).
+    - **P_E_2302**: Invalid page token.
     """
-    portfolios_db = portfolio_service.get_portfolios_by_user(current_user.uid)
-    return model_mappers.portfolio_db_list_to_portfolio_summary_list(portfolios_db)
+    try:
+        summaries_db, next_page_token = await portfolio_service.list_portfolio_summaries(current_user.uid, pageSize, pageToken)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=get_message("P_E_2302"))
+    # The page changes with any of its portfolios, and their valuations change without touching modifiedAt.
+    etag = weak_etag(current_user.uid, pageSize, pageToken, next_page_token, [
+        (str(summary.portfolioId), summary.modifiedAt, summary.valuation.lastValuation, summary.valuation.lastPriceDate)
+        for summary in summaries_db
+    ])
+    if etag_matches(request, etag):
+        response = not_modified(etag)
+        if next_page_token:
+            response.headers[NEXT_PAGE_TOKEN_HEADER] = next_page_token
+        return response
+    set_etag(response, etag)
+    if next_page_token:
+        response.headers[NEXT_PAGE_TOKEN_HEADER] = next_page_token
+    return [model_mappers.portfolio_summary_db_to_portfolio_summary(summary) for summary in summaries_db]
 
 
 @router.get(
@@ -83,9 +116,11 @@ def list_portfolios(
     summary="Retrieve a single portfolio by ID",
     description="Reference: product_spec.md#3.3.2.1-P_2000-Single-Portfolio-Retrieval",
 )
-def get_portfolio_by_id(
+async def get_portfolio_by_id(
     portfolio_id: UUID4,
-    current_user: CurrentUser = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_authenticated_user),
     portfolio_service: PortfolioService = Depends(get_portfolio_service),
 ) -> Portfolio:
     """
@@ -94,11 +129,15 @@ def get_portfolio_by_id(
     - **P_E_2101**: User unauthorized.
     - **P_E_2102**: Portfolio not found.
     """
-    portfolio_db = portfolio_service.get_portfolio_by_id(portfolio_id)
+    portfolio_db = await portfolio_service.get_portfolio_by_id(portfolio_id)
     if not portfolio_db:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=get_message("P_E_2102", portfolioId=portfolio_id))
     if portfolio_db.userId != current_user.uid:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=get_message("P_E_2101", portfolioId=portfolio_id))
+    etag = weak_etag(str(portfolio_db.portfolioId), portfolio_db.modifiedAt)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return model_mappers.portfolio_db_to_portfolio(portfolio_db)
 
 
@@ -108,11 +147,11 @@ def get_portfolio_by_id(
     summary="Update a specific portfolio's settings",
     description="Reference: product_spec.md#3.3.3.1-P_3000-Portfolio-Update-(Manual)",
 )
-def update_portfolio(
+async def update_portfolio(
     portfolio_id: UUID4,
     request: PortfolioUpdateRequest,
     idempotency_key: UUID4 = Depends(require_idempotency_key),
-    current_user: CurrentUser = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_authenticated_user),
     portfolio_service: PortfolioService = Depends(get_portfolio_service),
 ) -> Portfolio:
     """
@@ -124,7 +163,7 @@ def update_portfolio(
     - **P_E_3104**: Invalid portfolio settings (e.g., duplicate name).
     """
     # P_E_3102: Check if portfolio exists
-    portfolio_to_update = portfolio_service.get_portfolio_by_id(portfolio_id)
+    portfolio_to_update = await portfolio_service.get_portfolio_by_id(portfolio_id)
     if not portfolio_to_update:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=get_message("P_E_2102", portfolioId=portfolio_id))
 
@@ -134,7 +173,7 @@ def update_portfolio(
 
     # P_E_3104: Check for name conflict if the name is being changed
     if request.name and request.name != portfolio_to_update.name:
-        existing_portfolio = portfolio_service.get_portfolio_by_name(current_user.uid, request.name)
+        existing_portfolio = await portfolio_service.get_portfolio_by_name(current_user.uid, request.name)
         if existing_portfolio and existing_portfolio.portfolioId != portfolio_id:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=get_message("P_E_1103", name=request.name))
 
@@ -146,7 +185,7 @@ def update_portfolio(
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=get_message("P_E_3103"))
 
     update_dict = model_mappers.portfolio_update_request_to_dict(request)
-    updated_portfolio_db = portfolio_service.update_portfolio(portfolio_id, update_dict)
+    updated_portfolio_db = await portfolio_service.update_portfolio(portfolio_id, update_dict, current_portfolio=portfolio_to_update)
 
     if not updated_portfolio_db:
          raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=get_message("P_E_2102", portfolioId=portfolio_id))
@@ -160,21 +199,24 @@ def update_portfolio(
     summary="Delete an entire portfolio",
     description="Reference: product_spec.md#3.3.4.1-P_4000-Portfolio-Deletion-(Entire-Portfolio)",
 )
-def delete_portfolio(
+async def delete_portfolio(
     portfolio_id: UUID4,
+    background_tasks: BackgroundTasks,
     idempotency_key: UUID4 = Depends(require_idempotency_key),
     current_user: CurrentUser = Depends(get_current_user),
     portfolio_service: PortfolioService = Depends(get_portfolio_service),
-    user_service = Depends(get_user_service)
+    user_service: UserService = Depends(get_user_service)
 ):
     """
     Deletes an entire portfolio and all of its associated holdings and data.
+    Large cascades continue in the background after the response is sent;
+    their progress is available from `GET /{portfolio_id}/deletion`.
     - **P_I_4001**: Portfolio deletion succeeds.
     - **P_E_4101**: User unauthorized.
     - **P_E_4102**: Portfolio not found.
     """
     # P_E_4102: Check if portfolio exists
-    portfolio_to_delete = portfolio_service.get_portfolio_by_id(portfolio_id)
+    portfolio_to_delete = await portfolio_service.get_portfolio_by_id(portfolio_id)
     if not portfolio_to_delete:
         # Return 204 even if not found to ensure idempotency.
         # The resource is gone, which is the desired state.
@@ -184,21 +226,73 @@ def delete_portfolio(
     if portfolio_to_delete.userId != current_user.uid:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=get_message("P_E_4101", portfolioId=portfolio_id))
 
-    portfolio_service.delete_portfolio(current_user.uid, portfolio_id, user_service)
+    progress = await portfolio_service.delete_portfolio(
+        current_user.uid, portfolio_id, user_service,
+        max_inline_deletes=settings.PORTFOLIO_DELETION_INLINE_BUDGET,
+    )
+    if progress and progress.status == DeletionJobStatus.RUNNING:
+        background_tasks.add_task(portfolio_service.continue_portfolio_deletion, portfolio_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+@router.get(
+    "/{portfolio_id}/deletion",
+    response_model=PortfolioDeletionProgress,
+    summary="Retrieve the progress of a portfolio deletion",
+    description="Reference: product_spec.md#3.3.4.1-P_4000-Portfolio-Deletion-(Entire-Portfolio)",
+)
+async def get_portfolio_deletion_progress(
+    portfolio_id: UUID4,
+    current_user: CurrentUser = Depends(get_authenticated_user),
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
+) -> PortfolioDeletionProgress:
+    """
+    Reports how many holdings, rulesets and snapshots a portfolio deletion has
+    removed so far and whether it has finished.
+    - **P_E_4101**: User unauthorized.
+    - **P_E_4102**: No deletion found for this portfolio.
+    """
+    progress = await portfolio_service.get_deletion_progress(portfolio_id)
+    if not progress:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=get_message("P_E_4102", portfolioId=portfolio_id))
+    if progress.userId != current_user.uid:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=get_message("P_E_4101", portfolioId=portfolio_id))
+    return model_mappers.portfolio_deletion_job_db_to_progress(progress)
+
+
 @router.get(
     "/{portfolio_id}/chart-data",
     response_model=List[DailyPortfolioSnapshot],
     summary="Retrieve time-series performance data for a portfolio",
     description="Reference: product_spec.md#3.3.2.3-P_2400-Portfolio-Chart-Data-Retrieval",
 )
-def get_portfolio_chart_data(
+async def get_portfolio_chart_data(
     portfolio_id: UUID4,
     range: str,
-    current_user: CurrentUser = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_authenticated_user),
     portfolio_service: PortfolioService = Depends(get_portfolio_service),
 ) -> List[DailyPortfolioSnapshot]:
-    # As per spec, this will return empty data for now as snapshots are not generated.
-    return []
\ No newline at end of file
+    """
+    Retrieves the portfolio's performance over `range`, downsampled to daily,
+    weekly or monthly points (see CHART_RANGES).
+    - **P_I_2401**: Chart data retrieval succeeds.
+    - **P_E_2501**: User unauthorized.
+    - **P_E_2502**: Portfolio not found.
+    - **P_E_2503**: Invalid range parameter.
+    """
+    if range not in CHART_RANGES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=get_message("P_E_2503", range=range, ranges=", ".join(CHART_RANGES)))
+    portfolio_db = await portfolio_service.get_portfolio_by_id(portfolio_id)
+    if not portfolio_db:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=get_message("P_E_2502", portfolioId=portfolio_id))
+    if portfolio_db.userId != current_user.uid:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=get_message("P_E_2501", portfolioId=portfolio_id))
+    points = await portfolio_service.get_chart_points(portfolio_id, range)
+    # The series has no modifiedAt; its points are its version.
+    etag = weak_etag(str(portfolio_id), range, points)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return model_mappers.chart_points_to_daily_portfolio_snapshot_list(points)
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import UUID4
+
+from src.api.models import EffectiveRuleSet
+from src.core.internal_models import CurrentUser
+from src.dependencies import get_authenticated_user, get_rule_set_service
+from src.services.rule_set_service import RuleSetService
+import src.core.model_mappers as model_mappers
+from src.messages import get_message
+
+router = APIRouter(
+    prefix="/users/me",
+    tags=["RuleSets"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get(
+    "/holdings/{holding_id}/effective-rules",
+    response_model=EffectiveRuleSet,
+    summary="Retrieve the effective RuleSet for a given holding",
+    description="Reference: product_spec.md#632-r_2000-effective-rule-set-retrieval",
+)
+async def get_effective_rule_set_for_holding(
+    holding_id: UUID4,
+    current_user: CurrentUser = Depends(get_authenticated_user),
+    rule_set_service: RuleSetService = Depends(get_rule_set_service),
+) -> EffectiveRuleSet:
+    """
+    Returns the holding's own rule set, or else its portfolio's, marked with
+    its source. The portfolio and rule set lookups are served by the user's
+    cached resolver, so only the holding is read per request.
+    - **R_I_2001**: Specific rule set returned.
+    - **R_I_2002**: Inherited rule set returned.
+    - **R_I_2003**: No rules apply; `source` and `ruleSet` are null.
+    - **R_E_2101**: User unauthorized.
+    - **R_E_2102**: Holding not found.
+    """
+    holding_db = await rule_set_service.get_holding(holding_id)
+    if not holding_db:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=get_message("R_E_2102", holdingId=holding_id))
+    if holding_db.userId != current_user.uid:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=get_message("R_E_2101", holdingId=holding_id))
+    rule_set_db, source = await rule_set_service.get_effective_rule_set(current_user.uid, holding_db)
+    return model_mappers.rule_set_db_to_effective_rule_set(rule_set_db, source)
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from pydantic import UUID4
 from datetime import datetime, timezone
 from typing import List
 # Import the dependency functions we'll need
-from ..dependencies import get_current_user, require_idempotency_key, get_user_service, get_portfolio_service
+from ..dependencies import get_authenticated_user, get_current_user, require_idempotency_key, get_user_service, get_portfolio_service
 from ..api.models import User, UpdateUserSettingsRequest
+from ..core.etag import etag_matches, not_modified, set_etag, weak_etag
 from ..core.internal_models import CurrentUser
 from firebase_admin import auth
 from firebase_admin.exceptions import FirebaseError
+from starlette.concurrency import run_in_threadpool
 # Import the service classes for type hinting
 from ..services.portfolio_service import PortfolioService
 from ..services.user_service import UserService
@@ -19,27 +21,34 @@ router = APIRouter()
 
 @router.get("/users/me/settings", response_model=User, summary="Retrieve current user's settings")
 async def get_user_settings(
+    request: Request,
+    response: Response,
     current_user: CurrentUser = Depends(get_current_user),
     user_service: UserService = Depends(get_user_service) # Inject dependency here
 ):
     """
     Retrieves the settings for the currently authenticated user.
+    Answers 304 when If-None-Match names the current ETag.
     Reference: product_spec.md#932-us_2000-user-settings-retrieval
     """
-    user_db = user_service.get_user_by_uid(current_user.uid)
+    user_db = await user_service.get_user_by_uid(current_user.uid)
 
     if not user_db:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User settings not found."
         )
-    
+
+    etag = weak_etag(user_db.uid, user_db.modifiedAt)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return userdb_to_user(user_db)
 
 @router.put("/users/me/settings", response_model=User, summary="Update current user's settings")
 async def update_user_settings(
     request: UpdateUserSettingsRequest,
-    current_user: CurrentUser = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_authenticated_user),
     user_service: UserService = Depends(get_user_service), # Inject dependency here
     idempotency_key: UUID4 = Depends(require_idempotency_key)
 ):
@@ -49,7 +58,7 @@ async def update_user_settings(
     """
     try:
         update_data = update_user_settings_request_to_dict(request)
-        updated_user_db = user_service.update_user_settings(
+        updated_user_db = await user_service.update_user_settings(
             uid=current_user.uid,
             update_data=update_data
         )
@@ -61,14 +70,15 @@ async def update_user_settings(
         )
 
 @router.post("/auth/logout", status_code=status.HTTP_200_OK, summary="Logout the current user and revoke refresh tokens")
-async def logout_user(current_user: CurrentUser = Depends(get_current_user)):
+async def logout_user(current_user: CurrentUser = Depends(get_authenticated_user)):
     """
     Logs out the current user by revoking their Firebase refresh tokens.
     This invalidates all sessions for the user across all devices.
     Reference: product_spec.md#834-u_4000-user-logout
     """
     try:
-        auth.revoke_refresh_tokens(current_user.uid)
+        # The Admin SDK's auth calls are blocking, so they run in the threadpool.
+        await run_in_threadpool(auth.revoke_refresh_tokens, current_user.uid)
         return {"message": "U_I_4001: User logged out successfully."}
     except FirebaseError as e:
         raise HTTPException(
@@ -1,23 +1,160 @@
 import datetime
+from dataclasses import dataclass
+from enum import Enum
 from typing import Optional, Dict, Any
 
+from google.api_core.exceptions import AlreadyExists
+from google.cloud import firestore
+
+from ..core.bloom_filter import BloomFilter
+from ..core.cache import TTLCache
+
+# How long a stored response can be replayed.
+IDEMPOTENCY_KEY_TTL = datetime.timedelta(hours=24)
+# How long a "pending" marker protects a key. A marker older than this is
+# assumed to belong to a crashed request and may be taken over.
+PENDING_LEASE = datetime.timedelta(seconds=60)
+
+# Local tier: completed responses of this instance, bounded by count and by
+# body size so the worst case stays around LOCAL_RESPONSE_CACHE_MAX_SIZE *
+# LOCAL_RESPONSE_MAX_BODY_BYTES of memory.
+LOCAL_RESPONSE_CACHE_MAX_SIZE = 1024
+LOCAL_RESPONSE_MAX_BODY_BYTES = 32 * 1024
+# Keys this instance has seen, used to skip the read on brand-new keys.
+SEEN_KEYS_CAPACITY = 100_000
+SEEN_KEYS_ERROR_RATE = 0.01
+
+_local_responses = TTLCache(
+    maxsize=LOCAL_RESPONSE_CACHE_MAX_SIZE,
+    ttl_seconds=IDEMPOTENCY_KEY_TTL.total_seconds(),
+)
+_seen_keys = BloomFilter(capacity=SEEN_KEYS_CAPACITY, error_rate=SEEN_KEYS_ERROR_RATE)
+
+def clear_local_idempotency_cache():
+    _local_responses.clear()
+    _seen_keys.clear()
+
+class IdempotencyStatus(str, Enum):
+    PENDING = "PENDING"
+    COMPLETED = "COMPLETED"
+
+class ReservationOutcome(str, Enum):
+    ACQUIRED = "ACQUIRED"        # The caller owns the key and must run the request.
+    COMPLETED = "COMPLETED"      # A response is stored and must be replayed.
+    IN_PROGRESS = "IN_PROGRESS"  # Another request holds a live pending marker.
+
+@dataclass
+class Reservation:
+    outcome: ReservationOutcome
+    response: Optional[Dict[str, Any]] = None
+
 class IdempotencyService:
     """
     Handles the storage and retrieval of idempotent responses in Firestore.
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+
+    A key moves through two states: a PENDING marker written when a request
+    starts, and a COMPLETED document holding the response once it succeeds.
+    The marker is written in a transaction so that, across instances, only
+    one request per key runs the handler.
+
+    In front of Firestore sits a per-instance tier: an LRU of completed
+    responses, replayed without a network call, and a Bloom filter of keys
+    seen here. A key the filter has never seen is almost always new, so its
+    marker is written with a single `create()` instead of a read-then-write
+    transaction; if the key did exist elsewhere, `create()` fails and the
+    transactional path decides.
     """
     def __init__(self, db_client):
         self.db = db_client
         self.collection = self.db.collection('idempotencyKeys')
 
-    def get_idempotent_response(self, idempotency_key: str, user_id: str) -> Optional[Dict[str, Any]]:
+    async def reserve(self, idempotency_key: str, user_id: str) -> Reservation:
+        """
+        Atomically claims an idempotency key for the user.
+
+        Returns:
+            A Reservation telling the caller to run the request, replay a
+            stored response, or back off because the key is in progress.
+        """
+        cached_response = _local_responses.get((user_id, idempotency_key))
+        if cached_response is not None:
+            return Reservation(ReservationOutcome.COMPLETED, cached_response)
+
+        doc_ref = self.collection.document(idempotency_key)
+        if idempotency_key not in _seen_keys:
+            _seen_keys.add(idempotency_key)
+            try:
+                await doc_ref.create(self._pending_marker(user_id))
+                return Reservation(ReservationOutcome.ACQUIRED)
+            except AlreadyExists:
+                pass
+
+        transaction = self.db.transaction()
+
+        @firestore.async_transactional
+        async def _reserve(transaction) -> Reservation:
+            doc = await doc_ref.get(transaction=transaction)
+            now = datetime.datetime.now(datetime.timezone.utc)
+            if doc.exists:
+                data = doc.to_dict()
+                # Keys created by another user are never replayed (see get_idempotent_response).
+                if data.get("userId") == user_id:
+                    if data.get("status", IdempotencyStatus.COMPLETED.value) == IdempotencyStatus.COMPLETED.value:
+                        return Reservation(ReservationOutcome.COMPLETED, data.get("response"))
+                    lease_expires_at = data.get("leaseExpireAt")
+                    if lease_expires_at and lease_expires_at > now:
+                        return Reservation(ReservationOutcome.IN_PROGRESS)
+
+            transaction.set(doc_ref, self._pending_marker(user_id, now))
+            return Reservation(ReservationOutcome.ACQUIRED)
+
+        reservation = await _reserve(transaction)
+        if reservation.outcome == ReservationOutcome.COMPLETED:
+            self._remember_response(idempotency_key, user_id, reservation.response)
+        return reservation
+
+    @staticmethod
+    def _pending_marker(user_id: str, now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        return {
+            "userId": user_id,
+            "status": IdempotencyStatus.PENDING.value,
+            "createdAt": now,
+            "leaseExpireAt": now + PENDING_LEASE,
+            "expireAt": now + IDEMPOTENCY_KEY_TTL,
+        }
+
+    @staticmethod
+    def _remember_response(idempotency_key: str, user_id: str, response_data: Optional[Dict[str, Any]]):
+        if response_data is None:
+            return
+        body = response_data.get("body")
+        if body is not None and len(body) > LOCAL_RESPONSE_MAX_BODY_BYTES:
+            return
+        _local_responses.set((user_id, idempotency_key), response_data)
+
+    async def release(self, idempotency_key: str, user_id: str):
+        """
+        Removes the caller's pending marker so the request can be retried.
+        Used when the request did not produce a response worth storing.
+        """
+        doc_ref = self.collection.document(idempotency_key)
+        doc = await doc_ref.get()
+        if doc.exists:
+            data = doc.to_dict()
+            if data.get("userId") == user_id and data.get("status") == IdempotencyStatus.PENDING.value:
+                await doc_ref.delete()
+
+    async def get_idempotent_response(self, idempotency_key: str, user_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieves a stored response if the idempotency key exists and belongs to the user.
 
         Returns:
-            The stored response document or None if not found.
+            The stored response document or None if not found or still pending.
         """
         doc_ref = self.collection.document(idempotency_key)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
 
         if not doc.exists:
             return None
@@ -26,21 +163,27 @@ class IdempotencyService:
         # Security check: ensure the key was created by the same user
         if data.get("userId") != user_id:
             # This is a security measure to prevent one user from replaying another's key
-            return None 
-        
+            return None
+
+        if data.get("status", IdempotencyStatus.COMPLETED.value) != IdempotencyStatus.COMPLETED.value:
+            return None
+
         return data.get("response")
 
-    def store_idempotent_response(self, idempotency_key: str, user_id: str, response_data: Dict[str, Any]):
+    async def store_idempotent_response(self, idempotency_key: str, user_id: str, response_data: Dict[str, Any]):
         """
-        Stores a new response against an idempotency key.
+        Stores a new response against an idempotency key, completing any
+        pending marker.
         """
         doc_ref = self.collection.document(idempotency_key)
+        now = datetime.datetime.now(datetime.timezone.utc)
         doc_data = {
             "userId": user_id,
-            "createdAt": datetime.datetime.now(datetime.timezone.utc),
-            "expireAt": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=24),
+            "status": IdempotencyStatus.COMPLETED.value,
+            "createdAt": now,
+            "expireAt": now + IDEMPOTENCY_KEY_TTL,
             "response": response_data
         }
-        doc_ref.set(doc_data)
-
-
+        await doc_ref.set(doc_data)
+        _seen_keys.add(idempotency_key)
+        self._remember_response(idempotency_key, user_id, response_data)
@@ -0,0 +1,4 @@
+"""
+Market data ingestion: fetching raw OHLCV series from the external provider
+and deriving the technical indicators stored in the 'marketData' cache.
+"""
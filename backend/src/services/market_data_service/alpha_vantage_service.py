@@ -0,0 +1,211 @@
+"""
+Client for the Alpha Vantage market data API.
+
+All requests go through one pooled `httpx.AsyncClient`, so connections are
+reused across tickers. Requests are paced by a token bucket sized to the
+account's quota and the number in flight is bounded by a semaphore, which
+lets the daily sync fan out over every ticker at once without tripping the
+provider's limits. When Alpha Vantage answers with a rate-limit note instead
+of data, the request is retried with exponential backoff and jitter.
+Reference: product_spec.md#731-m_1000-daily-data-synchronization-and-calculation
+"""
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import httpx
+import pandas as pd
+
+from ...core.internal_models import MarketDataDB
+from ...core.rate_limiter import TokenBucket
+from ...settings import settings
+from .indicators import latest_market_data
+
+BASE_URL = "https://www.alphavantage.co/query"
+DAILY_SERIES_FUNCTION = "TIME_SERIES_DAILY"
+DAILY_SERIES_KEY = "Time Series (Daily)"
+# Alpha Vantage answers a throttled request with HTTP 200 and a 'Note'.
+RATE_LIMIT_KEY = "Note"
+# It also uses 'Information' for the per-minute or burst throttle, but for
+# failures that no retry fixes too: premium-only parameters and the
+# exhausted daily quota. Only messages containing one of these are retried.
+INFORMATION_KEY = "Information"
+THROTTLE_MARKERS = ("per minute", "per second", "more sparingly")
+ERROR_KEY = "Error Message"
+RETRY_BASE_DELAY_SECONDS = 2.0
+RETRY_MAX_DELAY_SECONDS = 60.0
+
+_DAILY_COLUMNS = {
+    "1. open": "open",
+    "2. high": "high",
+    "3. low": "low",
+    "4. close": "close",
+    "5. volume": "volume",
+}
+
+class MarketDataError(Exception):
+    """The provider rejected the request, e.g. for an unknown ticker."""
+
+class MarketDataUnavailableError(MarketDataError):
+    """The provider stayed rate-limited or unreachable after all retries."""
+
+class AlphaVantageClient:
+    """
+    Fetches daily OHLCV series from Alpha Vantage.
+    All methods are coroutines and share the given `httpx.AsyncClient`.
+    """
+    def __init__(
+        self,
+        api_key: str,
+        http_client: httpx.AsyncClient,
+        rate_limiter: TokenBucket,
+        max_concurrency: int,
+        max_retries: int,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        jitter: Callable[[], float] = random.random,
+    ):
+        self.api_key = api_key
+        self.http = http_client
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._sleep = sleep
+        self._jitter = jitter
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Half fixed, half random: retries of concurrent tickers spread out
+        # instead of hitting the quota again in lockstep.
+        delay = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+        return delay / 2 + delay / 2 * self._jitter()
+
+    async def _query(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Sends one API request, retrying rate-limit notes, 429/5xx responses
+        and transport errors.
+
+        Raises:
+            MarketDataError: If the API rejects the request.
+            MarketDataUnavailableError: If every attempt was rate-limited or
+                failed, or at once for an 'Information' that is not a throttle.
+        """
+        reason = "no attempt made"
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            payload = None
+            async with self._semaphore:
+                try:
+                    response = await self.http.get(BASE_URL, params={**params, "apikey": self.api_key})
+                    if response.status_code == 429 or response.status_code >= 500:
+                        reason = f"HTTP {response.status_code}"
+                    elif response.status_code >= 400:
+                        raise MarketDataError(f"HTTP {response.status_code} for {params.get('symbol')}")
+                    else:
+                        payload = response.json()
+                except httpx.TransportError as e:
+                    reason = f"{type(e).__name__}: {e}"
+
+            if payload is not None:
+                if ERROR_KEY in payload:
+                    raise MarketDataError(payload[ERROR_KEY])
+                if INFORMATION_KEY in payload:
+                    information = payload[INFORMATION_KEY]
+                    if not any(marker in information.lower() for marker in THROTTLE_MARKERS):
+                        raise MarketDataUnavailableError(f"Alpha Vantage request for {params.get('symbol')} failed: {information}")
+                    reason = information
+                elif RATE_LIMIT_KEY in payload:
+                    reason = payload[RATE_LIMIT_KEY]
+                else:
+                    return payload
+
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt)
+                print(f"DIAGNOSTIC: Alpha Vantage request for {params.get('symbol')} deferred {delay:.1f}s ({reason})")
+                await self._sleep(delay)
+        raise MarketDataUnavailableError(f"Alpha Vantage request for {params.get('symbol')} failed: {reason}")
+
+    async def fetch_daily_series(self, ticker: str, outputsize: str = "full") -> pd.DataFrame:
+        """
+        Returns the daily OHLCV series of `ticker`, indexed by date, oldest first.
+        `outputsize` is 'compact' (latest 100 days) or 'full'.
+        """
+        payload = await self._query({
+            "function": DAILY_SERIES_FUNCTION,
+            "symbol": ticker,
+            "outputsize": outputsize,
+        })
+        series = payload.get(DAILY_SERIES_KEY)
+        if not series:
+            raise MarketDataError(f"No daily series returned for {ticker}.")
+        frame = pd.DataFrame.from_dict(series, orient="index").rename(columns=_DAILY_COLUMNS)
+        frame = frame[list(_DAILY_COLUMNS.values())].astype(float)
+        frame["volume"] = frame["volume"].astype("int64")
+        frame.index = pd.to_datetime(frame.index, utc=True)
+        return frame.sort_index()
+
+    async def fetch_daily_series_many(
+        self, tickers: Iterable[str], outputsize: str = "full"
+    ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Exception]]:
+        """
+        Fetches several tickers concurrently within the rate and concurrency limits.
+
+        Returns:
+            The series of every ticker that succeeded, and the error of every
+            ticker that failed. A failing ticker does not affect the others.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        results = await asyncio.gather(
+            *[self.fetch_daily_series(ticker, outputsize) for ticker in tickers],
+            return_exceptions=True,
+        )
+        series: Dict[str, pd.DataFrame] = {}
+        failures: Dict[str, Exception] = {}
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, Exception):
+                failures[ticker] = result
+            else:
+                series[ticker] = result
+        return series, failures
+
+    async def get_daily_data_with_indicators(self, ticker: str) -> MarketDataDB:
+        """Returns the latest trading day of `ticker` with all indicators computed."""
+        series = await self.fetch_daily_series(ticker, outputsize="full")
+        return latest_market_data(ticker, series)
+
+# --- Shared client ---
+# One client per process, created on first use and closed on application shutdown.
+_client: Optional[AlphaVantageClient] = None
+
+def get_client() -> AlphaVantageClient:
+    global _client
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            timeout=settings.ALPHA_VANTAGE_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.ALPHA_VANTAGE_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.ALPHA_VANTAGE_MAX_CONCURRENCY,
+            ),
+        )
+        _client = AlphaVantageClient(
+            api_key=settings.ALPHA_VANTAGE_API_KEY,
+            http_client=http_client,
+            rate_limiter=TokenBucket.per_minute(settings.ALPHA_VANTAGE_REQUESTS_PER_MINUTE),
+            max_concurrency=settings.ALPHA_VANTAGE_MAX_CONCURRENCY,
+            max_retries=settings.ALPHA_VANTAGE_MAX_RETRIES,
+        )
+    return _client
+
+async def close_client():
+    """Closes the shared client's connection pool, if it was ever opened."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.http.aclose()
+
+async def fetch_daily_series(ticker: str, outputsize: str = "full") -> pd.DataFrame:
+    return await get_client().fetch_daily_series(ticker, outputsize)
+
+async def fetch_daily_series_many(tickers: Iterable[str], outputsize: str = "full"):
+    return await get_client().fetch_daily_series_many(tickers, outputsize)
+
+async def get_daily_data_with_indicators(ticker: str) -> MarketDataDB:
+    return await get_client().get_daily_data_with_indicators(ticker)
@@ -0,0 +1,154 @@
+"""
+Highs of a ticker's price history for the drawdown conditions.
+
+DRAWDOWN_FROM_HIGH needs the 52-week high and TRAILING_STOP_LOSS the highest
+price since a holding's first purchase. Scanning the history for each holding
+and day is O(holdings x days), so two structures answer them instead:
+
+- `RollingHigh` keeps the max of the last 252 highs in a monotonic deque
+  (amortized O(1) per bar). It is advanced by the sync with each new day,
+  stored in the ticker's parent document next to the indicator state, and
+  its value is written to every daily document as `high52Weeks`.
+- `HighsIndex` is a sparse table over the columnar history (see
+  price_history.py): the max of any range of rows in O(1) after an
+  O(n log n) vectorized build, and a day → row table so "max since date X"
+  is O(1) as well. It is derived from the stored history rather than stored
+  itself, since it is log2(n) times the size of the highs it indexes;
+  `append` extends it by new rows without rebuilding.
+Reference: product_spec.md#622-supported-conditions
+"""
+from collections import deque
+from datetime import date
+from typing import Deque, Optional, Tuple
+
+import numpy as np
+
+from .price_history import PriceHistory
+
+# Trading days in 52 weeks, the window of DRAWDOWN_FROM_HIGH.
+HIGH_52_WEEKS_DAYS = 252
+# Bumped whenever the stored layout changes; states of another version are rebuilt.
+HIGH_STATE_VERSION = 1
+
+class RollingHigh:
+    """The max of the last `window` highs, as a deque of (bar number, high) with decreasing highs."""
+    def __init__(self, window: int = HIGH_52_WEEKS_DAYS, count: int = 0):
+        self.window = window
+        self.count = count
+        self.entries: Deque[Tuple[int, float]] = deque()
+
+    @property
+    def high(self) -> Optional[float]:
+        return self.entries[0][1] if self.entries else None
+
+    def push(self, high: float) -> float:
+        """Adds the next bar's high and returns the max of the window ending with it."""
+        while self.entries and self.entries[-1][1] <= high:
+            self.entries.pop()
+        self.entries.append((self.count, float(high)))
+        self.count += 1
+        while self.entries[0][0] <= self.count - 1 - self.window:
+            self.entries.popleft()
+        return self.entries[0][1]
+
+    @classmethod
+    def replay(cls, highs: np.ndarray, window: int = HIGH_52_WEEKS_DAYS) -> "RollingHigh":
+        """Builds the state after the last of `highs`; only the last `window` bars matter."""
+        tail = highs[-window:] if window else highs[:0]
+        state = cls(window, count=len(highs) - len(tail))
+        for high in tail:
+            state.push(high)
+        return state
+
+    def to_document(self, as_of: date) -> dict:
+        """The state as a Firestore map, valid after the bar of `as_of`."""
+        bars, highs = zip(*self.entries) if self.entries else ((), ())
+        return {
+            "version": HIGH_STATE_VERSION,
+            "asOf": as_of.isoformat(),
+            "window": self.window,
+            "count": self.count,
+            "bars": np.asarray(bars, dtype="<i8").tobytes(),
+            "highs": np.asarray(highs, dtype="<f8").tobytes(),
+        }
+
+    @classmethod
+    def from_document(cls, document: dict) -> "RollingHigh":
+        state = cls(document["window"], document["count"])
+        bars = np.frombuffer(document["bars"], dtype="<i8")
+        highs = np.frombuffer(document["highs"], dtype="<f8")
+        state.entries.extend(zip(bars.tolist(), highs.tolist()))
+        return state
+
+def usable_high_state(document: Optional[dict], last_date: Optional[date]) -> bool:
+    """Whether a stored RollingHigh can be advanced from `last_date`, or must be rebuilt."""
+    return (
+        document is not None
+        and last_date is not None
+        and document.get("version") == HIGH_STATE_VERSION
+        and document.get("window") == HIGH_52_WEEKS_DAYS
+        and document.get("asOf") == last_date.isoformat()
+    )
+
+class HighsIndex:
+    """Range-max queries over one ticker's daily highs, oldest first."""
+    def __init__(self, history: PriceHistory):
+        self.days = np.empty(0, dtype=np.int64)
+        # levels[k][i] is the max of the 2**k highs starting at row i.
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._first_row_from = np.empty(0, dtype=np.int64)
+        self.append(history)
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def append(self, history: PriceHistory):
+        """Indexes the rows of `history` after the last indexed day."""
+        days = history["date"]
+        if len(self.days):
+            days_new = days > self.days[-1]
+            highs = history["high"][days_new]
+            days = days[days_new]
+        else:
+            highs = history["high"]
+        if not len(days):
+            return
+        first_new_day = self.days[-1] + 1 if len(self.days) else days[0]
+        self.days = np.concatenate([self.days, days])
+        self.levels[0] = np.concatenate([self.levels[0], highs.astype(np.float64)])
+        rows = len(self.levels[0])
+        level = 1
+        while (1 << level) <= rows:
+            half = 1 << (level - 1)
+            previous = self.levels[level - 1]
+            if level == len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            # Only the entries whose range ends in the new rows are computed.
+            start, stop = len(self.levels[level]), rows - (1 << level) + 1
+            self.levels[level] = np.concatenate([self.levels[level], np.maximum(previous[start:stop], previous[start + half:stop + half])])
+            level += 1
+        # The first row on or after every calendar day from the first to the last indexed day.
+        self._first_row_from = np.concatenate([
+            self._first_row_from, np.searchsorted(self.days, np.arange(first_new_day, self.days[-1] + 1)),
+        ])
+
+    def max(self, start: int, stop: int) -> Optional[float]:
+        """The highest high of rows [start, stop), or None for an empty range."""
+        start, stop = max(int(start), 0), min(int(stop), len(self))
+        if start >= stop:
+            return None
+        level = (stop - start).bit_length() - 1
+        values = self.levels[level]
+        return float(max(values[start], values[stop - (1 << level)]))
+
+    def high_since(self, day: date) -> Optional[float]:
+        """The highest high on or after `day`."""
+        if not len(self):
+            return None
+        offset = int(np.datetime64(day, "D").astype(np.int64)) - int(self.days[0])
+        if offset >= len(self._first_row_from):
+            return None
+        return self.max(int(self._first_row_from[offset]) if offset > 0 else 0, len(self))
+
+    def high_52_weeks(self) -> Optional[float]:
+        return self.max(len(self) - HIGH_52_WEEKS_DAYS, len(self))
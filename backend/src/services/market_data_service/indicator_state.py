@@ -0,0 +1,175 @@
+"""
+Streaming indicator state, advanced one trading day at a time.
+
+A daily sync adds one bar per ticker, so recomputing a 200-day average or the
+EWMA chains behind RSI and MACD from the full history repeats work that was
+already done. `IndicatorState` keeps what each indicator needs to move forward:
+- ring buffers of the last 200 closes and volumes and the last 14 true ranges,
+- running window sums for every SMA/VWMA period and for the ATR,
+- the numerator and weight of each EWMA (RSI gains and losses, MACD fast,
+  slow and signal), which is how the bias-adjusted mean updates in O(1).
+
+The state is vectorized like the batch engine in indicators.py: one row per
+ticker, and `advance` takes one bar for every row. `replay` rebuilds a state
+from a history; it is the full-recompute path used when no stored state can be
+trusted, and its outputs match `compute_indicators` over the same bars.
+"""
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .indicators import ATR_PERIOD, MACD_FAST_SPAN, MACD_SIGNAL_SPAN, MACD_SLOW_SPAN, RSI_PERIOD, SMA_PERIODS, VWMA_PERIODS, span_alpha
+
+# Bumped whenever the stored layout or an indicator definition changes;
+# states of another version are rebuilt from the history.
+INDICATOR_STATE_VERSION = 1
+WINDOW_PERIODS = tuple(sorted(set(SMA_PERIODS) | set(VWMA_PERIODS)))
+RING_SIZE = max(WINDOW_PERIODS)
+EWMA_ALPHAS = {
+    "gain": 1.0 / RSI_PERIOD,
+    "loss": 1.0 / RSI_PERIOD,
+    "fast": span_alpha(MACD_FAST_SPAN),
+    "slow": span_alpha(MACD_SLOW_SPAN),
+    "signal": span_alpha(MACD_SIGNAL_SPAN),
+}
+
+class IndicatorState:
+    """The streaming state of several tickers, one row per ticker."""
+    def __init__(self, tickers: int):
+        self.count = np.zeros(tickers, dtype=np.int64)
+        self.previous_close = np.full(tickers, np.nan)
+        self.closes = np.zeros((tickers, RING_SIZE))
+        self.volumes = np.zeros((tickers, RING_SIZE))
+        self.ranges = np.zeros((tickers, ATR_PERIOD))
+        self.close_sums = {period: np.zeros(tickers) for period in WINDOW_PERIODS}
+        self.weighted_sums = {period: np.zeros(tickers) for period in WINDOW_PERIODS}
+        self.volume_sums = {period: np.zeros(tickers) for period in WINDOW_PERIODS}
+        self.range_sum = np.zeros(tickers)
+        self.ewma_weighted = {name: np.zeros(tickers) for name in EWMA_ALPHAS}
+        self.ewma_weights = {name: np.zeros(tickers) for name in EWMA_ALPHAS}
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def _update_ewma(self, name: str, values: np.ndarray, present: np.ndarray) -> np.ndarray:
+        decay = 1.0 - EWMA_ALPHAS[name]
+        self.ewma_weighted[name] = np.where(present, values + decay * self.ewma_weighted[name], self.ewma_weighted[name])
+        self.ewma_weights[name] = np.where(present, 1.0 + decay * self.ewma_weights[name], self.ewma_weights[name])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.ewma_weights[name] > 0, self.ewma_weighted[name] / self.ewma_weights[name], np.nan)
+
+    def advance(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Adds one bar per ticker (NaN close = no bar for that ticker) and returns
+        the indicators of that bar, keyed like `compute_indicators`. Rows
+        without a bar are unchanged and get NaN.
+        """
+        present = ~np.isnan(close)
+        rows = np.arange(len(self))
+        volume = volume.astype(float)
+        count = self.count
+
+        # Window sums: add the new bar, drop the one leaving each window.
+        for period in WINDOW_PERIODS:
+            leaving = (count - period) % RING_SIZE
+            full = present & (count >= period)
+            self.close_sums[period] += np.where(present, close, 0.0) - np.where(full, self.closes[rows, leaving], 0.0)
+            self.volume_sums[period] += np.where(present, volume, 0.0) - np.where(full, self.volumes[rows, leaving], 0.0)
+            self.weighted_sums[period] += (
+                np.where(present, close * volume, 0.0)
+                - np.where(full, self.closes[rows, leaving] * self.volumes[rows, leaving], 0.0)
+            )
+
+        # True range; fmax ignores the missing previous close of a first bar.
+        previous = self.previous_close
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(previous - low)))
+        slot = count % ATR_PERIOD
+        self.range_sum += np.where(present, true_range, 0.0) - np.where(present & (count >= ATR_PERIOD), self.ranges[rows, slot], 0.0)
+        self.ranges[rows, slot] = np.where(present, true_range, self.ranges[rows, slot])
+
+        slot = count % RING_SIZE
+        self.closes[rows, slot] = np.where(present, close, self.closes[rows, slot])
+        self.volumes[rows, slot] = np.where(present, volume, self.volumes[rows, slot])
+
+        change = close - previous
+        has_change = present & ~np.isnan(change)
+        gains = self._update_ewma("gain", np.maximum(change, 0.0), has_change)
+        losses = self._update_ewma("loss", np.maximum(-change, 0.0), has_change)
+        macd_value = self._update_ewma("fast", close, present) - self._update_ewma("slow", close, present)
+        macd_signal = self._update_ewma("signal", macd_value, present)
+
+        self.count = count + present
+        self.previous_close = np.where(present, close, previous)
+
+        outputs: Dict[str, np.ndarray] = {}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for period in SMA_PERIODS:
+                outputs[f"sma{period}"] = np.where(present & (self.count >= period), self.close_sums[period] / period, np.nan)
+            for period in VWMA_PERIODS:
+                outputs[f"vwma{period}"] = np.where(
+                    present & (self.count >= period), self.weighted_sums[period] / self.volume_sums[period], np.nan
+                )
+            outputs[f"rsi{RSI_PERIOD}"] = np.where(present, 100.0 - 100.0 / (1.0 + gains / losses), np.nan)
+            outputs[f"atr{ATR_PERIOD}"] = np.where(present & (self.count >= ATR_PERIOD), self.range_sum / ATR_PERIOD, np.nan)
+        outputs["macdValue"] = np.where(present, macd_value, np.nan)
+        outputs["macdSignal"] = np.where(present, macd_signal, np.nan)
+        return outputs
+
+    @classmethod
+    def replay(cls, high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> Tuple["IndicatorState", Dict[str, np.ndarray]]:
+        """
+        Builds the state of every row from 2-D (tickers x days) arrays and
+        returns it with the indicators of every day.
+        """
+        state = cls(close.shape[0])
+        outputs: Dict[str, List[np.ndarray]] = {}
+        for day in range(close.shape[1]):
+            for name, values in state.advance(high[:, day], low[:, day], close[:, day], volume[:, day]).items():
+                outputs.setdefault(name, []).append(values)
+        return state, {name: np.stack(columns, axis=1) for name, columns in outputs.items()}
+
+    def to_document(self, row: int, as_of: date) -> dict:
+        """The state of one ticker as a Firestore map, valid after the bar of `as_of`."""
+        return {
+            "version": INDICATOR_STATE_VERSION,
+            "asOf": as_of.isoformat(),
+            "count": int(self.count[row]),
+            "previousClose": float(self.previous_close[row]),
+            "closes": self.closes[row].astype("<f8").tobytes(),
+            "volumes": self.volumes[row].astype("<f8").tobytes(),
+            "ranges": self.ranges[row].astype("<f8").tobytes(),
+            "closeSums": {str(period): float(sums[row]) for period, sums in self.close_sums.items()},
+            "weightedSums": {str(period): float(sums[row]) for period, sums in self.weighted_sums.items()},
+            "volumeSums": {str(period): float(sums[row]) for period, sums in self.volume_sums.items()},
+            "rangeSum": float(self.range_sum[row]),
+            "ewma": {name: [float(self.ewma_weighted[name][row]), float(self.ewma_weights[name][row])] for name in EWMA_ALPHAS},
+        }
+
+    @classmethod
+    def from_documents(cls, documents: List[dict]) -> "IndicatorState":
+        """Stacks stored per-ticker states into one state, in the given order."""
+        state = cls(len(documents))
+        for row, document in enumerate(documents):
+            state.count[row] = document["count"]
+            state.previous_close[row] = document["previousClose"]
+            state.closes[row] = np.frombuffer(document["closes"], dtype="<f8")
+            state.volumes[row] = np.frombuffer(document["volumes"], dtype="<f8")
+            state.ranges[row] = np.frombuffer(document["ranges"], dtype="<f8")
+            for period in WINDOW_PERIODS:
+                state.close_sums[period][row] = document["closeSums"][str(period)]
+                state.weighted_sums[period][row] = document["weightedSums"][str(period)]
+                state.volume_sums[period][row] = document["volumeSums"][str(period)]
+            state.range_sum[row] = document["rangeSum"]
+            for name in EWMA_ALPHAS:
+                state.ewma_weighted[name][row], state.ewma_weights[name][row] = document["ewma"][name]
+        return state
+
+def usable_state(document: Optional[dict], last_date: Optional[date]) -> bool:
+    """Whether a stored state can be advanced from `last_date`, or must be rebuilt."""
+    return (
+        document is not None
+        and last_date is not None
+        and document.get("version") == INDICATOR_STATE_VERSION
+        and document.get("asOf") == last_date.isoformat()
+    )
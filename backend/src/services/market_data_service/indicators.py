@@ -0,0 +1,196 @@
+"""
+Vectorized technical indicators over many tickers at once.
+
+Inputs are 2-D arrays with one row per ticker and one column per trading day,
+oldest first. Rows are right-aligned: a ticker with a shorter history is padded
+with NaN on the left (see `right_align`). Every indicator is computed for all
+tickers in one pass: moving averages from cumulative sums, and the
+exponentially weighted averages (RSI, MACD) by advancing one recurrence per
+day across all rows. Only the raw OHLCV data is fetched from the provider.
+
+The definitions match those of the 'finta' library the backend used before:
+EWMAs are bias-adjusted (pandas `adjust=True`), RSI smooths gains and losses
+with alpha = 1/14, and ATR is the 14-day simple average of the true range.
+Reference: product_spec.md#72-data-models
+"""
+import math
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ...core.internal_models import MarketDataDB
+
+SMA_PERIODS = (7, 20, 50, 200)
+VWMA_PERIODS = (7, 20, 50, 200)
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+MACD_FAST_SPAN = 12
+MACD_SLOW_SPAN = 26
+MACD_SIGNAL_SPAN = 9
+
+def right_align(rows: Sequence[np.ndarray], length: Optional[int] = None) -> np.ndarray:
+    """Stacks 1-D series of different lengths into a 2-D float array, padding on the left with NaN."""
+    length = length if length is not None else max((len(row) for row in rows), default=0)
+    stacked = np.full((len(rows), length), np.nan)
+    for i, row in enumerate(rows):
+        row = row[-length:] if length else row[:0]
+        if len(row):
+            stacked[i, length - len(row):] = row
+    return stacked
+
+def rolling_sum(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Sum over the trailing `period` days, from the difference of two cumulative
+    sums. Windows that contain a NaN are NaN.
+    """
+    valid = ~np.isnan(values)
+    zero_pad = np.zeros((values.shape[0], 1))
+    sums = np.concatenate([zero_pad, np.cumsum(np.where(valid, values, 0.0), axis=1)], axis=1)
+    counts = np.concatenate([zero_pad, np.cumsum(valid, axis=1)], axis=1)
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] >= period:
+        window_sums = sums[:, period:] - sums[:, :-period]
+        full = (counts[:, period:] - counts[:, :-period]) == period
+        result[:, period - 1:] = np.where(full, window_sums, np.nan)
+    return result
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    return rolling_sum(values, period) / period
+
+def vwma(close: np.ndarray, volume: np.ndarray, period: int) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return rolling_sum(close * volume, period) / rolling_sum(volume, period)
+
+def ewma(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Bias-adjusted exponentially weighted mean along each row. Each row starts
+    at its first non-NaN value; later NaNs are skipped.
+    """
+    decay = 1.0 - alpha
+    weighted = np.zeros(values.shape[0])
+    weights = np.zeros(values.shape[0])
+    result = np.full(values.shape, np.nan)
+    for day in range(values.shape[1]):
+        column = values[:, day]
+        present = ~np.isnan(column)
+        weighted = np.where(present, column + decay * weighted, weighted)
+        weights = np.where(present, 1.0 + decay * weights, weights)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[:, day] = np.where(weights > 0, weighted / weights, np.nan)
+    return result
+
+def diff(values: np.ndarray) -> np.ndarray:
+    result = np.full(values.shape, np.nan)
+    result[:, 1:] = values[:, 1:] - values[:, :-1]
+    return result
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    change = diff(close)
+    # np.maximum keeps the NaN of the first day, so the averages start on the second.
+    gains = ewma(np.maximum(change, 0.0), 1.0 / period)
+    losses = ewma(np.maximum(-change, 0.0), 1.0 / period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100.0 - 100.0 / (1.0 + gains / losses)
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    previous_close = np.full(close.shape, np.nan)
+    previous_close[:, 1:] = close[:, :-1]
+    # fmax ignores the missing previous close of the first day.
+    return np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(previous_close - low)))
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = ATR_PERIOD) -> np.ndarray:
+    return sma(true_range(high, low, close), period)
+
+def span_alpha(span: int) -> float:
+    return 2.0 / (span + 1.0)
+
+def macd(close: np.ndarray) -> Dict[str, np.ndarray]:
+    value = ewma(close, span_alpha(MACD_FAST_SPAN)) - ewma(close, span_alpha(MACD_SLOW_SPAN))
+    signal = ewma(value, span_alpha(MACD_SIGNAL_SPAN))
+    return {"macdValue": value, "macdSignal": signal}
+
+def compute_indicators(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Computes every stored indicator for all rows.
+
+    Returns:
+        One (tickers x days) array per MarketDataDB indicator field, plus
+        'macdValue' and 'macdSignal' for the MACD object.
+    """
+    volume = volume.astype(float)
+    indicators: Dict[str, np.ndarray] = {}
+    for period in SMA_PERIODS:
+        indicators[f"sma{period}"] = sma(close, period)
+    for period in VWMA_PERIODS:
+        indicators[f"vwma{period}"] = vwma(close, volume, period)
+    indicators[f"rsi{RSI_PERIOD}"] = rsi(close, RSI_PERIOD)
+    indicators[f"atr{ATR_PERIOD}"] = atr(high, low, close, ATR_PERIOD)
+    indicators.update(macd(close))
+    return indicators
+
+def _optional(value) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) else value
+
+def build_market_data(ticker: str, day, ohlcv: Dict[str, float], indicators: Dict[str, float]) -> MarketDataDB:
+    """
+    Builds the stored document for one day. `day` is a naive UTC date or
+    datetime64 value.
+    """
+    macd_value = _optional(indicators["macdValue"])
+    macd_signal = _optional(indicators["macdSignal"])
+    macd_object = None
+    if macd_value is not None and macd_signal is not None:
+        macd_object = {"value": macd_value, "signal": macd_signal, "histogram": macd_value - macd_signal}
+    fields = {
+        name: _optional(values) for name, values in indicators.items()
+        if name not in ("macdValue", "macdSignal")
+    }
+    return MarketDataDB(
+        date=pd.Timestamp(day).tz_localize("UTC").to_pydatetime(),
+        ticker=ticker,
+        open=float(ohlcv["open"]),
+        high=float(ohlcv["high"]),
+        low=float(ohlcv["low"]),
+        close=float(ohlcv["close"]),
+        volume=int(ohlcv["volume"]),
+        macd=macd_object,
+        **fields,
+    )
+
+def market_data_documents(
+    ticker: str,
+    dates: np.ndarray,
+    ohlcv: Dict[str, np.ndarray],
+    indicators: Dict[str, np.ndarray],
+    row: int,
+    count: int,
+) -> List[MarketDataDB]:
+    """
+    Builds the documents of the last `count` days of one ticker.
+
+    `dates` and `ohlcv` are the ticker's own (unpadded) series; `indicators`
+    is the output of `compute_indicators` and `row` the ticker's row in it.
+    """
+    documents = []
+    for offset in range(-count, 0):
+        documents.append(build_market_data(
+            ticker,
+            dates[offset],
+            {name: values[offset] for name, values in ohlcv.items()},
+            {name: values[row, offset] for name, values in indicators.items()},
+        ))
+    return documents
+
+def latest_market_data(ticker: str, ohlcv: pd.DataFrame) -> MarketDataDB:
+    """Computes the indicators over one ticker's OHLCV frame and returns its most recent day."""
+    columns = {name: ohlcv[name].to_numpy() for name in ("open", "high", "low", "close", "volume")}
+    indicators = compute_indicators(
+        columns["high"][None, :].astype(float),
+        columns["low"][None, :].astype(float),
+        columns["close"][None, :].astype(float),
+        columns["volume"][None, :],
+    )
+    # `.values` of a UTC index are naive datetime64 values in UTC.
+    return market_data_documents(ticker, ohlcv.index.values, columns, indicators, row=0, count=1)[0]
@@ -0,0 +1,356 @@
+"""
+Incremental synchronization of the shared 'marketData' cache.
+
+Each ticker's parent document `/marketData/{ticker}` records the last date
+stored under `/marketData/{ticker}/daily`. A sync only requests what is
+missing: nothing if the ticker is already current, the provider's 'compact'
+series (latest 100 trading days) if the gap is small, and the 'full' series
+otherwise. Only days after the stored last date are written, so a steady-state
+daily run costs one compact request and one new document per ticker.
+
+Indicators need more history than a compact response holds. It comes from the
+ticker's columnar price history (see price_history.py), which is read in one
+batched call for all tickers and extended in the same commit as the new days.
+The indicators themselves are streamed: each ticker's parent document also
+holds its IndicatorState (see indicator_state.py), which is advanced over the
+new days only. Tickers without a usable state, or all tickers when a run asks
+for it, fall back to a full recompute from the history that rebuilds the state.
+Reference: product_spec.md#731-m_1000-daily-data-synchronization-and-calculation
+"""
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ...core.internal_models import MarketDataDB
+from ...core.query_catalog import MARKET_DATA_DAILY_IN_RANGE
+from ...core.unit_of_work import MAX_BATCH_WRITES, unit_of_work
+from . import alpha_vantage_service
+from .highs_index import RollingHigh, usable_high_state
+from .indicator_state import IndicatorState, usable_state
+from .indicators import compute_indicators, market_data_documents, right_align
+from .price_history import HISTORY_CHUNK_ROWS, PriceHistory, PriceHistoryStore
+
+# 'compact' returns the latest 100 trading days; a gap of fewer calendar days
+# always fits in it.
+COMPACT_MAX_GAP_DAYS = 100
+# Days stored when a ticker is synced for the first time (see H_I_5002).
+BACKFILL_DAYS = 366
+# Days of stored history the indicators of new days are computed over.
+# SMA200/VWMA200 need 200; the rest warms up the EWMA-based RSI and MACD.
+INDICATOR_LOOKBACK_DAYS = 300
+# Tickers whose history is read and written at the same time.
+SYNC_WRITE_CONCURRENCY = 16
+
+OHLCV_FIELDS = ["date", "open", "high", "low", "close", "volume"]
+
+@dataclass
+class _TickerUpdate:
+    """A ticker's extended history and the number of trailing days to write."""
+    ticker: str
+    history: PriceHistory
+    previous_rows: int
+    new_days: int
+    # The stored streaming state, if it can be advanced; None means recompute.
+    stored_state: Optional[dict] = None
+    indicator_state: Optional[dict] = None
+    # The same for the rolling 52-week high (see highs_index.py).
+    stored_high_state: Optional[dict] = None
+    high_state: Optional[dict] = None
+
+@dataclass
+class MarketDataSyncResult:
+    """The outcome of one sync run."""
+    written: Dict[str, int] = field(default_factory=dict)
+    up_to_date: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    # Updated tickers whose indicators were recomputed from history rather than streamed.
+    recomputed: List[str] = field(default_factory=list)
+
+@dataclass
+class SyncBatch:
+    """Tickers fetched by `MarketDataSyncService.fetch` and not yet stored."""
+    target_day: date
+    result: MarketDataSyncResult = field(default_factory=MarketDataSyncResult)
+    updates: List[_TickerUpdate] = field(default_factory=list)
+    # Provider errors by ticker, kept as exceptions so callers can tell an
+    # unavailable provider from a rejected ticker.
+    fetch_errors: Dict[str, Exception] = field(default_factory=dict)
+    requests: Dict[str, int] = field(default_factory=lambda: {"compact": 0, "full": 0})
+
+def _advance_high(update: "_TickerUpdate", documents: List[MarketDataDB]) -> dict:
+    """
+    Sets `high52Weeks` on the new days' documents by advancing the stored
+    rolling high, or one rebuilt from the history before them, and returns
+    the state to store.
+    """
+    highs = update.history["high"]
+    new_days = len(documents)
+    if update.stored_high_state is not None:
+        rolling = RollingHigh.from_document(update.stored_high_state)
+    else:
+        rolling = RollingHigh.replay(highs[:len(highs) - new_days])
+    for document, high in zip(documents, highs[len(highs) - new_days:]):
+        document.high52Weeks = rolling.push(high)
+    return rolling.to_document(documents[-1].date.date())
+
+def latest_trading_day(as_of: date) -> date:
+    """The most recent weekday on or before `as_of`."""
+    while as_of.weekday() >= 5:
+        as_of -= timedelta(days=1)
+    return as_of
+
+def _to_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).date() if value.tzinfo else value.date()
+    return value
+
+class MarketDataSyncService:
+    """
+    Brings `/marketData` up to date for a set of tickers.
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+    """
+    def __init__(self, db_client, market_data_client: Optional[alpha_vantage_service.AlphaVantageClient] = None):
+        self.db = db_client
+        self.market_data_collection = self.db.collection("marketData")
+        self.market_data_client = market_data_client or alpha_vantage_service.get_client()
+        self.history_store = PriceHistoryStore(db_client)
+
+    async def get_sync_records(self, tickers: List[str]) -> Dict[str, Tuple[Optional[date], Optional[dict], Optional[dict]]]:
+        """Reads the last stored date, indicator state and 52-week high state of every ticker in one batched read."""
+        refs = [self.market_data_collection.document(ticker) for ticker in tickers]
+        records: Dict[str, Tuple[Optional[date], Optional[dict], Optional[dict]]] = {ticker: (None, None, None) for ticker in tickers}
+        async for doc in self.db.get_all(refs, field_paths=["lastDate", "indicatorState", "highState"]):
+            if doc.exists:
+                data = doc.to_dict()
+                records[doc.id] = (_to_date(data.get("lastDate")), data.get("indicatorState"), data.get("highState"))
+        return records
+
+    async def sync_tickers(self, tickers: Iterable[str], as_of: Optional[date] = None, recompute: bool = False) -> MarketDataSyncResult:
+        """
+        Fetches and stores the missing days of every ticker.
+
+        Args:
+            as_of: The day the run is for; defaults to today (UTC).
+            recompute: Compute the indicators of every updated ticker from its
+                history and rebuild its streaming state, instead of advancing
+                the stored state. Tickers without a usable state always are.
+        """
+        return await self.store(await self.fetch(tickers, as_of, recompute))
+
+    async def fetch(self, tickers: Iterable[str], as_of: Optional[date] = None, recompute: bool = False) -> "SyncBatch":
+        """
+        The download half of `sync_tickers`: requests the missing days of every
+        ticker and extends its history in memory. Nothing is written until the
+        batch is passed to `store`, so the monitoring job can download the next
+        tickers while the previous ones are being stored.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        target_day = latest_trading_day(as_of or datetime.now(timezone.utc).date())
+        records = await self.get_sync_records(tickers)
+        last_dates = {ticker: record[0] for ticker, record in records.items()}
+
+        batch = SyncBatch(target_day)
+        compact: List[str] = []
+        full: List[str] = []
+        for ticker in tickers:
+            last_date = last_dates[ticker]
+            if last_date is not None and last_date >= target_day:
+                batch.result.up_to_date.append(ticker)
+            elif last_date is not None and (target_day - last_date).days < COMPACT_MAX_GAP_DAYS:
+                compact.append(ticker)
+            else:
+                full.append(ticker)
+        batch.requests = {"compact": len(compact), "full": len(full)}
+
+        (compact_series, compact_failures), (full_series, full_failures) = await asyncio.gather(
+            self.market_data_client.fetch_daily_series_many(compact, outputsize="compact"),
+            self.market_data_client.fetch_daily_series_many(full, outputsize="full"),
+        )
+        batch.fetch_errors = {**compact_failures, **full_failures}
+        for ticker, error in batch.fetch_errors.items():
+            batch.result.failed[ticker] = str(error)
+
+        fetched = {**compact_series, **full_series}
+        histories = await self.history_store.load_many(list(fetched))
+        prepared = await asyncio.gather(
+            *[
+                self._prepare_update(ticker, series, last_dates[ticker], histories[ticker], *((None, None) if recompute else records[ticker][1:]))
+                for ticker, series in fetched.items()
+            ],
+            return_exceptions=True,
+        )
+        for ticker, update in zip(fetched, prepared):
+            if isinstance(update, Exception):
+                print(f"DIAGNOSTIC: Failed to prepare market data for {ticker}: {update}")
+                batch.result.failed[ticker] = str(update)
+            elif update.new_days:
+                batch.updates.append(update)
+            else:
+                batch.result.written[ticker] = 0
+        return batch
+
+    async def store(self, batch: "SyncBatch") -> MarketDataSyncResult:
+        """
+        The second half of `sync_tickers`: computes the indicators of the new
+        days of a fetched batch and writes them.
+        """
+        result, updates = batch.result, batch.updates
+        streamed = [update for update in updates if update.stored_state is not None]
+        recomputed = [update for update in updates if update.stored_state is None]
+        result.recomputed = [update.ticker for update in recomputed]
+        documents = {**self._stream_documents(streamed), **self._recompute_documents(recomputed)}
+        semaphore = asyncio.Semaphore(SYNC_WRITE_CONCURRENCY)
+
+        async def _store(update: _TickerUpdate):
+            async with semaphore:
+                try:
+                    await self._write_update(update, documents[update.ticker])
+                    result.written[update.ticker] = len(documents[update.ticker])
+                except Exception as e:
+                    print(f"DIAGNOSTIC: Failed to store market data for {update.ticker}: {e}")
+                    result.failed[update.ticker] = str(e)
+
+        await asyncio.gather(*[_store(update) for update in updates])
+        print(
+            f"DIAGNOSTIC: Market data sync: {sum(result.written.values())} new days for {len(result.written)} tickers "
+            f"({batch.requests['compact']} compact, {batch.requests['full']} full requests), {len(result.up_to_date)} up to date, "
+            f"{len(result.failed)} failed"
+        )
+        return result
+
+    async def load_latest(self, tickers: Iterable[str], as_of: date, days: int = 2) -> Dict[str, List[MarketDataDB]]:
+        """
+        Reads the last `days` stored daily documents of every ticker up to
+        `as_of`, oldest first. Tickers without stored data are left out.
+        """
+        end = datetime(as_of.year, as_of.month, as_of.day, tzinfo=timezone.utc)
+        semaphore = asyncio.Semaphore(SYNC_WRITE_CONCURRENCY)
+
+        async def _load(ticker: str) -> List[MarketDataDB]:
+            daily = self.market_data_collection.document(ticker).collection("daily")
+            query = MARKET_DATA_DAILY_IN_RANGE.build(daily, date=[("<=", end)]).limit(days)
+            async with semaphore:
+                rows = [MarketDataDB(**doc.to_dict()) async for doc in query.stream()]
+            return rows[::-1]
+
+        tickers = list(dict.fromkeys(tickers))
+        rows = await asyncio.gather(*[_load(ticker) for ticker in tickers])
+        return {ticker: ticker_rows for ticker, ticker_rows in zip(tickers, rows) if ticker_rows}
+
+    async def _load_history_before(self, ticker: str, before: pd.Timestamp) -> pd.DataFrame:
+        """Reads up to BACKFILL_DAYS stored daily documents before `before`, oldest first."""
+        daily = self.market_data_collection.document(ticker).collection("daily")
+        query = MARKET_DATA_DAILY_IN_RANGE.build(daily, date=[("<", before.to_pydatetime())])
+        query = query.select(OHLCV_FIELDS).limit(BACKFILL_DAYS)
+        rows = [doc.to_dict() async for doc in query.stream()]
+        if not rows:
+            return pd.DataFrame(columns=OHLCV_FIELDS[1:], index=pd.DatetimeIndex([], tz="UTC"))
+        frame = pd.DataFrame(rows)
+        frame.index = pd.to_datetime(frame.pop("date"), utc=True)
+        return frame.sort_index()
+
+    async def _prepare_update(
+        self,
+        ticker: str,
+        series: pd.DataFrame,
+        last_date: Optional[date],
+        stored: PriceHistory,
+        stored_state: Optional[dict],
+        stored_high_state: Optional[dict],
+    ) -> "_TickerUpdate":
+        """Appends the fetched series to the ticker's columnar history and counts the days to write."""
+        previous_rows = len(stored)
+        if not previous_rows and last_date is not None and not series.empty:
+            # Stored before the columnar history existed: seed it from the daily documents.
+            stored = PriceHistory.from_frame(await self._load_history_before(ticker, series.index[0]))
+        history = stored.append(series) if not series.empty else stored
+        if last_date is None:
+            new_days = min(len(history), BACKFILL_DAYS)
+        else:
+            new_days = int(np.count_nonzero(history.dates > np.datetime64(last_date, "D")))
+        if not usable_state(stored_state, last_date):
+            stored_state = None
+        if not usable_high_state(stored_high_state, last_date):
+            stored_high_state = None
+        return _TickerUpdate(ticker, history, previous_rows, new_days, stored_state, stored_high_state=stored_high_state)
+
+    @staticmethod
+    def _bars(tails: List[PriceHistory]) -> Dict[str, np.ndarray]:
+        window = max(len(tail) for tail in tails)
+        return {
+            name: right_align([tail[name].astype(float) for tail in tails], window)
+            for name in ("high", "low", "close", "volume")
+        }
+
+    @staticmethod
+    def _documents(updates: List["_TickerUpdate"], tails: List[PriceHistory], indicators: Dict[str, np.ndarray], state: IndicatorState) -> Dict[str, List[MarketDataDB]]:
+        documents = {}
+        for row, (update, tail) in enumerate(zip(updates, tails)):
+            documents[update.ticker] = market_data_documents(
+                update.ticker, tail.dates, {name: tail[name] for name in OHLCV_FIELDS[1:]},
+                indicators, row=row, count=update.new_days,
+            )
+            update.indicator_state = state.to_document(row, documents[update.ticker][-1].date.date())
+            update.high_state = _advance_high(update, documents[update.ticker])
+        return documents
+
+    def _stream_documents(self, updates: List["_TickerUpdate"]) -> Dict[str, List[MarketDataDB]]:
+        """Advances the stored indicator states over the new days only: O(1) per ticker and day."""
+        if not updates:
+            return {}
+        state = IndicatorState.from_documents([update.stored_state for update in updates])
+        tails = [update.history.tail(update.new_days) for update in updates]
+        bars = self._bars(tails)
+        columns: Dict[str, List[np.ndarray]] = {}
+        for day in range(bars["close"].shape[1]):
+            for name, values in state.advance(*(bars[name][:, day] for name in ("high", "low", "close", "volume"))).items():
+                columns.setdefault(name, []).append(values)
+        indicators = {name: np.stack(values, axis=1) for name, values in columns.items()}
+        return self._documents(updates, tails, indicators, state)
+
+    def _recompute_documents(self, updates: List["_TickerUpdate"]) -> Dict[str, List[MarketDataDB]]:
+        """
+        The full-recompute path: computes the indicators of the new days from
+        the history in one vectorized pass and rebuilds the streaming state by
+        replaying the same bars.
+        """
+        if not updates:
+            return {}
+        tails = [update.history.tail(INDICATOR_LOOKBACK_DAYS + update.new_days) for update in updates]
+        bars = self._bars(tails)
+        indicators = compute_indicators(**bars)
+        state, _ = IndicatorState.replay(**bars)
+        return self._documents(updates, tails, indicators, state)
+
+    async def _write_update(self, update: "_TickerUpdate", documents: List[MarketDataDB]):
+        """
+        Writes the new daily documents. The history chunks and the parent
+        document's `lastDate` are written in the final batch, so they never
+        point past daily data that was not stored.
+        """
+        ticker, history, previous_rows = update.ticker, update.history, update.previous_rows
+        daily = self.market_data_collection.document(ticker).collection("daily")
+        # The final batch also holds the history chunks and the parent document.
+        final_writes = len(history.encode_chunks(previous_rows // HISTORY_CHUNK_ROWS)) + 1
+        chunk_size = MAX_BATCH_WRITES - final_writes
+        for start in range(0, len(documents), chunk_size):
+            chunk = documents[start:start + chunk_size]
+            async with unit_of_work(self.db) as uow:
+                for document in chunk:
+                    uow.set(daily.document(document.date.strftime("%Y-%m-%d")), document.model_dump())
+                if start + chunk_size >= len(documents):
+                    history_fields = self.history_store.stage_write(uow, ticker, history, previous_rows)
+                    uow.set(self.market_data_collection.document(ticker), {
+                        "ticker": ticker,
+                        "lastDate": documents[-1].date,
+                        "modifiedAt": datetime.now(timezone.utc),
+                        "indicatorState": update.indicator_state,
+                        "highState": update.high_state,
+                        **history_fields,
+                    }, merge=True)
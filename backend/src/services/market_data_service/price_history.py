@@ -0,0 +1,188 @@
+"""
+Columnar per-ticker price history stored alongside the daily documents.
+
+Reading 200-366 `/marketData/{ticker}/daily/{date}` documents to compute a
+long moving average or a 52-week high is slow and billed per document. The
+same OHLCV series is therefore also kept as packed little-endian arrays in
+`/marketData/{ticker}/history/{chunk}`: one bytes field per column, up to
+HISTORY_CHUNK_ROWS rows per document (about 16 years of trading days). Loading
+a ticker is one document read, and `np.frombuffer` exposes the bytes as arrays
+without copying them.
+
+Appends rewrite only the last, partially filled chunk, and any new chunks.
+The parent document `/marketData/{ticker}` records the row and chunk counts.
+Reference: product_spec.md#72-data-models
+"""
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# (column, dtype); dates are days since the Unix epoch.
+HISTORY_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("date", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<i8"),
+)
+# 48 bytes per row; 4096 rows keep a chunk far below Firestore's 1 MiB limit.
+HISTORY_CHUNK_ROWS = 4096
+
+class PriceHistory:
+    """
+    An immutable daily OHLCV series held as one NumPy array per column,
+    oldest first. Arrays decoded from storage are read-only views.
+    """
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        lengths = {len(columns[name]) for name, _ in HISTORY_COLUMNS}
+        if len(lengths) != 1:
+            raise ValueError("All history columns must have the same length.")
+        self.columns = columns
+
+    @classmethod
+    def empty(cls) -> "PriceHistory":
+        return cls({name: np.empty(0, dtype=dtype) for name, dtype in HISTORY_COLUMNS})
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "PriceHistory":
+        """Builds a history from an OHLCV frame indexed by date."""
+        frame = frame.sort_index()
+        days = frame.index.tz_localize(None) if frame.index.tz is not None else frame.index
+        columns = {"date": days.values.astype("datetime64[D]").astype("<i8")}
+        for name, dtype in HISTORY_COLUMNS[1:]:
+            columns[name] = frame[name].to_numpy(dtype=dtype)
+        return cls(columns)
+
+    def __len__(self) -> int:
+        return len(self.columns["date"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def dates(self) -> np.ndarray:
+        """The dates as `datetime64[D]` (a view, not a copy)."""
+        return self.columns["date"].view("datetime64[D]")
+
+    def last_date(self) -> Optional[date]:
+        if not len(self):
+            return None
+        return self.dates[-1].astype(date)
+
+    def until(self, day: date) -> "PriceHistory":
+        """The rows on or before `day` (views, not copies)."""
+        stop = int(np.searchsorted(self.columns["date"], np.datetime64(day, "D").astype(np.int64), side="right"))
+        if stop == len(self):
+            return self
+        return PriceHistory({name: values[:stop] for name, values in self.columns.items()})
+
+    def tail(self, rows: int) -> "PriceHistory":
+        return PriceHistory({name: values[-rows:] if rows else values[:0] for name, values in self.columns.items()})
+
+    def append(self, frame: pd.DataFrame) -> "PriceHistory":
+        """Returns a new history extended by the rows of `frame` after the last stored date."""
+        addition = PriceHistory.from_frame(frame)
+        if len(self):
+            newer = addition.columns["date"] > self.columns["date"][-1]
+            addition = PriceHistory({name: values[newer] for name, values in addition.columns.items()})
+        if not len(addition):
+            return self
+        return PriceHistory({
+            name: np.concatenate([self.columns[name], addition.columns[name]])
+            for name, _ in HISTORY_COLUMNS
+        })
+
+    def to_frame(self) -> pd.DataFrame:
+        """The history as an OHLCV frame indexed by UTC date, as returned by the provider client."""
+        frame = pd.DataFrame({name: self.columns[name] for name, _ in HISTORY_COLUMNS[1:]})
+        frame.index = pd.DatetimeIndex(self.dates.astype("datetime64[ns]")).tz_localize("UTC")
+        return frame
+
+    def encode_chunks(self, first_chunk: int = 0) -> List[Tuple[int, dict]]:
+        """Returns (chunk index, document) pairs for chunk `first_chunk` onwards."""
+        chunks = []
+        for index in range(first_chunk, chunk_count(len(self))):
+            start = index * HISTORY_CHUNK_ROWS
+            stop = min(start + HISTORY_CHUNK_ROWS, len(self))
+            document = {"rows": stop - start}
+            for name, dtype in HISTORY_COLUMNS:
+                document[name] = np.ascontiguousarray(self.columns[name][start:stop], dtype=dtype).tobytes()
+            chunks.append((index, document))
+        return chunks
+
+    @classmethod
+    def decode_chunks(cls, documents: Iterable[dict]) -> "PriceHistory":
+        """Rebuilds a history from its chunk documents, in chunk order."""
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name, _ in HISTORY_COLUMNS}
+        for document in documents:
+            for name, dtype in HISTORY_COLUMNS:
+                parts[name].append(np.frombuffer(document[name], dtype=dtype))
+        if not parts["date"]:
+            return cls.empty()
+        # A single chunk stays a zero-copy view of the document bytes.
+        return cls({name: arrays[0] if len(arrays) == 1 else np.concatenate(arrays) for name, arrays in parts.items()})
+
+def chunk_count(rows: int) -> int:
+    return -(-rows // HISTORY_CHUNK_ROWS)
+
+def chunk_id(index: int) -> str:
+    # Zero-padded so document IDs sort in chunk order.
+    return f"{index:05d}"
+
+class PriceHistoryStore:
+    """
+    Reads and stages writes of the columnar price history.
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+    """
+    def __init__(self, db_client):
+        self.db = db_client
+        self.market_data_collection = self.db.collection("marketData")
+
+    def _chunk_ref(self, ticker: str, index: int):
+        return self.market_data_collection.document(ticker).collection("history").document(chunk_id(index))
+
+    async def load(self, ticker: str) -> PriceHistory:
+        return (await self.load_many([ticker]))[ticker]
+
+    async def load_many(self, tickers: List[str]) -> Dict[str, PriceHistory]:
+        """
+        Loads the history of several tickers in two batched reads: the parent
+        documents for the chunk counts, then every chunk at once. Tickers
+        without a stored history get an empty one.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+        refs = [self.market_data_collection.document(ticker) for ticker in tickers]
+        chunk_counts: Dict[str, int] = {}
+        async for doc in self.db.get_all(refs, field_paths=["historyChunks"]):
+            if doc.exists:
+                chunk_counts[doc.id] = (doc.to_dict() or {}).get("historyChunks", 0)
+
+        chunk_refs = [self._chunk_ref(ticker, index) for ticker, count in chunk_counts.items() for index in range(count)]
+        # Paths are 'marketData/{ticker}/history/{chunk}'.
+        owners = {ref.path: ref.path.split("/")[1] for ref in chunk_refs}
+        chunks: Dict[str, Dict[int, dict]] = {ticker: {} for ticker in tickers}
+        if chunk_refs:
+            # get_all does not preserve order; chunks are re-sorted by index below.
+            async for doc in self.db.get_all(chunk_refs):
+                if doc.exists:
+                    chunks[owners[doc.reference.path]][int(doc.id)] = doc.to_dict()
+        return {
+            ticker: PriceHistory.decode_chunks(chunks[ticker][index] for index in sorted(chunks[ticker]))
+            for ticker in tickers
+        }
+
+    def stage_write(self, uow, ticker: str, history: PriceHistory, previous_rows: int = 0) -> Dict[str, int]:
+        """
+        Stages the chunks changed since the history had `previous_rows` rows.
+
+        Returns:
+            The fields to merge into the parent document in the same commit.
+        """
+        for index, document in history.encode_chunks(first_chunk=previous_rows // HISTORY_CHUNK_ROWS):
+            uow.set(self._chunk_ref(ticker, index), document)
+        return {"historyRows": len(history), "historyChunks": chunk_count(len(history))}
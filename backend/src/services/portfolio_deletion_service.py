@@ -0,0 +1,234 @@
+"""
+Cascading deletion of a portfolio and everything that belongs to it.
+
+Deleting a portfolio happens in two phases:
+1. A transaction deletes the portfolio document, reassigns the user's
+   default portfolio if needed, and opens a progress record in
+   'portfolioDeletions'. From the user's point of view the portfolio is gone.
+2. The dependents (holdings, their dailySnapshots and chartSeries, rulesets
+   attached to the portfolio or its holdings, and the portfolio's own
+   dailySnapshots and chartSeries) are enumerated with paged queries and
+   deleted with a BulkWriter, page by page. Each page only removes a
+   holding after its snapshots, chart series and rulesets, so the
+   phase can be stopped at any point and resumed by running it again.
+
+Reference: product_spec.md#3.3.4.1-P_4000-Portfolio-Deletion-(Entire-Portfolio)
+"""
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from google.cloud import firestore
+from pydantic import UUID4
+
+from ..core.internal_models import DeletionJobStatus, PortfolioDeletionJobDB
+from ..core.query_catalog import DOCUMENT_ID_FIELD, HOLDINGS_BY_PORTFOLIO, PORTFOLIOS_BY_USER, RULESETS_BY_PARENTS
+
+# Documents fetched (and deleted) per page of a dependent query.
+DELETION_PAGE_SIZE = 300
+# Firestore limits the number of values in an 'in' filter.
+IN_FILTER_MAX_VALUES = 30
+# A write the BulkWriter cannot apply after this many attempts is counted as failed.
+MAX_DELETE_ATTEMPTS = 5
+
+class PortfolioDeletionService:
+    """
+    Deletes a portfolio and its dependents and records progress.
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+    """
+    def __init__(self, db_client):
+        self.db = db_client
+        self.portfolios_collection = self.db.collection("portfolios")
+        self.holdings_collection = self.db.collection("holdings")
+        self.rulesets_collection = self.db.collection("rulesets")
+        self.users_collection = self.db.collection("users")
+        self.jobs_collection = self.db.collection("portfolioDeletions")
+
+    async def delete_portfolio_document(self, user_id: str, portfolio_id: UUID4) -> bool:
+        """
+        Phase 1: deletes the portfolio, reassigns the default portfolio and
+        opens the progress record, all in one transaction.
+
+        Returns:
+            False if the portfolio no longer exists, True otherwise.
+        """
+        portfolio_ref = self.portfolios_collection.document(str(portfolio_id))
+        user_ref = self.users_collection.document(user_id)
+        job_ref = self.jobs_collection.document(str(portfolio_id))
+        transaction = self.db.transaction()
+
+        @firestore.async_transactional
+        async def _delete(transaction) -> bool:
+            portfolio_doc = await portfolio_ref.get(transaction=transaction)
+            if not portfolio_doc.exists:
+                return False
+
+            user_doc = await user_ref.get(transaction=transaction)
+            reassign_default = user_doc.exists and user_doc.to_dict().get("defaultPortfolioId") == str(portfolio_id)
+            new_default_id = None
+            if reassign_default:
+                # The portfolio being deleted is the default one. We need to reassign.
+                # P_I_4003: Auto-set new default if other portfolios exist.
+                # We'll just pick the first one. The frontend can offer a choice later if desired.
+                others = PORTFOLIOS_BY_USER.build(self.portfolios_collection, userId=user_id).select([]).limit(2)
+                async for doc in others.stream(transaction=transaction):
+                    if doc.id != str(portfolio_id):
+                        new_default_id = doc.id
+                        break
+
+            now = datetime.now(timezone.utc)
+            if reassign_default:
+                transaction.update(user_ref, {"defaultPortfolioId": new_default_id, "modifiedAt": now})
+            transaction.delete(portfolio_ref)
+            transaction.set(job_ref, {
+                "portfolioId": str(portfolio_id),
+                "userId": user_id,
+                "status": DeletionJobStatus.RUNNING.value,
+                "deletedCounts": {},
+                "failedCount": 0,
+                "startedAt": now,
+                "modifiedAt": now,
+            })
+            return True
+
+        return await _delete(transaction)
+
+    async def delete_dependents(self, portfolio_id: UUID4, max_deletes: Optional[int] = None) -> PortfolioDeletionJobDB:
+        """
+        Phase 2: deletes the portfolio's dependents page by page.
+
+        Args:
+            max_deletes: Stop after roughly this many documents (checked per
+                page) and leave the job RUNNING. None deletes everything.
+
+        Returns:
+            The updated progress record.
+        """
+        deleted: Dict[str, int] = {}
+        failed = 0
+        budget_left = max_deletes if max_deletes is not None else float("inf")
+        writer = await asyncio.to_thread(self.db.bulk_writer)
+        try:
+            portfolio_ref = self.portfolios_collection.document(str(portfolio_id))
+            for name, pages in (
+                ("holdings", self._holding_pages(portfolio_id)),
+                ("ruleSets", self._ruleset_pages([str(portfolio_id)])),
+                ("portfolioSnapshots", self._tagged("portfolioSnapshots", self._ref_pages(portfolio_ref.collection("dailySnapshots")))),
+                ("portfolioChartSeries", self._tagged("portfolioChartSeries", self._ref_pages(portfolio_ref.collection("chartSeries")))),
+            ):
+                async for page in pages:
+                    if budget_left <= 0:
+                        break
+                    page_counts, page_failed = await self._delete_page(writer, page)
+                    for kind, count in page_counts.items():
+                        deleted[kind] = deleted.get(kind, 0) + count
+                    failed += page_failed
+                    budget_left -= sum(page_counts.values()) + page_failed
+                    await self._record_progress(portfolio_id, page_counts, page_failed)
+                    print(f"DIAGNOSTIC: Deleting portfolio {portfolio_id} ({name}): {deleted}, failed={failed}")
+        finally:
+            await asyncio.to_thread(writer.close)
+
+        if budget_left > 0:
+            status = DeletionJobStatus.FAILED if failed else DeletionJobStatus.COMPLETED
+            await self.jobs_collection.document(str(portfolio_id)).update({
+                "status": status.value,
+                "modifiedAt": datetime.now(timezone.utc),
+            })
+        return await self.get_progress(portfolio_id)
+
+    async def get_progress(self, portfolio_id: UUID4) -> Optional[PortfolioDeletionJobDB]:
+        """Returns the progress record of a portfolio deletion, if one exists."""
+        job_doc = await self.jobs_collection.document(str(portfolio_id)).get()
+        if job_doc.exists:
+            return PortfolioDeletionJobDB(**job_doc.to_dict())
+        return None
+
+    async def _record_progress(self, portfolio_id: UUID4, page_counts: Dict[str, int], page_failed: int):
+        update = {f"deletedCounts.{kind}": firestore.Increment(count) for kind, count in page_counts.items() if count}
+        if page_failed:
+            update["failedCount"] = firestore.Increment(page_failed)
+        update["modifiedAt"] = datetime.now(timezone.utc)
+        await self.jobs_collection.document(str(portfolio_id)).update(update)
+
+    async def _ref_pages(self, query):
+        """Yields pages of document references matching `query`, without their data."""
+        query = query.select([]).order_by(DOCUMENT_ID_FIELD).limit(DELETION_PAGE_SIZE)
+        last_doc = None
+        while True:
+            page_query = query.start_after(last_doc) if last_doc is not None else query
+            docs = [doc async for doc in page_query.stream()]
+            if not docs:
+                return
+            yield [doc.reference for doc in docs]
+            if len(docs) < DELETION_PAGE_SIZE:
+                return
+            last_doc = docs[-1]
+
+    async def _ruleset_pages(self, parent_ids: List[str]):
+        for start in range(0, len(parent_ids), IN_FILTER_MAX_VALUES):
+            chunk = parent_ids[start:start + IN_FILTER_MAX_VALUES]
+            query = RULESETS_BY_PARENTS.build(self.rulesets_collection, parentId=chunk)
+            async for page in self._tagged("ruleSets", self._ref_pages(query)):
+                yield page
+
+    async def _holding_pages(self, portfolio_id: UUID4):
+        """
+        Yields, per page of holdings, the holdings' snapshots, chart series and
+        rulesets followed by the holdings themselves.
+        """
+        holdings_query = HOLDINGS_BY_PORTFOLIO.build(self.holdings_collection, portfolioId=str(portfolio_id))
+        async for holding_refs in self._ref_pages(holdings_query):
+            # Enumerate the subcollections of the whole page concurrently.
+            snapshot_pages = await asyncio.gather(*[
+                self._collect(self._tagged(kind, self._ref_pages(ref.collection(subcollection))))
+                for ref in holding_refs
+                for kind, subcollection in (("holdingSnapshots", "dailySnapshots"), ("holdingChartSeries", "chartSeries"))
+            ])
+            dependents = [item for items in snapshot_pages for item in items]
+            dependents += await self._collect(self._ruleset_pages([ref.id for ref in holding_refs]))
+            for start in range(0, len(dependents), DELETION_PAGE_SIZE):
+                yield dependents[start:start + DELETION_PAGE_SIZE]
+            yield [("holdings", ref) for ref in holding_refs]
+
+    @staticmethod
+    async def _tagged(kind: str, pages):
+        async for page in pages:
+            yield [(kind, ref) for ref in page]
+
+    @staticmethod
+    async def _collect(pages) -> List[Tuple[str, object]]:
+        return [item async for page in pages for item in page]
+
+    async def _delete_page(self, writer, page: List[Tuple[str, object]]) -> Tuple[Dict[str, int], int]:
+        """Deletes one page of (kind, reference) pairs and returns per-kind counts and the failure count."""
+        kinds = {ref.path: kind for kind, ref in page}
+        counts: Dict[str, int] = {}
+        failures: List[str] = []
+        # The BulkWriter invokes callbacks from its own worker threads.
+        lock = threading.Lock()
+
+        def on_result(reference, result, bulk_writer):
+            kind = kinds.get(reference.path)
+            if kind is not None:
+                with lock:
+                    counts[kind] = counts.get(kind, 0) + 1
+
+        def on_error(failure, bulk_writer) -> bool:
+            if failure.attempts < MAX_DELETE_ATTEMPTS:
+                return True
+            with lock:
+                failures.append(failure.operation.reference.path)
+            print(f"DIAGNOSTIC: Failed to delete {failure.operation.reference.path}: {failure.message}")
+            return False
+
+        def _run():
+            writer.on_write_result(on_result)
+            writer.on_write_error(on_error)
+            for _, ref in page:
+                writer.delete(ref)
+            writer.flush()
+
+        await asyncio.to_thread(_run)
+        return counts, len(failures)
@@ -1,24 +1,43 @@
-from datetime import datetime, timezone
-from typing import List, Optional, TYPE_CHECKING
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple, TYPE_CHECKING
 from uuid import uuid4
 
+from google.cloud import firestore
 from pydantic import UUID4
-from google.cloud.firestore_v1.base_query import FieldFilter
 
-from ..core.internal_models import PortfolioDB
+from ..core.chart_series import ChartSeriesStore
+from ..core.internal_models import PortfolioDB, PortfolioDeletionJobDB, PortfolioSummaryDB, PortfolioValuationDB
 if TYPE_CHECKING:
     from .user_service import UserService
 from ..api.models import PortfolioCreationRequest, PortfolioSummary, Currency, CashReserve
-from ..core.utils import convert_uuids_to_str
+from ..core.query_catalog import (
+    DOCUMENT_ID_FIELD,
+    PORTFOLIOS_BY_USER,
+    PORTFOLIOS_BY_USER_AND_NAME,
+    PORTFOLIOS_BY_USER_ORDERED_BY_NAME,
+)
+from ..core.unit_of_work import UnitOfWork, unit_of_work
+from ..core.utils import apply_field_updates, convert_uuids_to_str, decode_page_token, encode_page_token
+from ..core.valuation import Valuation
+from .portfolio_deletion_service import PortfolioDeletionService
+
+# Fields read for the portfolio list (see PortfolioSummaryDB).
+PORTFOLIO_SUMMARY_FIELDS = ["portfolioId", "name", "cashReserve.totalAmount", "valuation", "modifiedAt"]
 
 class PortfolioService:
+    """
+    Data access and business logic for portfolios.
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+    """
     def __init__(self, db_client):
         self.db = db_client
         self.portfolios_collection = self.db.collection("portfolios")
 
-    def create_portfolio(self, user_id: str, portfolio_data: dict) -> PortfolioDB:
+    async def create_portfolio(self, user_id: str, portfolio_data: dict, uow: Optional[UnitOfWork] = None) -> PortfolioDB:
         """
         Creates a new portfolio in Firestore.
+        When `uow` is given, the write joins that unit of work and is only
+        persisted when it commits.
         Reference: product_spec.md#331-p_1000-portfolio-creation
         """
         now = datetime.now(timezone.utc)
@@ -31,81 +50,162 @@ class PortfolioService:
         portfolio_data["modifiedAt"] = now
 
         firestore_safe_data = convert_uuids_to_str(portfolio_data)
-        self.portfolios_collection.document(str(new_portfolio_id)).set(firestore_safe_data)
+        async with unit_of_work(self.db, uow) as work:
+            work.set(self.portfolios_collection.document(str(new_portfolio_id)), firestore_safe_data)
         return PortfolioDB(**firestore_safe_data)
 
-    def get_portfolio_by_id(self, portfolio_id: UUID4) -> Optional[PortfolioDB]:
+    async def get_portfolio_by_id(self, portfolio_id: UUID4) -> Optional[PortfolioDB]:
         """
         Retrieves a single portfolio by its ID.
         Reference: product_spec.md#3321-p_2000-single-portfolio-retrieval
         """
-        portfolio_doc = self.portfolios_collection.document(str(portfolio_id)).get()
+        portfolio_doc = await self.portfolios_collection.document(str(portfolio_id)).get()
         if portfolio_doc.exists:
             return PortfolioDB(**portfolio_doc.to_dict())
         return None
 
-    def get_portfolio_by_name(self, user_id: str, name: str) -> Optional[PortfolioDB]:
+    async def get_portfolio_by_name(self, user_id: str, name: str) -> Optional[PortfolioDB]:
         """
         Retrieves a portfolio by its name for a specific user.
         Reference: product_spec.md#3.3.1-P_E_1103
         """
-        query = self.portfolios_collection.where(
-            filter=FieldFilter("userId", "==", user_id)
-        ).where(
-            filter=FieldFilter("name", "==", name)
-        ).limit(1)
-        docs = query.stream()
-        for doc in docs:
+        query = PORTFOLIOS_BY_USER_AND_NAME.build(self.portfolios_collection, userId=user_id, name=name).limit(1)
+        async for doc in query.stream():
             return PortfolioDB(**doc.to_dict())
         return None
 
-    def get_portfolios_by_user(self, user_id: str) -> List[PortfolioDB]:
+    async def get_portfolios_by_user(self, user_id: str) -> List[PortfolioDB]:
         """
         Retrieves all portfolios for a given user.
         Reference: product_spec.md#3322-p_2200-portfolio-list-retrieval
         """
-        query = self.portfolios_collection.where(filter=FieldFilter("userId", "==", user_id))
-        portfolio_docs = query.stream()
-        portfolios = [PortfolioDB(**doc.to_dict()) for doc in portfolio_docs]
+        query = PORTFOLIOS_BY_USER.build(self.portfolios_collection, userId=user_id)
+        portfolios = [PortfolioDB(**doc.to_dict()) async for doc in query.stream()]
         return portfolios
 
-    def update_portfolio(self, portfolio_id: UUID4, update_data: dict) -> Optional[PortfolioDB]:
+    async def list_portfolio_summaries(
+        self, user_id: str, page_size: int, page_token: Optional[str] = None
+    ) -> Tuple[List[PortfolioSummaryDB], Optional[str]]:
+        """
+        Retrieves one page of a user's portfolios, ordered by name, reading
+        only the fields the summary list needs.
+
+        Returns:
+            The page and the token of the next page, or None on the last page.
+
+        Raises:
+            ValueError: If `page_token` is invalid.
+        Reference: product_spec.md#3322-p_2200-portfolio-list-retrieval
+        """
+        query = PORTFOLIOS_BY_USER_ORDERED_BY_NAME.build(self.portfolios_collection, userId=user_id)
+        query = query.select(PORTFOLIO_SUMMARY_FIELDS)
+        if page_token:
+            cursor = decode_page_token(page_token)
+            if len(cursor) != 2 or not all(isinstance(value, str) for value in cursor):
+                raise ValueError("Invalid page token")
+            query = query.start_after({"name": cursor[0], DOCUMENT_ID_FIELD: cursor[1]})
+
+        # One extra document tells whether another page follows.
+        docs = [doc async for doc in query.limit(page_size + 1).stream()]
+        summaries = [
+            PortfolioSummaryDB(
+                portfolioId=doc.get("portfolioId"),
+                name=doc.get("name"),
+                cashReserveTotal=doc.get("cashReserve.totalAmount") or 0.0,
+                valuation=PortfolioValuationDB(**(doc.to_dict().get("valuation") or {})),
+                modifiedAt=doc.to_dict().get("modifiedAt"),
+            )
+            for doc in docs[:page_size]
+        ]
+        next_page_token = None
+        if len(docs) > page_size:
+            last_doc = docs[page_size - 1]
+            next_page_token = encode_page_token([last_doc.get("name"), last_doc.id])
+        return summaries, next_page_token
+
+    async def update_portfolio(
+        self,
+        portfolio_id: UUID4,
+        update_data: dict,
+        current_portfolio: Optional[PortfolioDB] = None,
+        uow: Optional[UnitOfWork] = None,
+    ) -> Optional[PortfolioDB]:
         """
         Updates a portfolio document in Firestore.
+
+        The returned document is the caller's `current_portfolio` with the
+        update merged in locally, so no read follows the write. Callers that
+        have not loaded the portfolio yet may omit it; it is then read first.
         Reference: product_spec.md#3.3.3.1-P_3000-Portfolio-Update-(Manual)
         """
-        portfolio_ref = self.portfolios_collection.document(str(portfolio_id))
+        if current_portfolio is None:
+            current_portfolio = await self.get_portfolio_by_id(portfolio_id)
+            if current_portfolio is None:
+                return None
 
         # Add modifiedAt timestamp
         update_data["modifiedAt"] = datetime.now(timezone.utc)
 
         firestore_safe_data = convert_uuids_to_str(update_data)
-        portfolio_ref.update(firestore_safe_data)
+        async with unit_of_work(self.db, uow) as work:
+            work.update(self.portfolios_collection.document(str(portfolio_id)), firestore_safe_data)
 
-        updated_doc = portfolio_ref.get()
-        if updated_doc.exists:
-            return PortfolioDB(**updated_doc.to_dict())
-        return None
+        current_data = convert_uuids_to_str(current_portfolio.model_dump())
+        return PortfolioDB(**apply_field_updates(current_data, firestore_safe_data))
 
-    def delete_portfolio(self, user_id: str, portfolio_id: UUID4, user_service: 'UserService'):
+    async def get_chart_points(self, portfolio_id: UUID4, chart_range: str) -> List[Tuple[date, Valuation]]:
         """
-        Deletes a portfolio document from Firestore and handles default portfolio reassignment.
+        Retrieves the downsampled performance of a portfolio over a range of
+        CHART_RANGES with one read of its precomputed chart series.
+        Reference: product_spec.md#3323-p_2400-portfolio-chart-data-retrieval
+        """
+        series = await ChartSeriesStore(self.db).load("portfolios", str(portfolio_id), chart_range)
+        return series.points(chart_range)
+
+    async def record_lot_change(
+        self, portfolio_id: UUID4, cost_delta: float, value_delta: float, uow: Optional[UnitOfWork] = None
+    ):
+        """
+        Adjusts the portfolio's stored valuation by the change of a lot write:
+        the change in cost (quantity x purchasePrice) and in value (quantity x
+        the ticker's latest close). Lot creations, updates and deletions pass
+        their write's `uow`, so the valuation changes in the same commit.
+        Increments never conflict, and the next daily run replaces the
+        valuation with one computed from all holdings (see SnapshotWriter).
+        Reference: product_spec.md#321-primary-stored-models
+        """
+        async with unit_of_work(self.db, uow) as work:
+            work.update(self.portfolios_collection.document(str(portfolio_id)), {
+                "valuation.costBasis": firestore.Increment(cost_delta),
+                "valuation.lastValuation": firestore.Increment(value_delta),
+            })
+
+    async def delete_portfolio(
+        self,
+        user_id: str,
+        portfolio_id: UUID4,
+        user_service: 'UserService',
+        max_inline_deletes: Optional[int] = None,
+    ) -> Optional[PortfolioDeletionJobDB]:
+        """
+        Deletes a portfolio, handles default portfolio reassignment, and
+        deletes its holdings, rulesets and snapshots.
+
+        With `max_inline_deletes`, at most about that many dependents are
+        deleted before returning; a job still RUNNING must then be finished
+        with `continue_portfolio_deletion`, typically as a background task.
         Reference: product_spec.md#3.3.4.1-P_4000-Portfolio-Deletion-(Entire-Portfolio)
         """
-        user = user_service.get_user_by_uid(user_id)
-        if user and user.defaultPortfolioId == portfolio_id:
-            # The portfolio being deleted is the default one. We need to reassign.
-            other_portfolios = [p for p in self.get_portfolios_by_user(user_id) if p.portfolioId != portfolio_id]
-            
-            new_default_id = None
-            if other_portfolios:
-                # P_I_4003: Auto-set new default if other portfolios exist.
-                # We'll just pick the first one. The frontend can offer a choice later if desired.
-                new_default_id = other_portfolios[0].portfolioId
-            
-            # Update the user's defaultPortfolioId
-            user_service.update_user_settings(user_id, {"defaultPortfolioId": new_default_id})
-
-        # For now, this just deletes the portfolio document.
-        # In the future, it will also need to delete associated holdings, rules, etc. in a transaction.
-        self.portfolios_collection.document(str(portfolio_id)).delete()
\ No newline at end of file
+        deletion_service = PortfolioDeletionService(self.db)
+        if not await deletion_service.delete_portfolio_document(user_id, portfolio_id):
+            return None
+        user_service.invalidate_user(user_id)
+        return await deletion_service.delete_dependents(portfolio_id, max_deletes=max_inline_deletes)
+
+    async def continue_portfolio_deletion(self, portfolio_id: UUID4) -> Optional[PortfolioDeletionJobDB]:
+        """Deletes all remaining dependents of a portfolio deleted earlier."""
+        return await PortfolioDeletionService(self.db).delete_dependents(portfolio_id)
+
+    async def get_deletion_progress(self, portfolio_id: UUID4) -> Optional[PortfolioDeletionJobDB]:
+        """Returns the progress of a portfolio deletion, if one was started."""
+        return await PortfolioDeletionService(self.db).get_progress(portfolio_id)
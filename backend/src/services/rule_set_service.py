@@ -0,0 +1,130 @@
+"""
+R_2000: resolves the effective rule set of holdings in bulk.
+
+The spec resolves a holding's effective rule set with up to three sequential
+reads: the holding, then its portfolio if the holding has no rule set of its
+own, then the rule set. The resolver reads instead all rule sets with one
+query and the rule set ID of all portfolios with one projected scan, after
+which the effective rule set of any number of holdings is resolved in memory.
+
+The daily monitoring job loads it for all users; the effective-rules endpoint
+loads it per user and keeps it in a short-lived cache.
+Reference: product_spec.md#632-r_2000-effective-rule-set-retrieval
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from pydantic import UUID4
+
+from ..api.models import RuleSetSource
+from ..core.cache import TTLCache
+from ..core.internal_models import HoldingDB, RuleSetDB
+from ..core.query_catalog import PORTFOLIOS_BY_USER, RULESETS_BY_USER
+
+# Short-lived, per-process cache of a user's resolver. The TTL bounds how long
+# a rule set change can stay invisible to the effective-rules endpoint.
+EFFECTIVE_RULES_CACHE_MAX_SIZE = 4096
+EFFECTIVE_RULES_CACHE_TTL_SECONDS = 30
+
+_effective_rules_cache = TTLCache(maxsize=EFFECTIVE_RULES_CACHE_MAX_SIZE, ttl_seconds=EFFECTIVE_RULES_CACHE_TTL_SECONDS)
+
+def invalidate_effective_rules(user_id: str):
+    _effective_rules_cache.invalidate(user_id)
+
+def clear_effective_rules_cache():
+    _effective_rules_cache.clear()
+
+@dataclass
+class EffectiveRuleSets:
+    """The rule sets and the portfolio → rule set map needed to resolve holdings without reads."""
+    # portfolioId -> ruleSetId (None if the portfolio has no rule set).
+    portfolio_rule_sets: Dict[str, Optional[str]] = field(default_factory=dict)
+    rule_sets: Dict[str, RuleSetDB] = field(default_factory=dict)
+    # Rule set IDs that holdings refer to but a reload did not find (deleted,
+    # or another user's), so they do not trigger another reload.
+    unknown_rule_set_ids: Set[str] = field(default_factory=set)
+
+    def resolve(self, holding: HoldingDB) -> Tuple[Optional[RuleSetDB], Optional[RuleSetSource]]:
+        """
+        The holding's own rule set if it has one, otherwise its portfolio's,
+        with where it came from; (None, None) if neither applies.
+        """
+        if holding.ruleSetId is not None:
+            rule_set = self.rule_sets.get(str(holding.ruleSetId))
+            return rule_set, RuleSetSource.SPECIFIC if rule_set else None
+        rule_set_id = self.portfolio_rule_sets.get(str(holding.portfolioId))
+        rule_set = self.rule_sets.get(rule_set_id) if rule_set_id else None
+        return rule_set, RuleSetSource.INHERITED if rule_set else None
+
+    def effective_rule_set(self, holding: HoldingDB) -> Optional[RuleSetDB]:
+        return self.resolve(holding)[0]
+
+    def resolve_all(self, holdings: Iterable[HoldingDB]) -> Dict[str, RuleSetDB]:
+        """holdingId -> effective rule set, for the holdings that have one."""
+        resolved = {}
+        for holding in holdings:
+            rule_set = self.effective_rule_set(holding)
+            if rule_set is not None:
+                resolved[str(holding.holdingId)] = rule_set
+        return resolved
+
+class RuleSetService:
+    """
+    Data access for rule sets.
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+    """
+    def __init__(self, db_client):
+        self.db = db_client
+        self.rulesets_collection = self.db.collection("rulesets")
+        self.portfolios_collection = self.db.collection("portfolios")
+
+    async def load_effective_rule_sets(self, user_id: Optional[str] = None) -> EffectiveRuleSets:
+        """
+        Reads the rule sets and the portfolios' rule set IDs of one user, or of
+        all users if `user_id` is None, as two concurrent queries.
+        """
+        rule_sets_query = RULESETS_BY_USER.build(self.rulesets_collection, userId=user_id) if user_id else self.rulesets_collection
+        portfolios_query = PORTFOLIOS_BY_USER.build(self.portfolios_collection, userId=user_id) if user_id else self.portfolios_collection
+        resolver = EffectiveRuleSets()
+
+        async def read_rule_sets():
+            async for doc in rule_sets_query.stream():
+                try:
+                    resolver.rule_sets[doc.id] = RuleSetDB(**doc.to_dict())
+                except Exception as e:
+                    print(f"DIAGNOSTIC: Skipping rule set {doc.id} with invalid data: {e}")
+
+        async def read_portfolios():
+            async for doc in portfolios_query.select(["ruleSetId"]).stream():
+                resolver.portfolio_rule_sets[doc.id] = (doc.to_dict() or {}).get("ruleSetId")
+
+        await asyncio.gather(read_rule_sets(), read_portfolios())
+        return resolver
+
+    async def get_effective_rule_sets(self, user_id: str) -> EffectiveRuleSets:
+        """The user's resolver, from the process cache if it was loaded recently."""
+        resolver = _effective_rules_cache.get(user_id)
+        if resolver is None:
+            resolver = await self.load_effective_rule_sets(user_id)
+            _effective_rules_cache.set(user_id, resolver)
+        return resolver
+
+    async def get_holding(self, holding_id: UUID4) -> Optional[HoldingDB]:
+        doc = await self.db.collection("holdings").document(str(holding_id)).get()
+        return HoldingDB(**doc.to_dict()) if doc.exists else None
+
+    async def get_effective_rule_set(self, user_id: str, holding: HoldingDB) -> Tuple[Optional[RuleSetDB], Optional[RuleSetSource]]:
+        """
+        Resolves one holding of the user. A holding that refers to a rule set the
+        cached resolver does not know yet (created since it was loaded) reloads it,
+        at most once per loaded resolver.
+        """
+        resolver = await self.get_effective_rule_sets(user_id)
+        rule_set_id = str(holding.ruleSetId) if holding.ruleSetId is not None else None
+        if rule_set_id is not None and rule_set_id not in resolver.rule_sets and rule_set_id not in resolver.unknown_rule_set_ids:
+            invalidate_effective_rules(user_id)
+            resolver = await self.get_effective_rule_sets(user_id)
+            if rule_set_id not in resolver.rule_sets:
+                resolver.unknown_rule_set_ids.add(rule_set_id)
+        return resolver.resolve(holding)
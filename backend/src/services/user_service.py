@@ -1,21 +1,51 @@
+import asyncio
 from firebase_admin import auth
+from starlette.concurrency import run_in_threadpool
 from firebase_admin.exceptions import FirebaseError
 from ..core.internal_models import UserDB, NotificationChannel
 from ..api.models import PortfolioCreationRequest, Currency, CashReserve
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import Optional, List, Dict
 from uuid import UUID
 from .portfolio_service import PortfolioService
 
-from ..core.utils import convert_uuids_to_str
+from ..core.cache import TTLCache
+from ..core.unit_of_work import UnitOfWork, unit_of_work
+from ..core.utils import apply_field_updates, convert_uuids_to_str
 from ..core.model_mappers import portfolio_creation_request_to_dict
 
+# Short-lived, per-process cache of user documents. The TTL bounds how long
+# another instance's write can stay invisible here; writes made through this
+# service invalidate the entry immediately.
+USER_CACHE_MAX_SIZE = 4096
+USER_CACHE_TTL_SECONDS = 15
+
+_user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl_seconds=USER_CACHE_TTL_SECONDS)
+
+def invalidate_cached_user(uid: str):
+    _user_cache.invalidate(uid)
+
+def clear_user_cache():
+    _user_cache.clear()
+
 class UserService:
+    """
+    Data access and business logic for user documents.
+    All methods are coroutines and expect a `firestore.AsyncClient`.
+    """
     def __init__(self, db_client, portfolio_service_instance: PortfolioService):
         self.db = db_client
         self.portfolio_service = portfolio_service_instance
+        # Per-request memo. FastAPI creates one UserService per request, so all
+        # dependencies and handlers of a request see the same user document.
+        self._request_cache: Dict[str, Optional[UserDB]] = {}
 
-    def create_user_document(self, uid: str, email: str, username: str, default_portfolio_id: UUID) -> UserDB:
+    def invalidate_user(self, uid: str):
+        """Drops the user from the request memo and the process cache."""
+        self._request_cache.pop(uid, None)
+        invalidate_cached_user(uid)
+
+    async def create_user_document(self, uid: str, email: str, username: str, default_portfolio_id: UUID, uow: Optional[UnitOfWork] = None) -> UserDB:
         user_data = {
             "uid": uid,
             "email": email,
@@ -26,30 +56,55 @@ class UserService:
             "createdAt": datetime.now(timezone.utc),
             "modifiedAt": datetime.now(timezone.utc),
         }
-        self.db.collection("users").document(uid).set(user_data)
+        async with unit_of_work(self.db, uow) as work:
+            work.set(self.db.collection("users").document(uid), user_data)
+            work.after_commit(lambda: self.invalidate_user(uid))
         return UserDB(**user_data)
 
-    def get_user_by_uid(self, uid: str) -> Optional[UserDB]:
-        user_doc = self.db.collection("users").document(uid).get()
-        if user_doc.exists:
-            return UserDB(**user_doc.to_dict())
-        return None
+    async def get_user_by_uid(self, uid: str) -> Optional[UserDB]:
+        """
+        Retrieves a user document, served from the per-request memo or the
+        per-process cache when possible.
+        """
+        if uid in self._request_cache:
+            return self._request_cache[uid]
+
+        user = _user_cache.get(uid)
+        if user is None:
+            user_doc = await self.db.collection("users").document(uid).get()
+            if user_doc.exists:
+                user = UserDB(**user_doc.to_dict())
+                _user_cache.set(uid, user)
+
+        self._request_cache[uid] = user
+        return user
 
-    def update_user_default_portfolio(self, uid: str, default_portfolio_id: UUID):
+    async def update_user_default_portfolio(self, uid: str, default_portfolio_id: UUID, uow: Optional[UnitOfWork] = None):
         user_doc_ref = self.db.collection("users").document(uid)
-        user_doc_ref.update({
-            "defaultPortfolioId": str(default_portfolio_id),
-            "modifiedAt": datetime.now(timezone.utc)
-        })
+        async with unit_of_work(self.db, uow) as work:
+            work.update(user_doc_ref, {
+                "defaultPortfolioId": str(default_portfolio_id),
+                "modifiedAt": datetime.now(timezone.utc)
+            })
+            work.after_commit(lambda: self.invalidate_user(uid))
 
-    def update_user_settings(self, uid: str, update_data: dict) -> UserDB:
+    async def update_user_settings(self, uid: str, update_data: dict, uow: Optional[UnitOfWork] = None) -> UserDB:
+        """
+        Validates and applies a settings update. The returned user is the
+        document as read before the update with the update merged in locally,
+        not a re-read. The document is read directly rather than through the
+        user cache, which may hold a copy another instance has since changed.
+        """
         user_doc_ref = self.db.collection("users").document(uid)
 
-        # Validate defaultPortfolioId if present in update_data
+        # Validate defaultPortfolioId if present in update_data; the portfolio
+        # and the user document are read concurrently.
+        reads = [user_doc_ref.get()]
         if "defaultPortfolioId" in update_data and update_data["defaultPortfolioId"] is not None:
             portfolio_id = update_data["defaultPortfolioId"]
-            portfolio_doc_ref = self.db.collection("portfolios").document(str(portfolio_id))
-            portfolio_doc = portfolio_doc_ref.get()
+            reads.append(self.db.collection("portfolios").document(str(portfolio_id)).get())
+        user_doc, *portfolio_docs = await asyncio.gather(*reads)
+        for portfolio_doc in portfolio_docs:
             if not portfolio_doc.exists or portfolio_doc.to_dict().get("userId") != uid:
                 raise ValueError("US_E_3102: Invalid default portfolio specified.")
 
@@ -70,18 +125,24 @@ class UserService:
         
         # Convert any UUIDs in the update_data to strings before saving
         firestore_safe_data = convert_uuids_to_str(update_data)
-        
-        user_doc_ref.update(firestore_safe_data)
-        
-        updated_user_doc = user_doc_ref.get()
-        return UserDB(**updated_user_doc.to_dict())
+
+        async with unit_of_work(self.db, uow) as work:
+            work.update(user_doc_ref, firestore_safe_data)
+            work.after_commit(lambda: self.invalidate_user(uid))
+
+        if not user_doc.exists:
+            # Only reachable if the document appeared after it was read.
+            updated_user_doc = await user_doc_ref.get()
+            return UserDB(**updated_user_doc.to_dict())
+        return UserDB(**apply_field_updates(user_doc.to_dict(), firestore_safe_data))
 
 # Reference: product_spec.md#831-u_1000-user-provisioning-backend-script
 # Reference: product_spec.md#931-us_1000-user-settings-creation
-def create_firebase_user_and_user_document(email: str, password: str, username: str, db_client, portfolio_service_instance: PortfolioService):
+async def create_firebase_user_and_user_document(email: str, password: str, username: str, db_client, portfolio_service_instance: PortfolioService):
     try:
         # Create user in Firebase Authentication
-        firebase_user = auth.create_user(email=email, password=password, display_name=username)
+        # The Admin SDK's auth calls are blocking, so they run in the threadpool.
+        firebase_user = await run_in_threadpool(auth.create_user, email=email, password=password, display_name=username)
         uid = firebase_user.uid
 
         # Create a default portfolio for the user
@@ -94,12 +155,13 @@ def create_firebase_user_and_user_document(email: str, password: str, username:
         )
         
         portfolio_dict = portfolio_creation_request_to_dict(default_portfolio_data)
-        new_portfolio = portfolio_service_instance.create_portfolio(user_id=uid, portfolio_data=portfolio_dict)
-        default_portfolio_id = new_portfolio.portfolioId
-
-        # Create user document in Firestore
         user_service_instance = UserService(db_client, portfolio_service_instance)
-        user_service_instance.create_user_document(uid, email, username, default_portfolio_id)
+
+        # The portfolio and the user document are committed in one batch.
+        async with unit_of_work(db_client) as work:
+            new_portfolio = await portfolio_service_instance.create_portfolio(user_id=uid, portfolio_data=portfolio_dict, uow=work)
+            default_portfolio_id = new_portfolio.portfolioId
+            await user_service_instance.create_user_document(uid, email, username, default_portfolio_id, uow=work)
         
         print(f"Successfully created new user: {uid} and default portfolio: {default_portfolio_id}")
         return uid
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
 
@@ -28,6 +29,39 @@ class Settings(BaseSettings):
     """
     ENV: str = ENV
     ALPHA_VANTAGE_API_KEY: str
+    # Alpha Vantage quota. The free tier allows 5 requests per minute; raise
+    # this for a premium key so the daily sync over all tickers speeds up.
+    ALPHA_VANTAGE_REQUESTS_PER_MINUTE: int = 5
+    # Requests in flight at once across all tickers.
+    ALPHA_VANTAGE_MAX_CONCURRENCY: int = 4
+    # Retries of a request answered with a rate-limit note or a transient error.
+    ALPHA_VANTAGE_MAX_RETRIES: int = 4
+    ALPHA_VANTAGE_TIMEOUT_SECONDS: float = 30.0
+
+    # Largest response body the idempotency middleware stores for replay.
+    # Firestore documents are limited to 1 MiB, so keep well below that.
+    IDEMPOTENCY_MAX_CACHED_BODY_BYTES: int = 512 * 1024
+
+    # Dependents (holdings, rulesets, snapshots) deleted within a portfolio
+    # DELETE request. Larger cascades finish in a background task.
+    PORTFOLIO_DELETION_INLINE_BUDGET: int = 500
+
+    # Daily monitoring job. Tickers move through the pipeline in batches;
+    # each stage hands at most MONITORING_QUEUE_SIZE batches to the next one
+    # before it waits.
+    MONITORING_BATCH_SIZE: int = 25
+    MONITORING_QUEUE_SIZE: int = 2
+    # Snapshot writes per second of the BulkWriter: the rate it starts at
+    # and the ceiling it ramps up to. Each snapshot goes to its own
+    # dailySnapshots subcollection, so the writes do not contend for a hot
+    # document or index range and can start well above the 500/50/5 default.
+    MONITORING_SNAPSHOT_INITIAL_OPS_PER_SECOND: int = 1000
+    MONITORING_SNAPSHOT_MAX_OPS_PER_SECOND: int = 10000
+    # The Cloud Scheduler job calls the trigger endpoint with an OIDC token
+    # for this service account and audience. The endpoint refuses all calls
+    # while either is not set.
+    MONITORING_SCHEDULER_SERVICE_ACCOUNT: Optional[str] = None
+    MONITORING_TRIGGER_AUDIENCE: Optional[str] = None
 
     # This tells Pydantic which .env file to load
     # If env_file is None, it will only read from system environment variables.
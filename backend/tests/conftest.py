@@ -13,8 +13,10 @@ os.environ["FIREBASE_AUTH_EMULATOR_HOST"] = "localhost:9099"
 os.environ["GCLOUD_PROJECT"] = "sentinel-invest"
 
 # Now we can safely import from our application
-from src.firebase_setup import initialize_firebase_app, get_db_client
-from src.dependencies import get_db
+from src.firebase_setup import initialize_firebase_app, get_db_client, get_async_db_client
+from src.services.user_service import clear_user_cache
+from src.services.idempotency_service import clear_local_idempotency_cache
+from src.services.rule_set_service import clear_effective_rules_cache
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_environment():
@@ -27,27 +29,31 @@ def setup_test_environment():
 @pytest.fixture(scope="module")
 def db_client():
     """
-    Provides a Firestore client for the test module.
+    Provides a synchronous Firestore client for the test module.
+    Tests use it to seed and inspect the emulator directly.
     """
     return get_db_client()
 
+@pytest.fixture(scope="function")
+async def async_db_client():
+    """
+    Provides the async Firestore client used by the services.
+    Async clients are bound to an event loop, so this is function-scoped.
+    """
+    return get_async_db_client()
+
 @pytest.fixture(scope="module")
 def test_client(db_client) -> TestClient:
     """
-    Provides a TestClient for making API requests, with the database
-    dependency overridden to point to the emulator.
+    Provides a TestClient for making API requests. The emulator environment
+    variables set above point the app's async Firestore client at the emulator.
     """
     # Import the app here to prevent premature configuration.
     from src.main import app
 
-    app.dependency_overrides[get_db] = lambda: db_client
-
     with TestClient(app) as client:
         yield client
 
-    # Clear the override after the tests in this module are done.
-    app.dependency_overrides = {}
-
 @pytest.fixture(scope="function", autouse=True)
 def clear_firestore_emulator(db_client):
     """
@@ -59,4 +65,8 @@ def clear_firestore_emulator(db_client):
         requests.delete(f"http://{os.environ['FIRESTORE_EMULATOR_HOST']}/emulator/v1/projects/{os.environ['GCLOUD_PROJECT']}/databases/(default)/documents")
     except requests.exceptions.ConnectionError as e:
         pytest.fail(f"Could not connect to Firestore emulator. Is it running? Details: {e}")
+    # In-process caches must not outlive the data they were filled from.
+    clear_user_cache()
+    clear_local_idempotency_cache()
+    clear_effective_rules_cache()
     yield
@@ -0,0 +1,81 @@
+import pytest
+from datetime import date
+from fastapi.testclient import TestClient
+
+from src.monitoring.pipeline import MonitoringAbortedError, MonitoringRunResult
+from src.routers import monitoring_router
+from src.settings import settings
+
+SCHEDULER_ACCOUNT = "scheduler@sentinel-invest.iam.gserviceaccount.com"
+
+# --- Fixtures ---
+
+class FakePipeline:
+    """Stands in for MonitoringPipeline so no market data is requested."""
+    abort = False
+
+    def __init__(self, db_client):
+        pass
+
+    async def run(self, as_of=None, recompute=False) -> MonitoringRunResult:
+        if FakePipeline.abort:
+            raise MonitoringAbortedError("unavailable")
+        return MonitoringRunResult(day=as_of or date(2025, 6, 30), tickers=3, holdings=4, alerts=1)
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(settings, "MONITORING_SCHEDULER_SERVICE_ACCOUNT", SCHEDULER_ACCOUNT)
+    monkeypatch.setattr(settings, "MONITORING_TRIGGER_AUDIENCE", "https://sentinel.example.com/api/v1/internal/monitoring/runs")
+    monkeypatch.setattr(monitoring_router, "MonitoringPipeline", FakePipeline)
+    FakePipeline.abort = False
+
+# --- Tests ---
+
+def test_scheduler_triggers_a_run_without_an_idempotency_key(test_client: TestClient):
+    """
+    Tests that the scheduler's service account can trigger a run and that the
+    endpoint is exempt from the Idempotency-Key requirement.
+    """
+    # ACT
+    response = test_client.post(
+        "/api/v1/internal/monitoring/runs?date=2025-06-27",
+        headers={"Authorization": f"Bearer {SCHEDULER_ACCOUNT}"},
+    )
+
+    # ASSERT
+    assert response.status_code == 200
+    data = response.json()
+    assert data["day"] == "2025-06-27"
+    assert (data["tickers"], data["holdings"], data["alerts"]) == (3, 4, 1)
+    assert set(data["stages"]) == {"sync", "indicators", "snapshots", "evaluation"}
+
+def test_other_callers_are_forbidden(test_client: TestClient):
+    response = test_client.post("/api/v1/internal/monitoring/runs", headers={"Authorization": "Bearer some-user"})
+
+    assert response.status_code == 403
+
+def test_trigger_is_refused_while_no_service_account_is_configured(test_client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "MONITORING_SCHEDULER_SERVICE_ACCOUNT", None)
+
+    response = test_client.post("/api/v1/internal/monitoring/runs", headers={"Authorization": f"Bearer {SCHEDULER_ACCOUNT}"})
+
+    assert response.status_code == 403
+
+def test_trigger_is_refused_while_no_audience_is_configured(test_client: TestClient, monkeypatch):
+    """
+    Tests that a token of the right service account is refused while no
+    audience is set, since its audience could not be checked.
+    """
+    monkeypatch.setattr(settings, "MONITORING_TRIGGER_AUDIENCE", None)
+
+    response = test_client.post("/api/v1/internal/monitoring/runs", headers={"Authorization": f"Bearer {SCHEDULER_ACCOUNT}"})
+
+    assert response.status_code == 403
+
+def test_aborted_run_returns_503(test_client: TestClient):
+    FakePipeline.abort = True
+
+    response = test_client.post("/api/v1/internal/monitoring/runs", headers={"Authorization": f"Bearer {SCHEDULER_ACCOUNT}"})
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Error: Market data API is unavailable. Daily monitoring run aborted."
@@ -3,6 +3,10 @@ from fastapi.testclient import TestClient
 from firebase_admin import firestore
 from uuid import uuid4, UUID
 from datetime import datetime, timezone
+import numpy as np
+
+from src.core.chart_series import ChartSeries
+from src.settings import settings
 
 # --- Fixtures ---
 
@@ -123,6 +127,62 @@ def test_create_portfolio_idempotency(test_client: TestClient, auth_headers: dic
     portfolios = [p for p in list_response.json() if p['name'] == "Idempotent Portfolio"]
     assert len(portfolios) == 1
 
+def test_create_portfolio_idempotent_replay_is_byte_identical(test_client: TestClient, auth_headers: dict):
+    """
+    Tests that a replayed response carries the original bytes and headers.
+    """
+    # ARRANGE
+    headers = {**auth_headers, "Idempotency-Key": str(uuid4())}
+    payload = {"name": "Replay Portfolio", "defaultCurrency": "EUR", "cashReserve": {"totalAmount": 100, "warChestAmount": 10}}
+
+    # ACT
+    response1 = test_client.post("/api/v1/users/me/portfolios", headers=headers, json=payload)
+    response2 = test_client.post("/api/v1/users/me/portfolios", headers=headers, json=payload)
+
+    # ASSERT
+    assert response2.status_code == response1.status_code == 201
+    assert response2.content == response1.content
+    assert response2.headers["content-type"] == response1.headers["content-type"]
+    assert response2.headers["content-length"] == response1.headers["content-length"]
+
+def test_oversized_response_is_not_replayed(test_client: TestClient, auth_headers: dict, monkeypatch):
+    """
+    Tests that a retry of a request whose response was too large to store is
+    rejected with 409 rather than replayed without a body, and not run again.
+    """
+    # ARRANGE
+    monkeypatch.setattr(settings, "IDEMPOTENCY_MAX_CACHED_BODY_BYTES", 16)
+    headers = {**auth_headers, "Idempotency-Key": str(uuid4())}
+    payload = {"name": "Oversized Portfolio", "defaultCurrency": "EUR", "cashReserve": {"totalAmount": 100, "warChestAmount": 10}}
+
+    # ACT
+    response1 = test_client.post("/api/v1/users/me/portfolios", headers=headers, json=payload)
+    response2 = test_client.post("/api/v1/users/me/portfolios", headers=headers, json=payload)
+
+    # ASSERT
+    assert response1.status_code == 201
+    assert response1.json()["name"] == "Oversized Portfolio"
+    assert response2.status_code == 409
+    assert "too large to replay" in response2.json()["detail"]
+    list_response = test_client.get("/api/v1/users/me/portfolios", headers=auth_headers)
+    assert len([p for p in list_response.json() if p["name"] == "Oversized Portfolio"]) == 1
+
+def test_delete_portfolio_idempotent_replay(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict):
+    """
+    Tests that replaying a deletion returns the original empty 204 response (P_I_4002).
+    """
+    # ARRANGE
+    portfolio_id = user_with_portfolio["portfolio"]["portfolioId"]
+    headers = {**auth_headers, "Idempotency-Key": str(uuid4())}
+
+    # ACT
+    response1 = test_client.delete(f"/api/v1/users/me/portfolios/{portfolio_id}", headers=headers)
+    response2 = test_client.delete(f"/api/v1/users/me/portfolios/{portfolio_id}", headers=headers)
+
+    # ASSERT
+    assert response1.status_code == response2.status_code == 204
+    assert response2.content == b""
+
 def test_list_portfolios_success(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict):
     """
     Tests successful retrieval of a user's portfolio list (P_I_2201).
@@ -138,8 +198,42 @@ def test_list_portfolios_success(test_client: TestClient, auth_headers: dict, us
     summary = data[0]
     assert summary["name"] == user_with_portfolio["portfolio"]["name"]
     assert summary["portfolioId"] == user_with_portfolio["portfolio"]["portfolioId"]
-    # Per spec, currentValue is stubbed with cash reserve total amount for now
-    assert summary["currentValue"] == user_with_portfolio["portfolio"]["cashReserve"]["totalAmount"]
+    # currentValue is the holdings' value; the portfolio has none yet.
+    assert summary["currentValue"] == 0.0
+
+def test_list_portfolios_paginates(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict, db_client: firestore.Client):
+    """
+    Tests that the list is paged with pageSize and the X-Next-Page-Token header.
+    """
+    # ARRANGE
+    user_id = user_with_portfolio["user"]["uid"]
+    for name in ("A Portfolio", "Z Portfolio"):
+        portfolio_id = str(uuid4())
+        db_client.collection("portfolios").document(portfolio_id).set({
+            "portfolioId": portfolio_id, "userId": user_id, "name": name, "defaultCurrency": "USD",
+            "cashReserve": {"totalAmount": 1.0, "warChestAmount": 0.0},
+            "createdAt": datetime.now(timezone.utc), "modifiedAt": datetime.now(timezone.utc), "ruleSetId": None
+        })
+
+    # ACT
+    first = test_client.get("/api/v1/users/me/portfolios", params={"pageSize": 2}, headers=auth_headers)
+    token = first.headers["X-Next-Page-Token"]
+    second = test_client.get("/api/v1/users/me/portfolios", params={"pageSize": 2, "pageToken": token}, headers=auth_headers)
+
+    # ASSERT
+    assert first.status_code == second.status_code == 200
+    assert [p["name"] for p in first.json()] == ["A Portfolio", "Test Portfolio"]
+    assert [p["name"] for p in second.json()] == ["Z Portfolio"]
+    assert "X-Next-Page-Token" not in second.headers
+
+def test_list_portfolios_invalid_page_token(test_client: TestClient, auth_headers: dict):
+    """
+    Tests that an invalid page token is rejected (P_E_2302).
+    """
+    response = test_client.get("/api/v1/users/me/portfolios", params={"pageToken": "garbage"}, headers=auth_headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "The page token is invalid."
 
 def test_get_portfolio_by_id_success(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict):
     """
@@ -157,6 +251,29 @@ def test_get_portfolio_by_id_success(test_client: TestClient, auth_headers: dict
     assert data["portfolioId"] == portfolio_id
     assert data["name"] == user_with_portfolio["portfolio"]["name"]
 
+def test_portfolio_reads_are_conditional(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict, db_client: firestore.Client):
+    """
+    Tests that the portfolio and the portfolio list answer 304 to their current
+    ETag, and that a valuation change alone gives the list a new one.
+    """
+    # ARRANGE
+    portfolio_id = user_with_portfolio["portfolio"]["portfolioId"]
+    portfolio_url, list_url = f"/api/v1/users/me/portfolios/{portfolio_id}", "/api/v1/users/me/portfolios"
+    portfolio_etag = test_client.get(portfolio_url, headers=auth_headers).headers["ETag"]
+    list_etag = test_client.get(list_url, headers=auth_headers).headers["ETag"]
+
+    # ACT
+    portfolio = test_client.get(portfolio_url, headers={**auth_headers, "If-None-Match": f'"other", {portfolio_etag}'})
+    unchanged_list = test_client.get(list_url, headers={**auth_headers, "If-None-Match": list_etag})
+    db_client.collection("portfolios").document(portfolio_id).update({"valuation.lastValuation": 123.0})
+    changed_list = test_client.get(list_url, headers={**auth_headers, "If-None-Match": list_etag})
+
+    # ASSERT
+    assert portfolio.status_code == 304
+    assert unchanged_list.status_code == 304
+    assert changed_list.status_code == 200
+    assert changed_list.json()[0]["currentValue"] == 123.0
+
 def test_get_portfolio_by_id_not_found(test_client: TestClient, auth_headers: dict):
     """
     Tests that requesting a non-existent portfolio ID returns 404 (P_E_2102).
@@ -193,7 +310,7 @@ def test_get_portfolio_by_id_forbidden(test_client: TestClient, db_client: fires
 
 def test_get_portfolio_chart_data_success(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict):
     """
-    Tests that the chart data endpoint returns an empty list as specified (P_I_2401).
+    Tests that the chart data endpoint returns an empty list for a portfolio without snapshots (P_I_2401).
     """
     # ARRANGE
     portfolio_id = user_with_portfolio["portfolio"]["portfolioId"]
@@ -205,6 +322,32 @@ def test_get_portfolio_chart_data_success(test_client: TestClient, auth_headers:
     assert response.status_code == 200
     assert response.json() == []
 
+def test_get_portfolio_chart_data_serves_the_range_from_the_chart_series(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict, db_client: firestore.Client):
+    """
+    Tests that chart data comes downsampled from the precomputed series (P_I_2401),
+    and that an unsupported range is rejected (P_E_2503).
+    """
+    # ARRANGE
+    portfolio_id = user_with_portfolio["portfolio"]["portfolioId"]
+    days = np.arange(np.datetime64("2025-01-01"), np.datetime64("2025-07-01")).astype(np.int64)
+    series = ChartSeries.from_daily({
+        "date": days, "totalCost": np.full(len(days), 100.0), "currentValue": np.full(len(days), 150.0), "capitalGainTax": np.full(len(days), 10.0),
+    })
+    db_client.collection("portfolios").document(portfolio_id).collection("chartSeries").document("series").set(series.to_document())
+
+    # ACT
+    one_month = test_client.get(f"/api/v1/users/me/portfolios/{portfolio_id}/chart-data?range=1m", headers=auth_headers)
+    everything = test_client.get(f"/api/v1/users/me/portfolios/{portfolio_id}/chart-data?range=all", headers=auth_headers)
+    invalid = test_client.get(f"/api/v1/users/me/portfolios/{portfolio_id}/chart-data?range=2w", headers=auth_headers)
+
+    # ASSERT
+    assert one_month.status_code == 200
+    assert len(one_month.json()) == 32
+    assert one_month.json()[-1]["date"].startswith("2025-06-30")
+    assert one_month.json()[-1]["afterTaxGainLoss"] == pytest.approx(40.0)
+    assert [point["date"][:10] for point in everything.json()] == ["2025-01-31", "2025-02-28", "2025-03-31", "2025-04-30", "2025-05-31", "2025-06-30"]
+    assert invalid.status_code == 400
+
 def test_update_portfolio_success(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict):
     """
     Tests successful portfolio update (P_I_3001).
@@ -302,6 +445,47 @@ def test_delete_portfolio_success(test_client: TestClient, auth_headers: dict, u
     doc = db_client.collection("portfolios").document(portfolio_id).get()
     assert not doc.exists
 
+def test_delete_portfolio_cascades_in_background(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict, db_client: firestore.Client, monkeypatch):
+    """
+    Tests that a cascade larger than the inline budget is finished by a background task and reported as completed.
+    """
+    # ARRANGE
+    from src.settings import settings
+    monkeypatch.setattr(settings, "PORTFOLIO_DELETION_INLINE_BUDGET", 1)
+    portfolio_id = user_with_portfolio["portfolio"]["portfolioId"]
+    for _ in range(3):
+        holding_id = str(uuid4())
+        holding_ref = db_client.collection("holdings").document(holding_id)
+        holding_ref.set({"holdingId": holding_id, "portfolioId": portfolio_id, "userId": user_with_portfolio["user"]["uid"]})
+        holding_ref.collection("dailySnapshots").document("2024-01-02").set({"currentValue": 1.0})
+    headers = {**auth_headers, "Idempotency-Key": str(uuid4())}
+
+    # ACT
+    response = test_client.delete(f"/api/v1/users/me/portfolios/{portfolio_id}", headers=headers)
+    progress_response = test_client.get(f"/api/v1/users/me/portfolios/{portfolio_id}/deletion", headers=auth_headers)
+
+    # ASSERT
+    assert response.status_code == 204
+    assert not list(db_client.collection("holdings").where("portfolioId", "==", portfolio_id).stream())
+    assert progress_response.status_code == 200
+    progress = progress_response.json()
+    assert progress["status"] == "COMPLETED"
+    assert progress["deletedCounts"] == {"holdings": 3, "holdingSnapshots": 3}
+
+def test_get_deletion_progress_forbidden(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict):
+    """
+    Tests that another user cannot read the progress of a deletion (P_E_4101).
+    """
+    # ARRANGE
+    portfolio_id = user_with_portfolio["portfolio"]["portfolioId"]
+    test_client.delete(f"/api/v1/users/me/portfolios/{portfolio_id}", headers={**auth_headers, "Idempotency-Key": str(uuid4())})
+
+    # ACT
+    response = test_client.get(f"/api/v1/users/me/portfolios/{portfolio_id}/deletion", headers={"Authorization": "Bearer someone-else"})
+
+    # ASSERT
+    assert response.status_code == 403
+
 def test_delete_default_portfolio_reassigns_default(test_client: TestClient, auth_headers: dict, user_with_portfolio: dict, db_client: firestore.Client):
     """
     Tests that deleting the default portfolio automatically reassigns a new default (P_I_4003).
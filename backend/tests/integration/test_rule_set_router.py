@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+from firebase_admin import firestore
+from uuid import uuid4
+from datetime import datetime, timezone
+
+# --- Fixtures ---
+
+@pytest.fixture(scope="function")
+def holding(db_client: firestore.Client) -> dict:
+    """Creates a portfolio with one holding (no rule sets yet) owned by a test user."""
+    user_id = f"integration-test-user-{uuid4()}"
+    portfolio_id, holding_id = str(uuid4()), str(uuid4())
+    db_client.collection("portfolios").document(portfolio_id).set({"portfolioId": portfolio_id, "userId": user_id, "name": "Test", "ruleSetId": None})
+    db_client.collection("holdings").document(holding_id).set({
+        "holdingId": holding_id, "portfolioId": portfolio_id, "userId": user_id, "ticker": "AAPL",
+        "securityType": "STOCK", "assetClass": "EQUITY", "currency": "USD", "ruleSetId": None, "lots": [],
+    })
+    return {"userId": user_id, "portfolioId": portfolio_id, "holdingId": holding_id, "headers": {"Authorization": f"Bearer {user_id}"}}
+
+def _seed_rule_set(db_client: firestore.Client, user_id: str, parent_id: str, parent_type: str) -> str:
+    rule_set_id = str(uuid4())
+    db_client.collection("rulesets").document(rule_set_id).set({
+        "ruleSetId": rule_set_id, "userId": user_id, "parentId": parent_id, "parentType": parent_type,
+        "rules": [{
+            "ruleId": str(uuid4()), "ruleType": "BUY", "logicalOperator": "AND", "status": "ENABLED",
+            "conditions": [{"conditionId": str(uuid4()), "type": "RSI_LEVEL", "parameters": {"period": 14, "operator": "below", "threshold": 30}}],
+        }],
+        "createdAt": datetime.now(timezone.utc), "modifiedAt": datetime.now(timezone.utc),
+    })
+    return rule_set_id
+
+def _url(holding: dict) -> str:
+    return f"/api/v1/users/me/holdings/{holding['holdingId']}/effective-rules"
+
+# --- Tests ---
+
+def test_inherited_and_then_specific_rule_set(test_client: TestClient, db_client: firestore.Client, holding: dict):
+    """
+    Tests R_I_2002 and R_I_2001: the portfolio's rule set applies until the
+    holding gets its own.
+    """
+    # ARRANGE
+    portfolio_rule_set = _seed_rule_set(db_client, holding["userId"], holding["portfolioId"], "PORTFOLIO")
+    db_client.collection("portfolios").document(holding["portfolioId"]).update({"ruleSetId": portfolio_rule_set})
+
+    # ACT
+    inherited = test_client.get(_url(holding), headers=holding["headers"])
+    holding_rule_set = _seed_rule_set(db_client, holding["userId"], holding["holdingId"], "HOLDING")
+    db_client.collection("holdings").document(holding["holdingId"]).update({"ruleSetId": holding_rule_set})
+    specific = test_client.get(_url(holding), headers=holding["headers"])
+
+    # ASSERT
+    assert inherited.status_code == 200
+    assert inherited.json()["source"] == "INHERITED"
+    assert inherited.json()["ruleSet"]["ruleSetId"] == portfolio_rule_set
+    assert specific.json()["source"] == "SPECIFIC"
+    assert specific.json()["ruleSet"]["ruleSetId"] == holding_rule_set
+
+def test_no_applicable_rules(test_client: TestClient, holding: dict):
+    """Tests R_I_2003."""
+    response = test_client.get(_url(holding), headers=holding["headers"])
+
+    assert response.status_code == 200
+    assert response.json() == {"source": None, "ruleSet": None}
+
+def test_other_users_holding_is_forbidden_and_unknown_holding_not_found(test_client: TestClient, holding: dict):
+    """Tests R_E_2101 and R_E_2102."""
+    forbidden = test_client.get(_url(holding), headers={"Authorization": "Bearer someone-else"})
+    missing = test_client.get(f"/api/v1/users/me/holdings/{uuid4()}/effective-rules", headers=holding["headers"])
+
+    assert forbidden.status_code == 403
+    assert missing.status_code == 404
@@ -81,6 +81,30 @@ def test_get_user_settings_success(test_client: TestClient, test_user):
     assert data["email"] == MOCK_USER_EMAIL
     assert data["notificationPreferences"] == [NotificationChannel.EMAIL.value]
 
+def test_get_user_settings_is_conditional(test_client: TestClient, test_user, db_client: firestore.Client):
+    """Test that unchanged settings answer 304 to their ETag and changed ones 200."""
+    user_uid, auth_header = test_user
+    portfolio_id = str(uuid4())
+    db_client.collection("portfolios").document(portfolio_id).set({"portfolioId": portfolio_id, "userId": user_uid, "name": "Other"})
+    first = test_client.get("/api/v1/users/me/settings", headers=auth_header)
+    etag = first.headers["ETag"]
+
+    unchanged = test_client.get("/api/v1/users/me/settings", headers={**auth_header, "If-None-Match": etag})
+    test_client.put(
+        "/api/v1/users/me/settings",
+        headers={**auth_header, "Idempotency-Key": str(uuid4())},
+        json={"defaultPortfolioId": portfolio_id},
+    )
+    changed = test_client.get("/api/v1/users/me/settings", headers={**auth_header, "If-None-Match": etag})
+
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["ETag"] == etag
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
 def test_get_user_settings_not_found(test_client: TestClient, test_user, db_client: firestore.Client):
     """Test retrieval when Firestore document is missing."""
     user_uid, auth_header = test_user
@@ -0,0 +1,252 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.core.rate_limiter import TokenBucket
+from src.services.market_data_service import alpha_vantage_service
+from src.services.market_data_service.alpha_vantage_service import (
+    AlphaVantageClient,
+    MarketDataError,
+    MarketDataUnavailableError,
+)
+
+# --- Fixtures ---
+
+class FakeClock:
+    """A clock that only advances when the code under test sleeps."""
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def daily_payload(days: int = 250, start_price: float = 100.0) -> dict:
+    dates = pd.bdate_range(end="2025-06-30", periods=days)
+    series = {}
+    for i, day in enumerate(dates):
+        close = start_price + i * 0.5 + (i % 7)
+        series[day.strftime("%Y-%m-%d")] = {
+            "1. open": str(close - 1),
+            "2. high": str(close + 2),
+            "3. low": str(close - 2),
+            "4. close": str(close),
+            "5. volume": str(1000 + 10 * i),
+        }
+    return {"Meta Data": {"2. Symbol": "TEST"}, "Time Series (Daily)": series}
+
+def make_client(handler, clock: FakeClock, max_concurrency: int = 4, max_retries: int = 3, rate_per_minute: int = 600):
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    bucket = TokenBucket.per_minute(rate_per_minute, clock=clock, sleep=clock.sleep)
+    return AlphaVantageClient(
+        api_key="KEY",
+        http_client=http_client,
+        rate_limiter=bucket,
+        max_concurrency=max_concurrency,
+        max_retries=max_retries,
+        sleep=clock.sleep,
+        jitter=lambda: 0.5,
+    )
+
+# --- Unit Tests for TokenBucket ---
+
+async def test_token_bucket_paces_acquisitions_to_the_rate():
+    """
+    Tests that after the initial burst, acquisitions are spaced by 1/rate seconds.
+    """
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=clock, sleep=clock.sleep)
+
+    for _ in range(6):
+        await bucket.acquire()
+
+    # 2 tokens up front, then 4 more at 0.5s each.
+    assert clock.now == pytest.approx(2.0)
+
+def test_token_bucket_rejects_invalid_arguments():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, capacity=0.5)
+
+# --- Unit Tests for AlphaVantageClient ---
+
+async def test_fetch_daily_series_parses_and_sorts_the_series():
+    """
+    Tests that the daily series is returned oldest first with numeric columns.
+    """
+    # ARRANGE
+    clock = FakeClock()
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=daily_payload(days=5))
+
+    client = make_client(handler, clock)
+
+    # ACT
+    series = await client.fetch_daily_series("TEST", outputsize="compact")
+
+    # ASSERT
+    assert list(series.columns) == ["open", "high", "low", "close", "volume"]
+    assert series.index.is_monotonic_increasing
+    assert series["volume"].dtype == np.int64
+    params = requests[0].url.params
+    assert params["function"] == "TIME_SERIES_DAILY"
+    assert params["symbol"] == "TEST"
+    assert params["outputsize"] == "compact"
+    assert params["apikey"] == "KEY"
+
+async def test_rate_limit_note_is_retried_with_backoff():
+    """
+    Tests that a 'Note' payload is retried after an exponential backoff delay.
+    """
+    # ARRANGE
+    clock = FakeClock()
+    responses = [
+        {"Note": "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute."},
+        {"Information": "Please consider spreading out your free API requests more sparingly."},
+        daily_payload(days=5),
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=responses.pop(0))
+
+    client = make_client(handler, clock)
+
+    # ACT
+    series = await client.fetch_daily_series("TEST")
+
+    # ASSERT
+    assert len(series) == 5
+    # Backoff of 2s then 4s, each with jitter 0.5 -> 75% of the delay.
+    assert [s for s in clock.sleeps if s >= 1] == [pytest.approx(1.5), pytest.approx(3.0)]
+
+async def test_persistent_rate_limit_raises_unavailable():
+    clock = FakeClock()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"Note": "rate limited"})
+
+    client = make_client(handler, clock, max_retries=2)
+
+    with pytest.raises(MarketDataUnavailableError):
+        await client.fetch_daily_series("TEST")
+
+@pytest.mark.parametrize("information", [
+    "Thank you for using Alpha Vantage! The outputsize=full parameter value is a premium feature.",
+    "Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day.",
+])
+async def test_information_that_is_not_a_throttle_is_not_retried(information: str):
+    """
+    Tests that premium-only parameters and the exhausted daily quota fail at once.
+    """
+    clock = FakeClock()
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={"Information": information})
+
+    client = make_client(handler, clock)
+
+    with pytest.raises(MarketDataUnavailableError):
+        await client.fetch_daily_series("TEST")
+    assert len(calls) == 1
+    assert not [s for s in clock.sleeps if s >= 1]
+
+async def test_error_message_is_not_retried():
+    """
+    Tests that an 'Error Message' payload (e.g. an unknown ticker) fails immediately.
+    """
+    clock = FakeClock()
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={"Error Message": "Invalid API call."})
+
+    client = make_client(handler, clock)
+
+    with pytest.raises(MarketDataError):
+        await client.fetch_daily_series("NOPE")
+    assert len(calls) == 1
+
+async def test_fetch_many_bounds_concurrency_and_isolates_failures():
+    """
+    Tests that tickers are fetched concurrently, never more than the limit at
+    once, and that one failing ticker does not affect the others.
+    """
+    # ARRANGE
+    clock = FakeClock()
+    in_flight = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        if request.url.params["symbol"] == "BAD":
+            return httpx.Response(200, json={"Error Message": "Invalid API call."})
+        return httpx.Response(200, json=daily_payload(days=3))
+
+    client = make_client(handler, clock, max_concurrency=2, rate_per_minute=60_000)
+    tickers = [f"T{i}" for i in range(8)] + ["BAD"]
+
+    # ACT
+    series, failures = await client.fetch_daily_series_many(tickers)
+
+    # ASSERT
+    assert set(series) == {f"T{i}" for i in range(8)}
+    assert list(failures) == ["BAD"]
+    assert peak <= 2
+
+async def test_get_daily_data_with_indicators_returns_latest_day():
+    """
+    Tests that indicators are computed from the fetched series for the most recent day.
+    """
+    # ARRANGE
+    clock = FakeClock()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=daily_payload(days=250))
+
+    client = make_client(handler, clock)
+
+    # ACT
+    latest = await client.get_daily_data_with_indicators("TEST")
+
+    # ASSERT
+    series = await client.fetch_daily_series("TEST")
+    assert latest.ticker == "TEST"
+    assert latest.date == series.index[-1].to_pydatetime()
+    assert latest.close == series["close"].iloc[-1]
+    assert latest.sma200 == pytest.approx(series["close"].iloc[-200:].mean())
+    expected_vwma = (series["close"] * series["volume"]).iloc[-200:].sum() / series["volume"].iloc[-200:].sum()
+    assert latest.vwma200 == pytest.approx(expected_vwma)
+    assert 0 < latest.rsi14 < 100
+    assert latest.macd["histogram"] == pytest.approx(latest.macd["value"] - latest.macd["signal"])
+
+async def test_shared_client_is_reused_until_closed():
+    """
+    Tests that the module-level helpers share one pooled HTTP client.
+    """
+    await alpha_vantage_service.close_client()
+    first = alpha_vantage_service.get_client()
+    assert alpha_vantage_service.get_client() is first
+
+    await alpha_vantage_service.close_client()
+    assert first.http.is_closed
+    assert alpha_vantage_service.get_client() is not first
+    await alpha_vantage_service.close_client()
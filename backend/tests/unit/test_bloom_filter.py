@@ -0,0 +1,58 @@
+import pytest
+
+from src.core.bloom_filter import BloomFilter
+
+def test_added_keys_are_always_members():
+    """
+    Tests that the filter never reports a false negative for keys in the current generation.
+    """
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"key-{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+
+def test_false_positive_rate_is_near_target():
+    """
+    Tests that unseen keys are reported as members at roughly the configured rate.
+    """
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"key-{i}")
+
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+
+    assert false_positives < 300
+
+def test_rotation_keeps_previous_generation_and_forgets_older_ones():
+    """
+    Tests that once capacity is exceeded, keys survive one rotation and are dropped after two.
+    """
+    bloom = BloomFilter(capacity=10, error_rate=0.001)
+    bloom.add("first")
+    for i in range(9):
+        bloom.add(f"fill-{i}")
+
+    # ACT: the next add starts a new generation.
+    bloom.add("second")
+    assert "first" in bloom
+
+    for i in range(9):
+        bloom.add(f"more-{i}")
+    bloom.add("third")
+
+    # ASSERT
+    assert "second" in bloom
+    assert "first" not in bloom
+
+def test_clear_and_invalid_arguments():
+    bloom = BloomFilter(capacity=10)
+    bloom.add("key")
+    bloom.clear()
+    assert "key" not in bloom
+
+    with pytest.raises(ValueError):
+        BloomFilter(capacity=0)
+    with pytest.raises(ValueError):
+        BloomFilter(capacity=10, error_rate=1.5)
@@ -0,0 +1,67 @@
+import pytest
+from datetime import date, timedelta
+import numpy as np
+
+from src.core.chart_series import CHART_RESOLUTIONS, ChartSeries
+from src.core.valuation import Valuation
+
+# --- Fixtures ---
+
+def _business_days(start: date, count: int) -> list:
+    days, day = [], start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+def _daily_columns(days: list) -> dict:
+    values = np.arange(len(days), dtype=np.float64)
+    return {
+        "date": np.array(days, dtype="datetime64[D]").astype(np.int64),
+        "totalCost": np.full(len(days), 100.0),
+        "currentValue": 100.0 + values,
+        "capitalGainTax": values / 4,
+    }
+
+# --- Unit Tests for ChartSeries ---
+
+def test_ranges_are_served_from_bounded_downsampled_points():
+    """
+    Tests that a long history keeps the last snapshot of each week and month,
+    and that every range returns a bounded number of points ending with the latest day.
+    """
+    # ARRANGE
+    days = _business_days(date(2015, 1, 1), 2700)
+    series = ChartSeries.from_daily(_daily_columns(days))
+
+    # ACT
+    one_month, one_year, everything = series.points("1m"), series.points("1y"), series.points("all")
+
+    # ASSERT
+    assert all(len(series.resolutions[name]["date"]) <= limit for name, limit in CHART_RESOLUTIONS.items())
+    assert 20 <= len(one_month) <= 24
+    assert 52 <= len(one_year) <= 54
+    assert len(everything) == len({(day.year, day.month) for day in days})
+    assert one_month[-1][0] == one_year[-1][0] == everything[-1][0] == days[-1]
+    # Each weekly point is the Friday of its week.
+    assert all(day.weekday() == 4 for day, _ in one_year[:-1])
+    assert everything[-1][1].currentValue == pytest.approx(100.0 + len(days) - 1)
+
+def test_adding_days_matches_downsampling_them_at_once_and_survives_storage():
+    # ARRANGE
+    days = _business_days(date(2024, 11, 25), 60)
+    columns = _daily_columns(days)
+    series = ChartSeries.from_daily({name: values[:40] for name, values in columns.items()})
+
+    # ACT
+    for index in range(40, 60):
+        series.add(days[index], Valuation(100.0, float(columns["currentValue"][index]), float(columns["capitalGainTax"][index])))
+    series.add(days[10], Valuation(0.0, 0.0, 0.0))  # an older day is ignored
+    stored = ChartSeries.from_document(series.to_document())
+
+    # ASSERT
+    expected = ChartSeries.from_daily(columns)
+    for resolution in CHART_RESOLUTIONS:
+        for name, values in expected.resolutions[resolution].items():
+            assert stored.resolutions[resolution][name].tolist() == values.tolist()
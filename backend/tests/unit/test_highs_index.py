@@ -0,0 +1,69 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from src.services.market_data_service.highs_index import HIGH_52_WEEKS_DAYS, HighsIndex, RollingHigh, usable_high_state
+from src.services.market_data_service.price_history import PriceHistory
+
+# --- Fixtures ---
+
+def _history(highs: np.ndarray, end: str = "2025-06-30") -> PriceHistory:
+    index = pd.bdate_range(end=end, periods=len(highs), tz="UTC")
+    return PriceHistory.from_frame(pd.DataFrame({"open": highs, "high": highs, "low": highs, "close": highs, "volume": [1000] * len(highs)}, index=index))
+
+def _highs(length: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 100 + np.cumsum(rng.normal(0, 1, length))
+
+# --- Unit Tests for RollingHigh ---
+
+def test_rolling_high_matches_the_window_max_across_a_stored_state():
+    """
+    Tests that a state replayed over part of a series, stored and advanced
+    bar by bar reports the max of the last 252 highs on every day.
+    """
+    # ARRANGE
+    highs = _highs(700)
+    state = RollingHigh.replay(highs[:400])
+    stored = state.to_document(date(2025, 6, 27))
+
+    # ACT
+    restored = RollingHigh.from_document(stored)
+    rolling = [restored.push(high) for high in highs[400:]]
+
+    # ASSERT
+    expected = [highs[max(0, day - HIGH_52_WEEKS_DAYS + 1):day + 1].max() for day in range(400, 700)]
+    assert np.allclose(rolling, expected)
+    assert usable_high_state(stored, date(2025, 6, 27))
+    assert not usable_high_state(stored, date(2025, 6, 30))
+
+# --- Unit Tests for HighsIndex ---
+
+def test_range_max_matches_a_scan_before_and_after_appending():
+    # ARRANGE
+    highs = _highs(600, seed=1)
+    history = _history(highs)
+    index = HighsIndex(history.tail(0))
+    index.append(PriceHistory({name: values[:450] for name, values in history.columns.items()}))
+
+    # ACT
+    index.append(history)
+    rng = np.random.default_rng(2)
+    ranges = [sorted(rng.integers(0, 601, 2)) for _ in range(200)]
+
+    # ASSERT
+    assert len(index) == 600
+    for start, stop in ranges:
+        assert index.max(start, stop) == (highs[start:stop].max() if stop > start else None)
+    assert index.high_52_weeks() == highs[-HIGH_52_WEEKS_DAYS:].max()
+
+def test_high_since_a_day_without_a_bar_starts_at_the_next_trading_day():
+    # ARRANGE: 2025-06-28/29 are a weekend; the history ends on Monday 2025-06-30.
+    index = HighsIndex(_history(np.array([150.0, 120.0, 110.0, 105.0]), end="2025-06-30"))
+
+    # ACT / ASSERT
+    assert index.high_since(date(2025, 1, 1)) == 150.0
+    assert index.high_since(date(2025, 6, 26)) == 120.0
+    assert index.high_since(date(2025, 6, 28)) == 105.0
+    assert index.high_since(date(2025, 7, 1)) is None
@@ -0,0 +1,128 @@
+import pytest
+from uuid import uuid4
+from firebase_admin import firestore
+
+from src.services.idempotency_service import IdempotencyService, ReservationOutcome, clear_local_idempotency_cache
+
+# --- Fixtures ---
+
+@pytest.fixture(scope="function")
+def idempotency_service(async_db_client: firestore.AsyncClient) -> IdempotencyService:
+    """Provides an instance of the IdempotencyService for use in tests."""
+    return IdempotencyService(async_db_client)
+
+@pytest.fixture(scope="function")
+def idempotency_key() -> str:
+    return str(uuid4())
+
+# --- Unit Tests for IdempotencyService ---
+
+async def test_reserve_new_key_is_acquired(idempotency_service: IdempotencyService, idempotency_key: str, db_client: firestore.Client):
+    """
+    Tests that the first reservation of a key acquires it and writes a pending marker.
+    """
+    # ACT
+    reservation = await idempotency_service.reserve(idempotency_key, "user-1")
+
+    # ASSERT
+    assert reservation.outcome == ReservationOutcome.ACQUIRED
+    doc = db_client.collection("idempotencyKeys").document(idempotency_key).get()
+    assert doc.to_dict()["status"] == "PENDING"
+
+async def test_reserve_pending_key_is_in_progress(idempotency_service: IdempotencyService, idempotency_key: str):
+    """
+    Tests that a second reservation while the first is pending is rejected.
+    """
+    # ARRANGE
+    await idempotency_service.reserve(idempotency_key, "user-1")
+
+    # ACT
+    reservation = await idempotency_service.reserve(idempotency_key, "user-1")
+
+    # ASSERT
+    assert reservation.outcome == ReservationOutcome.IN_PROGRESS
+
+async def test_reserve_completed_key_returns_stored_response(idempotency_service: IdempotencyService, idempotency_key: str):
+    """
+    Tests that a completed key yields the stored response for replay.
+    """
+    # ARRANGE
+    stored = {"status_code": 201, "body": "{}"}
+    await idempotency_service.reserve(idempotency_key, "user-1")
+    await idempotency_service.store_idempotent_response(idempotency_key, "user-1", stored)
+
+    # ACT
+    reservation = await idempotency_service.reserve(idempotency_key, "user-1")
+
+    # ASSERT
+    assert reservation.outcome == ReservationOutcome.COMPLETED
+    assert reservation.response == stored
+    assert await idempotency_service.get_idempotent_response(idempotency_key, "user-1") == stored
+
+async def test_release_allows_retry(idempotency_service: IdempotencyService, idempotency_key: str):
+    """
+    Tests that releasing a pending marker lets the key be acquired again.
+    """
+    # ARRANGE
+    await idempotency_service.reserve(idempotency_key, "user-1")
+
+    # ACT
+    await idempotency_service.release(idempotency_key, "user-1")
+    reservation = await idempotency_service.reserve(idempotency_key, "user-1")
+
+    # ASSERT
+    assert reservation.outcome == ReservationOutcome.ACQUIRED
+
+async def test_pending_key_is_not_replayed(idempotency_service: IdempotencyService, idempotency_key: str):
+    """
+    Tests that a pending marker is never returned as a stored response.
+    """
+    await idempotency_service.reserve(idempotency_key, "user-1")
+    assert await idempotency_service.get_idempotent_response(idempotency_key, "user-1") is None
+
+async def test_completed_key_is_replayed_from_local_tier(idempotency_service: IdempotencyService, idempotency_key: str, db_client: firestore.Client):
+    """
+    Tests that a response stored by this instance is replayed without reading Firestore.
+    """
+    # ARRANGE
+    stored = {"status_code": 201, "body": b"{}"}
+    await idempotency_service.reserve(idempotency_key, "user-1")
+    await idempotency_service.store_idempotent_response(idempotency_key, "user-1", stored)
+    db_client.collection("idempotencyKeys").document(idempotency_key).delete()
+
+    # ACT
+    reservation = await idempotency_service.reserve(idempotency_key, "user-1")
+
+    # ASSERT
+    assert reservation.outcome == ReservationOutcome.COMPLETED
+    assert reservation.response == stored
+
+async def test_unseen_key_existing_in_firestore_falls_back_to_transaction(idempotency_service: IdempotencyService, idempotency_key: str):
+    """
+    Tests that a key stored by another instance is still replayed when the local tier has never seen it.
+    """
+    # ARRANGE
+    stored = {"status_code": 201, "body": b"{}"}
+    await idempotency_service.store_idempotent_response(idempotency_key, "user-1", stored)
+    clear_local_idempotency_cache()
+
+    # ACT
+    reservation = await idempotency_service.reserve(idempotency_key, "user-1")
+
+    # ASSERT
+    assert reservation.outcome == ReservationOutcome.COMPLETED
+    assert reservation.response == stored
+
+async def test_local_tier_is_scoped_to_the_user(idempotency_service: IdempotencyService, idempotency_key: str):
+    """
+    Tests that a locally cached response is not replayed for a different user.
+    """
+    # ARRANGE
+    await idempotency_service.reserve(idempotency_key, "user-1")
+    await idempotency_service.store_idempotent_response(idempotency_key, "user-1", {"status_code": 201, "body": b"{}"})
+
+    # ACT
+    reservation = await idempotency_service.reserve(idempotency_key, "user-2")
+
+    # ASSERT
+    assert reservation.outcome == ReservationOutcome.ACQUIRED
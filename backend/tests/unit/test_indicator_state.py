@@ -0,0 +1,59 @@
+from datetime import date
+
+import numpy as np
+
+from src.services.market_data_service.indicator_state import INDICATOR_STATE_VERSION, IndicatorState, usable_state
+from src.services.market_data_service.indicators import compute_indicators, right_align
+
+# --- Fixtures ---
+
+def _bars(lengths, days: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    rows = {"high": [], "low": [], "close": [], "volume": []}
+    for length in lengths:
+        close = 100 + np.cumsum(rng.normal(0, 1, length))
+        rows["high"].append(close + rng.random(length))
+        rows["low"].append(close - rng.random(length))
+        rows["close"].append(close)
+        rows["volume"].append(rng.integers(100, 10_000, length).astype(float))
+    return {name: right_align(values, days) for name, values in rows.items()}
+
+# --- Unit Tests for IndicatorState ---
+
+def test_streaming_from_a_stored_state_matches_a_full_recompute():
+    """
+    Tests that replaying part of a history, storing the state and advancing it
+    one bar at a time yields the batch engine's values for every day.
+    """
+    # ARRANGE
+    bars = _bars((400, 250, 30), days=400)
+    expected = compute_indicators(**bars)
+    state, replayed = IndicatorState.replay(**{name: values[:, :390] for name, values in bars.items()})
+    stored = [state.to_document(row, date(2025, 6, 30)) for row in range(3)]
+
+    # ACT
+    restored = IndicatorState.from_documents(stored)
+    streamed = [restored.advance(*(bars[name][:, day] for name in ("high", "low", "close", "volume"))) for day in range(390, 400)]
+
+    # ASSERT
+    for name, values in expected.items():
+        actual = np.concatenate([replayed[name], np.stack([outputs[name] for outputs in streamed], axis=1)], axis=1)
+        np.testing.assert_allclose(actual, values, rtol=1e-9, equal_nan=True, err_msg=name)
+
+def test_rows_without_a_bar_are_left_unchanged():
+    bars = _bars((30, 30), days=30)
+    state, _ = IndicatorState.replay(**bars)
+    count_before = state.count.copy()
+
+    outputs = state.advance(np.array([101.0, np.nan]), np.array([99.0, np.nan]), np.array([100.0, np.nan]), np.array([500.0, np.nan]))
+
+    assert list(state.count - count_before) == [1, 0]
+    assert not np.isnan(outputs["sma20"][0]) and np.isnan(outputs["sma20"][1])
+
+def test_usable_state_requires_matching_version_and_date():
+    document = {"version": INDICATOR_STATE_VERSION, "asOf": "2025-06-27"}
+
+    assert usable_state(document, date(2025, 6, 27))
+    assert not usable_state(document, date(2025, 6, 30))
+    assert not usable_state({**document, "version": INDICATOR_STATE_VERSION + 1}, date(2025, 6, 27))
+    assert not usable_state(None, date(2025, 6, 27))
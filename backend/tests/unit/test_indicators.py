@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services.market_data_service import indicators
+from src.services.market_data_service.indicators import compute_indicators, right_align
+
+# --- Fixtures ---
+
+def _random_ohlcv(days: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, days))
+    return pd.DataFrame({
+        "high": close + rng.random(days),
+        "low": close - rng.random(days),
+        "close": close,
+        "volume": rng.integers(100, 10_000, days),
+    })
+
+def _reference(frame: pd.DataFrame) -> dict:
+    """The indicator definitions, written with pandas rolling/ewm as a reference."""
+    close, volume = frame["close"], frame["volume"]
+    change = close.diff()
+    gains = change.clip(lower=0).ewm(alpha=1 / 14, adjust=True).mean()
+    losses = (-change).clip(lower=0).ewm(alpha=1 / 14, adjust=True).mean()
+    previous_close = close.shift()
+    true_range = pd.concat([
+        frame["high"] - frame["low"], (frame["high"] - previous_close).abs(), (previous_close - frame["low"]).abs(),
+    ], axis=1).max(axis=1)
+    macd_value = close.ewm(span=12, adjust=True).mean() - close.ewm(span=26, adjust=True).mean()
+    reference = {
+        "rsi14": 100 - 100 / (1 + gains / losses),
+        "atr14": true_range.rolling(14).mean(),
+        "macdValue": macd_value,
+        "macdSignal": macd_value.ewm(span=9, adjust=True).mean(),
+    }
+    for period in (7, 20, 50, 200):
+        reference[f"sma{period}"] = close.rolling(period).mean()
+        reference[f"vwma{period}"] = (close * volume).rolling(period).sum() / volume.rolling(period).sum()
+    return reference
+
+# --- Unit Tests for the indicator engine ---
+
+def test_batch_matches_reference_for_tickers_of_different_lengths():
+    """
+    Tests that one batched pass over right-aligned tickers reproduces the
+    per-ticker reference values, including NaN where history is too short.
+    """
+    # ARRANGE
+    frames = [_random_ohlcv(days, seed) for seed, days in enumerate((400, 250, 30))]
+    stacked = {
+        name: right_align([frame[name].to_numpy(dtype=float) for frame in frames])
+        for name in ("high", "low", "close", "volume")
+    }
+
+    # ACT
+    result = compute_indicators(**stacked)
+
+    # ASSERT
+    for row, frame in enumerate(frames):
+        for name, expected in _reference(frame).items():
+            actual = result[name][row, -len(frame):]
+            np.testing.assert_allclose(actual, expected.to_numpy(), rtol=1e-9, equal_nan=True, err_msg=f"{name} row {row}")
+        # The padding in front of a shorter history stays empty.
+        assert np.isnan(result["sma7"][row, :-len(frame)]).all()
+
+def test_rolling_sum_is_nan_for_windows_with_gaps():
+    values = np.array([[1.0, 2.0, np.nan, 4.0, 5.0, 6.0]])
+
+    sums = indicators.rolling_sum(values, 2)
+
+    np.testing.assert_array_equal(sums, [[np.nan, 3.0, np.nan, np.nan, 9.0, 11.0]])
+
+def test_rsi_of_a_rising_series_is_100():
+    close = np.arange(1.0, 31.0)[None, :]
+
+    assert indicators.rsi(close)[0, -1] == pytest.approx(100.0)
+
+def test_latest_market_data_builds_the_document():
+    frame = _random_ohlcv(250, seed=7)
+    frame["open"] = frame["close"]
+    frame.index = pd.bdate_range(end="2025-06-30", periods=250, tz="UTC")
+
+    document = indicators.latest_market_data("TEST", frame)
+
+    reference = _reference(frame.reset_index(drop=True))
+    assert document.date.isoformat() == "2025-06-30T00:00:00+00:00"
+    assert document.sma200 == pytest.approx(reference["sma200"].iloc[-1])
+    assert document.macd["histogram"] == pytest.approx(reference["macdValue"].iloc[-1] - reference["macdSignal"].iloc[-1])
@@ -0,0 +1,158 @@
+import pytest
+from uuid import uuid4
+from datetime import date
+from firebase_admin import firestore
+import pandas as pd
+
+from src.services.market_data_service.market_data_sync_service import (
+    MarketDataSyncService,
+    latest_trading_day,
+)
+
+# --- Fixtures ---
+
+class FakeMarketDataClient:
+    """Serves synthetic daily series and records the outputsize of each request."""
+    def __init__(self, end: str, failing: tuple = ()):
+        self.end = end
+        self.failing = set(failing)
+        self.requests = []
+
+    def series(self, periods: int) -> pd.DataFrame:
+        index = pd.bdate_range(end=self.end, periods=periods, tz="UTC")
+        closes = [100.0 + i for i in range(periods)]
+        return pd.DataFrame(
+            {"open": closes, "high": [c + 1 for c in closes], "low": [c - 1 for c in closes], "close": closes, "volume": [1000] * periods},
+            index=index,
+        )
+
+    async def fetch_daily_series_many(self, tickers, outputsize="full"):
+        series, failures = {}, {}
+        for ticker in tickers:
+            self.requests.append((ticker, outputsize))
+            if ticker in self.failing:
+                failures[ticker] = RuntimeError("provider error")
+            else:
+                series[ticker] = self.series(100 if outputsize == "compact" else 400)
+        return series, failures
+
+def _ticker() -> str:
+    return f"T{uuid4().hex[:8].upper()}"
+
+def _daily_ids(db_client: firestore.Client, ticker: str) -> list:
+    return sorted(doc.id for doc in db_client.collection("marketData").document(ticker).collection("daily").stream())
+
+# --- Unit Tests for MarketDataSyncService ---
+
+def test_latest_trading_day_skips_weekends():
+    assert latest_trading_day(date(2025, 6, 28)) == date(2025, 6, 27)  # Saturday
+    assert latest_trading_day(date(2025, 6, 30)) == date(2025, 6, 30)  # Monday
+
+async def test_first_sync_backfills_with_a_full_request(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that a ticker without stored data gets a full request and a one-year backfill.
+    """
+    # ARRANGE
+    ticker = _ticker()
+    client = FakeMarketDataClient(end="2025-06-30")
+    service = MarketDataSyncService(async_db_client, market_data_client=client)
+
+    # ACT
+    result = await service.sync_tickers([ticker], as_of=date(2025, 6, 30))
+
+    # ASSERT
+    assert client.requests == [(ticker, "full")]
+    assert result.written == {ticker: 366}
+    parent = db_client.collection("marketData").document(ticker).get().to_dict()
+    assert parent["lastDate"].date() == date(2025, 6, 30)
+    latest = db_client.collection("marketData").document(ticker).collection("daily").document("2025-06-30").get().to_dict()
+    assert latest["sma200"] is not None
+
+async def test_ticker_without_columnar_history_is_seeded_from_daily_documents(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that a ticker stored before the columnar history existed gets one
+    built from its daily documents on its next sync.
+    """
+    # ARRANGE
+    ticker = _ticker()
+    await MarketDataSyncService(async_db_client, FakeMarketDataClient(end="2025-06-26")).sync_tickers([ticker], as_of=date(2025, 6, 26))
+    parent_ref = db_client.collection("marketData").document(ticker)
+    for chunk in parent_ref.collection("history").stream():
+        chunk.reference.delete()
+    parent_ref.update({"historyRows": firestore.DELETE_FIELD, "historyChunks": firestore.DELETE_FIELD})
+
+    # ACT
+    result = await MarketDataSyncService(async_db_client, FakeMarketDataClient(end="2025-06-30")).sync_tickers([ticker], as_of=date(2025, 6, 30))
+
+    # ASSERT
+    assert result.written == {ticker: 2}
+    # 366 stored days, the last 98 of which are overlapped by the compact response, plus 2 new ones.
+    assert parent_ref.get().to_dict()["historyRows"] == 368
+
+async def test_steady_state_sync_requests_compact_and_writes_only_new_days(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that a small gap is filled from a compact request, that only the
+    missing days are written, and that current tickers are not requested at all.
+    """
+    # ARRANGE
+    behind, current = _ticker(), _ticker()
+    await MarketDataSyncService(async_db_client, FakeMarketDataClient(end="2025-06-26")).sync_tickers([behind, current], as_of=date(2025, 6, 26))
+    await MarketDataSyncService(async_db_client, FakeMarketDataClient(end="2025-06-30")).sync_tickers([current], as_of=date(2025, 6, 30))
+    before = _daily_ids(db_client, behind)
+
+    client = FakeMarketDataClient(end="2025-06-30")
+    service = MarketDataSyncService(async_db_client, market_data_client=client)
+
+    # ACT
+    result = await service.sync_tickers([behind, current], as_of=date(2025, 6, 30))
+
+    # ASSERT
+    assert client.requests == [(behind, "compact")]
+    assert result.up_to_date == [current]
+    assert result.written == {behind: 2}
+    assert result.recomputed == []
+    assert _daily_ids(db_client, behind) == before + ["2025-06-27", "2025-06-30"]
+    # The columnar history (400 rows from the first full request) grew by the same two days.
+    assert db_client.collection("marketData").document(behind).get().to_dict()["historyRows"] == 402
+    # Indicators still span 200 days thanks to the stored history.
+    latest = db_client.collection("marketData").document(behind).collection("daily").document("2025-06-30").get().to_dict()
+    assert latest["sma200"] is not None
+
+async def test_failed_ticker_is_reported_and_keeps_its_last_date(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    # ARRANGE
+    ticker = _ticker()
+    service = MarketDataSyncService(async_db_client, market_data_client=FakeMarketDataClient(end="2025-06-30", failing=(ticker,)))
+
+    # ACT
+    result = await service.sync_tickers([ticker], as_of=date(2025, 6, 30))
+
+    # ASSERT
+    assert list(result.failed) == [ticker]
+    assert not db_client.collection("marketData").document(ticker).get().exists
+
+async def test_streamed_indicators_match_a_full_recompute(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that indicators advanced from the stored state agree with those of
+    a run that recomputes them from the history.
+    """
+    # ARRANGE
+    streamed, recomputed = _ticker(), _ticker()
+    await MarketDataSyncService(async_db_client, FakeMarketDataClient(end="2025-06-26")).sync_tickers([streamed, recomputed], as_of=date(2025, 6, 26))
+    service = MarketDataSyncService(async_db_client, FakeMarketDataClient(end="2025-06-30"))
+
+    # ACT
+    streamed_result = await service.sync_tickers([streamed], as_of=date(2025, 6, 30))
+    recomputed_result = await service.sync_tickers([recomputed], as_of=date(2025, 6, 30), recompute=True)
+
+    # ASSERT
+    assert streamed_result.recomputed == [] and recomputed_result.recomputed == [recomputed]
+    documents = [
+        db_client.collection("marketData").document(ticker).collection("daily").document("2025-06-30").get().to_dict()
+        for ticker in (streamed, recomputed)
+    ]
+    for name in ("sma200", "vwma50", "rsi14", "atr14", "high52Weeks"):
+        assert documents[0][name] == pytest.approx(documents[1][name], rel=1e-6)
+    assert documents[0]["macd"]["signal"] == pytest.approx(documents[1]["macd"]["signal"], rel=1e-6)
+    parent = db_client.collection("marketData").document(streamed).get().to_dict()
+    assert parent["indicatorState"]["asOf"] == "2025-06-30"
+    assert parent["highState"]["asOf"] == "2025-06-30"
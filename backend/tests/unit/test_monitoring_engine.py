@@ -0,0 +1,99 @@
+from uuid import uuid4
+from datetime import date, datetime, timezone
+
+from src.core.internal_models import ConditionDB, HoldingDB, MarketDataDB, RuleSetDB
+from src.monitoring.compiler import compile_condition
+from src.monitoring.engine import RuleEngine, Subscription
+from src.monitoring.market import TickerMarket
+from src.monitoring.snapshots import Valuation
+from src.services.market_data_service.price_history import PriceHistory
+
+DAY = date(2025, 6, 30)
+
+# --- Fixtures ---
+
+def _market(ticker: str, close: float, **fields) -> TickerMarket:
+    row = MarketDataDB(date=datetime(2025, 6, 30, tzinfo=timezone.utc), ticker=ticker, open=close, high=close, low=close, close=close, volume=1000, **fields)
+    return TickerMarket(ticker, [row], PriceHistory.empty())
+
+def _holding(ticker: str) -> HoldingDB:
+    return HoldingDB(
+        holdingId=uuid4(), portfolioId=uuid4(), userId="user-1", ticker=ticker, securityType="STOCK", assetClass="EQUITY", currency="EUR",
+        lots=[{"lotId": uuid4(), "purchaseDate": datetime(2025, 1, 2, tzinfo=timezone.utc), "quantity": 1.0, "purchasePrice": 100.0}],
+    )
+
+def _rule_set(*rules) -> RuleSetDB:
+    return RuleSetDB(
+        ruleSetId=uuid4(), userId="user-1", parentId=uuid4(), parentType="PORTFOLIO",
+        rules=[
+            {"ruleId": uuid4(), "ruleType": "BUY", "logicalOperator": operator, "status": "ENABLED",
+             "conditions": [{"conditionId": uuid4(), "type": kind, "parameters": parameters} for kind, parameters in conditions]}
+            for operator, conditions in rules
+        ],
+    )
+
+RSI_BELOW_30 = ("RSI_LEVEL", {"period": 14, "operator": "below", "threshold": 30})
+
+# --- Unit Tests for RuleEngine ---
+
+def test_market_condition_is_evaluated_once_per_ticker():
+    """
+    Tests that an RSI condition shared by the rule sets of three holdings of
+    the same ticker is checked once, and every holding still gets its alert.
+    """
+    # ARRANGE
+    markets = {"AAPL": _market("AAPL", 150.0, rsi14=25.0)}
+    # The same condition written with an int and a float threshold.
+    float_threshold = ("RSI_LEVEL", {"period": 14, "operator": "below", "threshold": 30.0})
+    subscriptions = [
+        Subscription(_holding("AAPL"), _rule_set(("AND", [RSI_BELOW_30])), Valuation()),
+        Subscription(_holding("AAPL"), _rule_set(("AND", [RSI_BELOW_30])), Valuation()),
+        Subscription(_holding("AAPL"), _rule_set(("AND", [float_threshold])), Valuation()),
+    ]
+    engine = RuleEngine()
+
+    # ACT
+    alerts = engine.evaluate(markets, subscriptions, DAY)
+
+    # ASSERT
+    assert len(alerts) == 3
+    assert (engine.stats.evaluated, engine.stats.reused, engine.stats.per_holding) == (1, 2, 0)
+
+def test_position_conditions_are_evaluated_per_holding():
+    # ARRANGE
+    markets = {"AAPL": _market("AAPL", 150.0)}
+    rule_set = _rule_set(("AND", [("PROFIT_TARGET", {"percentage": 20})]))
+    winner = Subscription(_holding("AAPL"), rule_set, Valuation(totalCost=100.0, currentValue=150.0))
+    loser = Subscription(_holding("AAPL"), rule_set, Valuation(totalCost=200.0, currentValue=150.0))
+
+    engine = RuleEngine()
+
+    # ACT
+    alerts = engine.evaluate(markets, [winner, loser], DAY)
+
+    # ASSERT
+    assert [alert.holdingId for alert in alerts] == [winner.holding.holdingId]
+    assert (engine.stats.evaluated, engine.stats.per_holding) == (0, 2)
+
+def test_vix_condition_is_shared_across_tickers_and_tickers_without_data_are_skipped():
+    # ARRANGE
+    markets = {"AAPL": _market("AAPL", 150.0), "MSFT": _market("MSFT", 400.0)}
+    rule_set = _rule_set(("AND", [("VIX_LEVEL", {"operator": "above", "threshold": 30})]))
+    subscriptions = [Subscription(_holding(ticker), rule_set, Valuation()) for ticker in ("AAPL", "MSFT", "NODATA")]
+
+    engine = RuleEngine(vix=_market("VIXY", 35.0))
+
+    # ACT
+    alerts = engine.evaluate(markets, subscriptions, DAY)
+
+    # ASSERT
+    assert len(alerts) == 2
+    assert (engine.stats.evaluated, engine.stats.reused) == (1, 1)
+
+def test_condition_key_ignores_parameter_order_and_skips_position_conditions():
+    first = ConditionDB(conditionId=uuid4(), type="PRICE_VS_SMA", parameters={"period": 50, "operator": "cross_below"})
+    second = ConditionDB(conditionId=uuid4(), type="PRICE_VS_SMA", parameters={"operator": "cross_below", "period": 50.0})
+    stop_loss = ConditionDB(conditionId=uuid4(), type="STOP_LOSS", parameters={"percentage": 10})
+
+    assert compile_condition(first).key == compile_condition(second).key
+    assert compile_condition(stop_loss).key is None
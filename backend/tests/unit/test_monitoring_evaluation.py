@@ -0,0 +1,130 @@
+import pytest
+from uuid import uuid4
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pandas as pd
+
+from src.core.config_models import TaxConfig
+from src.core.internal_models import ConditionDB, HoldingDB, MarketDataDB, RuleDB
+from src.monitoring.evaluation import EvaluationContext, evaluate_condition, evaluate_rule
+from src.monitoring.market import TickerMarket, load_markets
+from src.monitoring.snapshots import Valuation
+from src.services.market_data_service.price_history import PriceHistory
+
+# --- Fixtures ---
+
+def _row(day: str, close: float, **fields) -> MarketDataDB:
+    return MarketDataDB(date=datetime.fromisoformat(day).replace(tzinfo=timezone.utc), ticker="TEST", open=close, high=close, low=close, close=close, volume=1000, **fields)
+
+def _history(highs: list, end: str = "2025-06-30") -> PriceHistory:
+    index = pd.bdate_range(end=end, periods=len(highs), tz="UTC")
+    return PriceHistory.from_frame(pd.DataFrame({"open": highs, "high": highs, "low": highs, "close": highs, "volume": [1000] * len(highs)}, index=index))
+
+def _lot(purchased: date, quantity: float = 1.0, price: float = 100.0) -> dict:
+    return {"lotId": uuid4(), "purchaseDate": datetime(purchased.year, purchased.month, purchased.day, tzinfo=timezone.utc), "quantity": quantity, "purchasePrice": price}
+
+def _context(rows: list, highs: list = None, valuation: Valuation = None, vix_close: float = None, lots: list = None) -> EvaluationContext:
+    holding = HoldingDB(
+        holdingId=uuid4(), portfolioId=uuid4(), userId="user-1", ticker="TEST", securityType="STOCK", assetClass="EQUITY", currency="EUR",
+        lots=lots or [_lot(date(2025, 6, 25))],
+    )
+    vix = TickerMarket("VIXY", [_row("2025-06-30", vix_close)], PriceHistory.empty()) if vix_close is not None else None
+    return EvaluationContext(holding, TickerMarket("TEST", rows, _history(highs or [rows[-1].close])), valuation or Valuation(), vix)
+
+def _condition(kind: str, **parameters) -> ConditionDB:
+    return ConditionDB(conditionId=uuid4(), type=kind, parameters=parameters)
+
+# --- Unit Tests for condition evaluation ---
+
+def test_price_crossing_below_sma_is_met_only_on_the_day_of_the_cross():
+    crossing = _context([_row("2025-06-27", 105.0, sma50=100.0), _row("2025-06-30", 95.0, sma50=100.0)])
+    already_below = _context([_row("2025-06-27", 96.0, sma50=100.0), _row("2025-06-30", 95.0, sma50=100.0)])
+    condition = _condition("PRICE_VS_SMA", period=50, operator="cross_below")
+
+    assert evaluate_condition(condition, crossing) == 95.0
+    assert evaluate_condition(condition, already_below) is None
+
+def test_macd_crossover_reports_the_histogram():
+    context = _context([
+        _row("2025-06-27", 100.0, macd={"value": -0.5, "signal": 0.0, "histogram": -0.5}),
+        _row("2025-06-30", 101.0, macd={"value": 0.4, "signal": 0.1, "histogram": 0.3}),
+    ])
+
+    assert evaluate_condition(_condition("MACD_CROSSOVER", operator="cross_above"), context) == pytest.approx(0.3)
+
+def test_highs_drive_drawdown_and_trailing_stop():
+    # Peak of 200 before the lot was bought, 150 after it; the latest close is 120.
+    context = _context([_row("2025-06-30", 120.0)], highs=[200.0] + [110.0] * 5 + [150.0, 130.0, 120.0])
+
+    assert evaluate_condition(_condition("DRAWDOWN_FROM_HIGH", percentage=30), context) == pytest.approx(40.0)
+    assert evaluate_condition(_condition("TRAILING_STOP_LOSS", percentage=15), context) == pytest.approx(20.0)
+    assert evaluate_condition(_condition("TRAILING_STOP_LOSS", percentage=25), context) is None
+
+def test_trailing_stop_measures_each_lot_from_its_own_purchase():
+    # Peak of 200 on 2025-06-19; the latest close is 120.
+    highs = [100.0, 200.0, 150.0, 150.0, 150.0, 150.0, 140.0, 130.0, 120.0]
+    before_peak, after_peak = _lot(date(2025, 6, 18)), _lot(date(2025, 6, 23))
+    both = _context([_row("2025-06-30", 120.0)], highs=highs, lots=[before_peak, after_peak])
+    only_after = _context([_row("2025-06-30", 120.0)], highs=highs, lots=[after_peak])
+
+    # 40% below the first lot's high and 20% below the second's, weighed by cost.
+    assert evaluate_condition(_condition("TRAILING_STOP_LOSS", percentage=25), both) == pytest.approx(30.0)
+    assert evaluate_condition(_condition("TRAILING_STOP_LOSS", percentage=35), both) is None
+    assert evaluate_condition(_condition("TRAILING_STOP_LOSS", percentage=25), only_after) is None
+
+async def test_markets_of_a_past_day_ignore_later_history():
+    """
+    Tests that a rerun for a past day measures highs only up to that day,
+    even though the stored history already holds later, higher prices.
+    """
+    # ARRANGE
+    day = date(2025, 6, 26)
+    history = _history([150.0, 120.0, 110.0, 105.0, 300.0, 400.0], end="2025-06-30")
+
+    async def load_latest(tickers, up_to, days):
+        return {"TEST": [_row("2025-06-26", 105.0)]}
+
+    async def load_many(tickers):
+        return {"TEST": history}
+    sync_service = SimpleNamespace(load_latest=load_latest, history_store=SimpleNamespace(load_many=load_many))
+
+    # ACT
+    market = (await load_markets(sync_service, ["TEST"], day))["TEST"]
+
+    # ASSERT
+    assert market.history.last_date() == day
+    assert market.highs.high_52_weeks() == 150.0
+    assert market.high_since(date(2025, 6, 25)) == 110.0
+
+def test_vix_and_position_conditions():
+    context = _context([_row("2025-06-30", 80.0)], valuation=Valuation(totalCost=100.0, currentValue=80.0), vix_close=32.0)
+
+    assert evaluate_condition(_condition("VIX_LEVEL", operator="above", threshold=30), context) == 32.0
+    assert evaluate_condition(_condition("STOP_LOSS", percentage=10), context) == pytest.approx(-20.0)
+    assert evaluate_condition(_condition("PROFIT_TARGET", percentage=10), context) is None
+
+def test_rule_combines_conditions_with_its_logical_operator():
+    context = _context([_row("2025-06-30", 100.0, rsi14=25.0)])
+    conditions = [
+        _condition("RSI_LEVEL", period=14, operator="below", threshold=30),
+        _condition("RSI_LEVEL", period=14, operator="above", threshold=70),
+    ]
+
+    def rule(operator: str, status: str = "ENABLED") -> RuleDB:
+        return RuleDB(ruleId=uuid4(), ruleType="BUY", logicalOperator=operator, conditions=conditions, status=status)
+
+    assert evaluate_rule(rule("AND"), context) is None
+    assert [triggered.actualValue for triggered in evaluate_rule(rule("OR"), context)] == [25.0]
+    assert evaluate_rule(rule("OR", status="PAUSED"), context) is None
+
+def test_tax_rate_applies_the_first_matching_rule():
+    tax_config = TaxConfig(**{
+        "EQUITY": [{"description": "Flat.", "taxRate": 26.375}],
+        "CRYPTO": [{"description": "Long-term.", "taxRate": 0, "condition": "holdingDurationDays > 365"}, {"description": "Short-term.", "taxRate": 26.375}],
+        "COMMODITY": [],
+    })
+
+    assert tax_config.tax_rate("CRYPTO", holding_duration_days=400) == 0
+    assert tax_config.tax_rate("CRYPTO", holding_duration_days=30) == 26.375
+    assert tax_config.tax_rate("COMMODITY", holding_duration_days=30) == 0.0
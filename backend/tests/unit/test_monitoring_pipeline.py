@@ -0,0 +1,317 @@
+import asyncio
+import pytest
+from uuid import uuid4
+from datetime import date, datetime, timezone
+from firebase_admin import firestore
+import pandas as pd
+from types import SimpleNamespace
+from google.rpc import code_pb2
+
+from src.core.chart_series import ChartSeries, ChartSeriesStore
+from src.core.config_models import TaxConfig
+from src.monitoring import pipeline as pipeline_module
+from src.monitoring.pipeline import MonitoringAbortedError, MonitoringPipeline
+from src.monitoring.snapshots import MAX_SNAPSHOT_WRITE_ATTEMPTS, SnapshotWriter, Valuation, portfolio_snapshot
+from src.services.market_data_service.alpha_vantage_service import MarketDataUnavailableError
+from src.services.market_data_service.market_data_sync_service import MarketDataSyncService
+
+DAY = date(2025, 6, 30)
+TAX_CONFIG = TaxConfig(**{
+    "EQUITY": [{"description": "Flat rate.", "taxRate": 25.0}],
+    "CRYPTO": [{"description": "Tax-free after a year.", "taxRate": 0, "condition": "holdingDurationDays > 365"}, {"description": "Flat rate.", "taxRate": 25.0}],
+    "COMMODITY": [{"description": "Flat rate.", "taxRate": 25.0}],
+})
+
+# --- Fixtures ---
+
+class FakeMarketDataClient:
+    """Serves a rising synthetic series (closes 100, 101, ... up to 2025-06-30) per ticker."""
+    def __init__(self, failing: dict = None, gates: dict = None):
+        self.failing = failing or {}
+        # ticker -> asyncio.Event the request waits for before it is answered.
+        self.gates = gates or {}
+
+    async def fetch_daily_series_many(self, tickers, outputsize="full"):
+        series, failures = {}, {}
+        for ticker in tickers:
+            if ticker in self.gates:
+                await asyncio.wait_for(self.gates[ticker].wait(), timeout=5)
+            if ticker in self.failing:
+                failures[ticker] = self.failing[ticker]
+                continue
+            index = pd.bdate_range(end=DAY, periods=400, tz="UTC")
+            closes = [100.0 + i for i in range(400)]
+            series[ticker] = pd.DataFrame(
+                {"open": closes, "high": closes, "low": [c - 1 for c in closes], "close": closes, "volume": [1000] * 400},
+                index=index,
+            )
+        return series, failures
+
+class ContendedBulkWriter:
+    """
+    Fails the writes of some documents a number of times before applying
+    them, calling the error callback the way a BulkWriter does and retrying
+    while it returns True.
+    """
+    def __init__(self, writer, failing: dict):
+        self.writer = writer
+        # document path -> attempts that fail
+        self.failing = failing
+        self.on_error = None
+
+    def on_write_result(self, callback):
+        self.writer.on_write_result(callback)
+
+    def on_write_error(self, callback):
+        self.on_error = callback
+
+    def set(self, ref, data):
+        attempts = 0
+        while attempts < self.failing.get(ref.path, 0):
+            attempts += 1
+            failure = SimpleNamespace(attempts=attempts, code=code_pb2.ABORTED, message="contention", operation=SimpleNamespace(reference=ref))
+            if not self.on_error(failure, self):
+                return
+        self.writer.set(ref, data)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+def _seed_portfolio(db_client: firestore.Client, tickers, rule_set_id: str = None) -> dict:
+    """Creates a portfolio with one holding (one lot of 10 at 200.0) per ticker."""
+    portfolio_id = str(uuid4())
+    db_client.collection("portfolios").document(portfolio_id).set({"portfolioId": portfolio_id, "userId": "user-1", "ruleSetId": rule_set_id})
+    holdings = {}
+    for ticker in tickers:
+        holding_id = str(uuid4())
+        db_client.collection("holdings").document(holding_id).set({
+            "holdingId": holding_id, "portfolioId": portfolio_id, "userId": "user-1", "ticker": ticker,
+            "securityType": "STOCK", "assetClass": "EQUITY", "currency": "EUR", "ruleSetId": None,
+            "lots": [{"lotId": str(uuid4()), "purchaseDate": datetime(2024, 1, 2, tzinfo=timezone.utc), "quantity": 10.0, "purchasePrice": 200.0}],
+        })
+        holdings[ticker] = holding_id
+    return {"portfolioId": portfolio_id, "holdings": holdings}
+
+def _seed_rule_set(db_client: firestore.Client, parent_id: str, conditions: list, rule_type: str = "SELL") -> str:
+    rule_set_id = str(uuid4())
+    db_client.collection("rulesets").document(rule_set_id).set({
+        "ruleSetId": rule_set_id, "userId": "user-1", "parentId": parent_id, "parentType": "PORTFOLIO",
+        "rules": [{
+            "ruleId": str(uuid4()), "ruleType": rule_type, "logicalOperator": "AND", "status": "ENABLED",
+            "conditions": [{"conditionId": str(uuid4()), **condition} for condition in conditions],
+        }],
+        "createdAt": datetime.now(timezone.utc), "modifiedAt": datetime.now(timezone.utc),
+    })
+    return rule_set_id
+
+def _pipeline(async_db_client, client: FakeMarketDataClient, **kwargs) -> MonitoringPipeline:
+    return MonitoringPipeline(
+        async_db_client,
+        sync_service=MarketDataSyncService(async_db_client, market_data_client=client),
+        tax_config=TAX_CONFIG,
+        system_tickers=kwargs.pop("system_tickers", []),
+        **kwargs,
+    )
+
+def _ticker() -> str:
+    return f"T{uuid4().hex[:8].upper()}"
+
+# --- Unit Tests for MonitoringPipeline ---
+
+async def test_run_writes_snapshots_and_alerts_and_times_every_stage(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that one run syncs every ticker, writes holding and portfolio
+    snapshots, raises the alert of a triggered rule and reports each stage.
+    """
+    # ARRANGE
+    first, second = _ticker(), _ticker()
+    portfolio = _seed_portfolio(db_client, [first, second])
+    # The series rises every day, so RSI is 100 and the latest close is 499.0.
+    rule_set_id = _seed_rule_set(db_client, portfolio["portfolioId"], [
+        {"type": "RSI_LEVEL", "parameters": {"period": 14, "operator": "above", "threshold": 70}},
+        {"type": "PROFIT_TARGET", "parameters": {"percentage": 50}},
+    ])
+    db_client.collection("portfolios").document(portfolio["portfolioId"]).update({"ruleSetId": rule_set_id})
+    # A portfolio whose last holding was removed still shows yesterday's value.
+    emptied = _seed_portfolio(db_client, [])["portfolioId"]
+    db_client.collection("portfolios").document(emptied).update({"valuation": {"costBasis": 100.0, "lastValuation": 120.0}})
+
+    # ACT
+    result = await _pipeline(async_db_client, FakeMarketDataClient(), batch_size=1).run(as_of=DAY)
+
+    # ASSERT
+    assert (result.tickers, result.holdings) == (2, 2)
+    assert (result.holding_snapshots, result.portfolio_snapshots, result.alerts) == (2, 1, 2)
+    assert all(timing.batches == 2 for timing in result.stages.values())
+    holding_snapshot = (
+        db_client.collection("holdings").document(portfolio["holdings"][first])
+        .collection("dailySnapshots").document("2025-06-30").get().to_dict()
+    )
+    assert holding_snapshot["currentValue"] == pytest.approx(4990.0)
+    assert holding_snapshot["afterTaxGainLoss"] == pytest.approx(2990.0 * 0.75)
+    portfolio_snapshot = (
+        db_client.collection("portfolios").document(portfolio["portfolioId"])
+        .collection("dailySnapshots").document("2025-06-30").get().to_dict()
+    )
+    assert portfolio_snapshot["totalCost"] == pytest.approx(4000.0)
+    valuation = db_client.collection("portfolios").document(portfolio["portfolioId"]).get().to_dict()["valuation"]
+    assert (valuation["costBasis"], valuation["lastValuation"]) == pytest.approx((4000.0, 9980.0))
+    assert valuation["lastPriceDate"].date() == DAY
+    emptied_valuation = db_client.collection("portfolios").document(emptied).get().to_dict()["valuation"]
+    assert (emptied_valuation["costBasis"], emptied_valuation["lastValuation"]) == (0.0, 0.0)
+    chart = ChartSeries.from_document(
+        db_client.collection("portfolios").document(portfolio["portfolioId"]).collection("chartSeries").document("series").get().to_dict()
+    )
+    assert [(day, point.currentValue) for day, point in chart.points("1m")] == [(DAY, pytest.approx(9980.0))]
+    alerts = [doc.to_dict() for doc in db_client.collection("alerts").stream()]
+    assert {alert["holdingId"] for alert in alerts} == set(portfolio["holdings"].values())
+    assert alerts[0]["taxInfo"]["appliedTaxRate"] == pytest.approx(25.0)
+
+async def test_failed_ticker_is_reported_and_its_portfolio_skipped(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests M_W_1051 and M_W_1052: the failed ticker is reported, its holding and
+    that holding's portfolio get no snapshot, and other portfolios are unaffected.
+    """
+    # ARRANGE
+    good, bad = _ticker(), _ticker()
+    mixed = _seed_portfolio(db_client, [good, bad])
+    healthy = _seed_portfolio(db_client, [good])
+    client = FakeMarketDataClient(failing={bad: RuntimeError("unknown ticker")})
+
+    # ACT
+    result = await _pipeline(async_db_client, client).run(as_of=DAY)
+
+    # ASSERT
+    assert list(result.failed_tickers) == [bad]
+    assert set(result.snapshot_failures) == {mixed["holdings"][bad], mixed["portfolioId"]}
+    assert result.portfolio_snapshots == 1
+    assert db_client.collection("portfolios").document(healthy["portfolioId"]).collection("dailySnapshots").document("2025-06-30").get().exists
+
+async def test_unavailable_provider_aborts_the_run(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    # ARRANGE
+    ticker = _ticker()
+    _seed_portfolio(db_client, [ticker])
+    client = FakeMarketDataClient(failing={ticker: MarketDataUnavailableError("rate limited")})
+
+    # ACT / ASSERT
+    with pytest.raises(MonitoringAbortedError):
+        await _pipeline(async_db_client, client).run(as_of=DAY)
+
+async def test_evaluation_starts_before_later_tickers_are_downloaded(async_db_client: firestore.AsyncClient, db_client: firestore.Client, monkeypatch):
+    """
+    Tests the pipelining: the download of the second batch is held until the
+    first batch's alerts have been written, which only completes if the
+    stages overlap.
+    """
+    # ARRANGE
+    first, second = sorted([_ticker(), _ticker()])
+    portfolio = _seed_portfolio(db_client, [first, second])
+    rule_set_id = _seed_rule_set(db_client, portfolio["portfolioId"], [{"type": "PROFIT_TARGET", "parameters": {"percentage": 50}}])
+    db_client.collection("portfolios").document(portfolio["portfolioId"]).update({"ruleSetId": rule_set_id})
+    first_batch_evaluated = asyncio.Event()
+    write_alerts = pipeline_module.write_alerts
+
+    async def write_and_signal(db, alerts):
+        await write_alerts(db, alerts)
+        first_batch_evaluated.set()
+
+    monkeypatch.setattr(pipeline_module, "write_alerts", write_and_signal)
+    client = FakeMarketDataClient(gates={second: first_batch_evaluated})
+
+    # ACT
+    result = await _pipeline(async_db_client, client, batch_size=1, queue_size=1).run(as_of=DAY)
+
+    # ASSERT
+    assert result.alerts == 2
+    assert result.stages["evaluation"].batches == 2
+
+async def test_snapshot_writer_retries_contended_writes_and_reports_items_that_still_fail(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that a contended snapshot write is retried, and that one failing on
+    every attempt is reported by item (M_W_1052) without holding back the others.
+    """
+    # ARRANGE
+    contended, failing, healthy = str(uuid4()), str(uuid4()), str(uuid4())
+    paths = {item_id: f"portfolios/{item_id}/dailySnapshots/2025-06-30" for item_id in (contended, failing)}
+    bulk_writer = async_db_client.bulk_writer
+    async_db_client.bulk_writer = lambda options=None: ContendedBulkWriter(
+        bulk_writer(options), {paths[contended]: MAX_SNAPSHOT_WRITE_ATTEMPTS - 1, paths[failing]: MAX_SNAPSHOT_WRITE_ATTEMPTS},
+    )
+    snapshot = portfolio_snapshot(Valuation(totalCost=100.0, currentValue=110.0), DAY)
+
+    # ACT
+    async with SnapshotWriter(async_db_client) as writer:
+        result = await writer.write("portfolios", [(item_id, snapshot) for item_id in (contended, failing, healthy)], DAY)
+
+    # ASSERT
+    assert result.written == 2
+    assert result.failures == {failing: "contention"}
+    assert result.elapsed_seconds > 0
+    snapshots = db_client.collection("portfolios").document(contended).collection("dailySnapshots")
+    assert snapshots.document("2025-06-30").get().to_dict()["currentValue"] == pytest.approx(110.0)
+    assert not db_client.collection("portfolios").document(failing).collection("dailySnapshots").document("2025-06-30").get().exists
+
+async def test_chart_series_of_a_deleted_item_is_not_recreated(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that a new series is created and a stored one updated, and that the
+    series of an item deleted since it was loaded fails instead of reappearing.
+    """
+    # ARRANGE
+    new, existing, deleted = str(uuid4()), str(uuid4()), str(uuid4())
+    for item_id in (existing, deleted):
+        db_client.collection("holdings").document(item_id).collection("chartSeries").document("series").set(ChartSeries().to_document())
+    series = await ChartSeriesStore(async_db_client).load_many("holdings", [new, existing, deleted])
+    db_client.collection("holdings").document(deleted).collection("chartSeries").document("series").delete()
+    for item_series in series.values():
+        item_series.add(DAY, Valuation(totalCost=100.0, currentValue=110.0))
+
+    # ACT
+    async with SnapshotWriter(async_db_client) as writer:
+        result = await writer.write_chart_series("holdings", series)
+
+    # ASSERT
+    assert (series[new].stored, series[existing].stored) == (False, True)
+    assert result.written == 2
+    assert list(result.failures) == [deleted]
+    for item_id in (new, existing):
+        stored = ChartSeries.from_document(db_client.collection("holdings").document(item_id).collection("chartSeries").document("series").get().to_dict())
+        assert stored.points("1m")[-1][1].currentValue == pytest.approx(110.0)
+    assert not db_client.collection("holdings").document(deleted).collection("chartSeries").document("series").get().exists
+
+async def test_write_to_a_deleted_item_fails_without_retrying(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that a NOT_FOUND update (a portfolio deleted during the run) is
+    reported on its first attempt instead of being retried with backoff.
+    """
+    # ARRANGE
+    existing, deleted = str(uuid4()), str(uuid4())
+    db_client.collection("portfolios").document(existing).set({"portfolioId": existing, "userId": "user-1"})
+    failure_codes = []
+    bulk_writer = async_db_client.bulk_writer
+
+    def recording_bulk_writer(options=None):
+        writer = bulk_writer(options)
+        on_write_error = writer.on_write_error
+
+        def record(callback):
+            def on_error(failure, bulk_writer):
+                failure_codes.append(failure.code)
+                return callback(failure, bulk_writer)
+            on_write_error(on_error)
+        writer.on_write_error = record
+        return writer
+    async_db_client.bulk_writer = recording_bulk_writer
+    valuation = Valuation(totalCost=100.0, currentValue=110.0)
+
+    # ACT
+    async with SnapshotWriter(async_db_client) as writer:
+        result = await writer.refresh_portfolio_valuations({existing: valuation, deleted: valuation}, DAY)
+
+    # ASSERT
+    assert result.written == 1
+    assert list(result.failures) == [deleted]
+    assert failure_codes == [code_pb2.NOT_FOUND]
+    assert not db_client.collection("portfolios").document(deleted).get().exists
@@ -0,0 +1,116 @@
+import pytest
+from uuid import uuid4
+from datetime import datetime, timezone
+from firebase_admin import firestore
+
+from src.services import portfolio_deletion_service
+from src.services.portfolio_deletion_service import PortfolioDeletionService
+from src.core.internal_models import DeletionJobStatus
+
+# --- Fixtures ---
+
+@pytest.fixture(scope="function")
+def deletion_service(async_db_client: firestore.AsyncClient) -> PortfolioDeletionService:
+    """Provides an instance of the PortfolioDeletionService for use in tests."""
+    return PortfolioDeletionService(async_db_client)
+
+@pytest.fixture(scope="function")
+def seeded_portfolio(db_client: firestore.Client) -> dict:
+    """
+    Seeds a portfolio that is the user's default, a second portfolio, two
+    holdings with snapshots and chart series, and rulesets on the portfolio and a holding.
+    """
+    now = datetime.now(timezone.utc)
+    user_id = f"deletion-test-user-{uuid4()}"
+    portfolio_id, other_portfolio_id = str(uuid4()), str(uuid4())
+    for pid, name in ((portfolio_id, "Doomed"), (other_portfolio_id, "Survivor")):
+        db_client.collection("portfolios").document(pid).set({
+            "portfolioId": pid, "userId": user_id, "name": name, "defaultCurrency": "EUR",
+            "cashReserve": {"totalAmount": 0.0, "warChestAmount": 0.0}, "createdAt": now, "modifiedAt": now,
+        })
+    db_client.collection("users").document(user_id).set({
+        "uid": user_id, "email": f"{user_id}@example.com", "username": "Deletion Test User",
+        "defaultPortfolioId": portfolio_id,
+    })
+
+    holding_ids = [str(uuid4()), str(uuid4())]
+    for holding_id in holding_ids:
+        holding_ref = db_client.collection("holdings").document(holding_id)
+        holding_ref.set({"holdingId": holding_id, "portfolioId": portfolio_id, "userId": user_id})
+        for day in range(1, 4):
+            holding_ref.collection("dailySnapshots").document(f"2024-01-0{day}").set({"currentValue": day})
+        holding_ref.collection("chartSeries").document("series").set({"version": 1})
+    for day in range(1, 3):
+        db_client.collection("portfolios").document(portfolio_id).collection("dailySnapshots").document(f"2024-01-0{day}").set({"currentValue": day})
+    db_client.collection("portfolios").document(portfolio_id).collection("chartSeries").document("series").set({"version": 1})
+    for parent_id in (portfolio_id, holding_ids[0]):
+        ruleset_id = str(uuid4())
+        db_client.collection("rulesets").document(ruleset_id).set({"ruleSetId": ruleset_id, "parentId": parent_id, "userId": user_id})
+
+    # A holding of another portfolio must survive.
+    db_client.collection("holdings").document(str(uuid4())).set({"portfolioId": other_portfolio_id, "userId": user_id})
+
+    return {"user_id": user_id, "portfolio_id": portfolio_id, "other_portfolio_id": other_portfolio_id, "holding_ids": holding_ids}
+
+def _count(db_client: firestore.Client, collection: str) -> int:
+    return len(list(db_client.collection(collection).stream()))
+
+# --- Unit Tests for PortfolioDeletionService ---
+
+async def test_delete_portfolio_document_reassigns_default(deletion_service: PortfolioDeletionService, seeded_portfolio: dict, db_client: firestore.Client):
+    """
+    Tests that phase 1 deletes the portfolio, reassigns the default and opens a RUNNING job in one step.
+    """
+    # ACT
+    deleted = await deletion_service.delete_portfolio_document(seeded_portfolio["user_id"], seeded_portfolio["portfolio_id"])
+
+    # ASSERT
+    assert deleted is True
+    assert not db_client.collection("portfolios").document(seeded_portfolio["portfolio_id"]).get().exists
+    user = db_client.collection("users").document(seeded_portfolio["user_id"]).get().to_dict()
+    assert user["defaultPortfolioId"] == seeded_portfolio["other_portfolio_id"]
+    progress = await deletion_service.get_progress(seeded_portfolio["portfolio_id"])
+    assert progress.status == DeletionJobStatus.RUNNING
+
+async def test_delete_dependents_removes_the_whole_cascade(deletion_service: PortfolioDeletionService, seeded_portfolio: dict, db_client: firestore.Client):
+    """
+    Tests that holdings, their snapshots and chart series, rulesets and the portfolio's
+    snapshots and chart series are all deleted and counted.
+    """
+    # ARRANGE
+    await deletion_service.delete_portfolio_document(seeded_portfolio["user_id"], seeded_portfolio["portfolio_id"])
+
+    # ACT
+    progress = await deletion_service.delete_dependents(seeded_portfolio["portfolio_id"])
+
+    # ASSERT
+    assert progress.status == DeletionJobStatus.COMPLETED
+    assert progress.deletedCounts == {
+        "holdings": 2, "holdingSnapshots": 6, "holdingChartSeries": 2, "ruleSets": 2, "portfolioSnapshots": 2, "portfolioChartSeries": 1,
+    }
+    assert progress.failedCount == 0
+    assert _count(db_client, "holdings") == 1
+    assert _count(db_client, "rulesets") == 0
+    for holding_id in seeded_portfolio["holding_ids"]:
+        for subcollection in ("dailySnapshots", "chartSeries"):
+            assert not list(db_client.collection("holdings").document(holding_id).collection(subcollection).stream())
+    for subcollection in ("dailySnapshots", "chartSeries"):
+        assert not list(db_client.collection("portfolios").document(seeded_portfolio["portfolio_id"]).collection(subcollection).stream())
+
+async def test_delete_dependents_can_stop_and_resume(deletion_service: PortfolioDeletionService, seeded_portfolio: dict, monkeypatch):
+    """
+    Tests that a budgeted run leaves the job RUNNING and a later run finishes it.
+    """
+    # ARRANGE
+    monkeypatch.setattr(portfolio_deletion_service, "DELETION_PAGE_SIZE", 2)
+    await deletion_service.delete_portfolio_document(seeded_portfolio["user_id"], seeded_portfolio["portfolio_id"])
+
+    # ACT
+    partial = await deletion_service.delete_dependents(seeded_portfolio["portfolio_id"], max_deletes=3)
+    final = await deletion_service.delete_dependents(seeded_portfolio["portfolio_id"])
+
+    # ASSERT
+    assert partial.status == DeletionJobStatus.RUNNING
+    assert 0 < sum(partial.deletedCounts.values()) < 15
+    assert final.status == DeletionJobStatus.COMPLETED
+    assert sum(final.deletedCounts.values()) == 15
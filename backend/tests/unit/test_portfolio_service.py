@@ -7,18 +7,19 @@ from firebase_admin import firestore
 from src.services.user_service import UserService
 from src.services.portfolio_service import PortfolioService
 from src.core.internal_models import PortfolioDB, CashReserveDB
+from src.core import model_mappers
 
 # --- Fixtures for Service-Level Testing ---
 
-@pytest.fixture(scope="module")
-def portfolio_service(db_client: firestore.Client) -> PortfolioService:
+@pytest.fixture(scope="function")
+def portfolio_service(async_db_client: firestore.AsyncClient) -> PortfolioService:
     """Provides an instance of the PortfolioService for use in tests."""
-    return PortfolioService(db_client)
+    return PortfolioService(async_db_client)
 
-@pytest.fixture(scope="module")
-def user_service(db_client: firestore.Client, portfolio_service: PortfolioService) -> UserService:
+@pytest.fixture(scope="function")
+def user_service(async_db_client: firestore.AsyncClient, portfolio_service: PortfolioService) -> UserService:
     """Provides an instance of the UserService for testing."""
-    return UserService(db_client, portfolio_service)
+    return UserService(async_db_client, portfolio_service)
 
 @pytest.fixture(scope="function")
 def test_user(db_client: firestore.Client) -> dict:
@@ -34,7 +35,7 @@ def test_user(db_client: firestore.Client) -> dict:
     yield user_data
 
 @pytest.fixture(scope="function")
-def created_portfolio(portfolio_service: PortfolioService, test_user: dict) -> PortfolioDB:
+async def created_portfolio(portfolio_service: PortfolioService, test_user: dict) -> PortfolioDB:
     """Creates a portfolio using the service and yields the resulting PortfolioDB object."""
     user_id = test_user["uid"]
     portfolio_data = {
@@ -43,12 +44,12 @@ def created_portfolio(portfolio_service: PortfolioService, test_user: dict) -> P
         "defaultCurrency": "USD",
         "cashReserve": {"totalAmount": 1000.0, "warChestAmount": 200.0}
     }
-    new_portfolio = portfolio_service.create_portfolio(user_id, portfolio_data)
+    new_portfolio = await portfolio_service.create_portfolio(user_id, portfolio_data)
     yield new_portfolio
 
 # --- Unit Tests for PortfolioService ---
 
-def test_create_portfolio_success(portfolio_service: PortfolioService, test_user: dict):
+async def test_create_portfolio_success(portfolio_service: PortfolioService, test_user: dict):
     """
     Tests that a portfolio can be successfully created.
     """
@@ -62,7 +63,7 @@ def test_create_portfolio_success(portfolio_service: PortfolioService, test_user
     }
 
     # ACT
-    new_portfolio = portfolio_service.create_portfolio(user_id, portfolio_data)
+    new_portfolio = await portfolio_service.create_portfolio(user_id, portfolio_data)
 
     # ASSERT
     assert new_portfolio is not None
@@ -71,7 +72,7 @@ def test_create_portfolio_success(portfolio_service: PortfolioService, test_user
     assert new_portfolio.name == "My New Portfolio"
     assert new_portfolio.cashReserve.totalAmount == 5000
 
-def test_get_portfolio_by_id_success(portfolio_service: PortfolioService, created_portfolio: PortfolioDB):
+async def test_get_portfolio_by_id_success(portfolio_service: PortfolioService, created_portfolio: PortfolioDB):
     """
     Tests retrieving a portfolio by its ID.
     """
@@ -79,14 +80,14 @@ def test_get_portfolio_by_id_success(portfolio_service: PortfolioService, create
     portfolio_id = created_portfolio.portfolioId
 
     # ACT
-    retrieved_portfolio = portfolio_service.get_portfolio_by_id(portfolio_id)
+    retrieved_portfolio = await portfolio_service.get_portfolio_by_id(portfolio_id)
 
     # ASSERT
     assert retrieved_portfolio is not None
     assert retrieved_portfolio.portfolioId == portfolio_id
     assert retrieved_portfolio.name == created_portfolio.name
 
-def test_get_portfolio_by_name_success(portfolio_service: PortfolioService, created_portfolio: PortfolioDB):
+async def test_get_portfolio_by_name_success(portfolio_service: PortfolioService, created_portfolio: PortfolioDB):
     """
     Tests retrieving a portfolio by its name for a specific user.
     """
@@ -95,31 +96,75 @@ def test_get_portfolio_by_name_success(portfolio_service: PortfolioService, crea
     portfolio_name = created_portfolio.name
 
     # ACT
-    retrieved_portfolio = portfolio_service.get_portfolio_by_name(user_id, portfolio_name)
+    retrieved_portfolio = await portfolio_service.get_portfolio_by_name(user_id, portfolio_name)
 
     # ASSERT
     assert retrieved_portfolio is not None
     assert retrieved_portfolio.userId == user_id
     assert retrieved_portfolio.name == portfolio_name
 
-def test_get_portfolios_by_user(portfolio_service: PortfolioService, test_user: dict):
+async def test_get_portfolios_by_user(portfolio_service: PortfolioService, test_user: dict):
     """
     Tests retrieving all portfolios for a user.
     """
     # ARRANGE
     user_id = test_user["uid"]
-    portfolio_service.create_portfolio(user_id, {"name": "Portfolio 1", "defaultCurrency": "USD", "cashReserve": {"totalAmount": 100, "warChestAmount": 10}})
-    portfolio_service.create_portfolio(user_id, {"name": "Portfolio 2", "defaultCurrency": "EUR", "cashReserve": {"totalAmount": 200, "warChestAmount": 20}})
+    await portfolio_service.create_portfolio(user_id, {"name": "Portfolio 1", "defaultCurrency": "USD", "cashReserve": {"totalAmount": 100, "warChestAmount": 10}})
+    await portfolio_service.create_portfolio(user_id, {"name": "Portfolio 2", "defaultCurrency": "EUR", "cashReserve": {"totalAmount": 200, "warChestAmount": 20}})
 
     # ACT
-    portfolios = portfolio_service.get_portfolios_by_user(user_id)
+    portfolios = await portfolio_service.get_portfolios_by_user(user_id)
 
     # ASSERT
     assert len(portfolios) == 2
     assert all(isinstance(p, PortfolioDB) for p in portfolios)
     assert {p.name for p in portfolios} == {"Portfolio 1", "Portfolio 2"}
 
-def test_update_portfolio_success(portfolio_service: PortfolioService, created_portfolio: PortfolioDB):
+async def test_list_portfolio_summaries_pages_by_name(portfolio_service: PortfolioService, test_user: dict):
+    """
+    Tests that the summary list is ordered by name, paged with a token, and projected to summary fields.
+    """
+    # ARRANGE
+    user_id = test_user["uid"]
+    for name in ("Charlie", "Alpha", "Bravo"):
+        await portfolio_service.create_portfolio(user_id, {"name": name, "defaultCurrency": "EUR", "cashReserve": {"totalAmount": 10.0, "warChestAmount": 1.0}})
+
+    # ACT
+    first_page, token = await portfolio_service.list_portfolio_summaries(user_id, page_size=2)
+    second_page, last_token = await portfolio_service.list_portfolio_summaries(user_id, page_size=2, page_token=token)
+
+    # ASSERT
+    assert [p.name for p in first_page] == ["Alpha", "Bravo"]
+    assert [p.name for p in second_page] == ["Charlie"]
+    assert token is not None
+    assert last_token is None
+    assert second_page[0].cashReserveTotal == 10.0
+
+async def test_lot_changes_adjust_the_valuation_read_by_the_summary_list(portfolio_service: PortfolioService, created_portfolio: PortfolioDB):
+    """
+    Tests that lot writes move the stored valuation incrementally and that the
+    summary list returns it with the fields it already reads.
+    """
+    # ARRANGE
+    portfolio_id = created_portfolio.portfolioId
+
+    # ACT
+    await portfolio_service.record_lot_change(portfolio_id, cost_delta=1000.0, value_delta=1200.0)
+    await portfolio_service.record_lot_change(portfolio_id, cost_delta=-250.0, value_delta=-300.0)
+    summaries, _ = await portfolio_service.list_portfolio_summaries(created_portfolio.userId, page_size=10)
+
+    # ASSERT
+    assert (summaries[0].valuation.costBasis, summaries[0].valuation.lastValuation) == (750.0, 900.0)
+    assert model_mappers.portfolio_summary_db_to_portfolio_summary(summaries[0]).currentValue == 900.0
+
+async def test_list_portfolio_summaries_rejects_invalid_token(portfolio_service: PortfolioService, test_user: dict):
+    """
+    Tests that a malformed page token is rejected.
+    """
+    with pytest.raises(ValueError):
+        await portfolio_service.list_portfolio_summaries(test_user["uid"], page_size=2, page_token="not-a-token")
+
+async def test_update_portfolio_success(portfolio_service: PortfolioService, created_portfolio: PortfolioDB):
     """
     Tests updating a portfolio's details.
     """
@@ -131,7 +176,7 @@ def test_update_portfolio_success(portfolio_service: PortfolioService, created_p
     }
 
     # ACT
-    updated_portfolio = portfolio_service.update_portfolio(portfolio_id, update_data)
+    updated_portfolio = await portfolio_service.update_portfolio(portfolio_id, update_data)
 
     # ASSERT
     assert updated_portfolio is not None
@@ -140,7 +185,24 @@ def test_update_portfolio_success(portfolio_service: PortfolioService, created_p
     assert updated_portfolio.description == "Updated Description"
     assert updated_portfolio.modifiedAt > created_portfolio.modifiedAt
 
-def test_delete_portfolio_success(portfolio_service: PortfolioService, user_service: UserService, created_portfolio: PortfolioDB):
+async def test_update_portfolio_merges_locally(portfolio_service: PortfolioService, created_portfolio: PortfolioDB, db_client: firestore.Client):
+    """
+    Tests that an update given the current document returns the merged result, matching what Firestore stored.
+    """
+    # ARRANGE
+    portfolio_id = created_portfolio.portfolioId
+    update_data = {"cashReserve": {"totalAmount": 500.0, "warChestAmount": 50.0}}
+
+    # ACT
+    updated_portfolio = await portfolio_service.update_portfolio(portfolio_id, update_data, current_portfolio=created_portfolio)
+
+    # ASSERT
+    stored = PortfolioDB(**db_client.collection("portfolios").document(str(portfolio_id)).get().to_dict())
+    assert updated_portfolio == stored
+    assert updated_portfolio.name == created_portfolio.name
+    assert updated_portfolio.cashReserve.totalAmount == 500.0
+
+async def test_delete_portfolio_success(portfolio_service: PortfolioService, user_service: UserService, created_portfolio: PortfolioDB):
     """
     Tests that a portfolio is successfully deleted.
     """
@@ -149,13 +211,13 @@ def test_delete_portfolio_success(portfolio_service: PortfolioService, user_serv
     portfolio_id = created_portfolio.portfolioId
 
     # ACT
-    portfolio_service.delete_portfolio(user_id, portfolio_id, user_service)
+    await portfolio_service.delete_portfolio(user_id, portfolio_id, user_service)
 
     # ASSERT
-    deleted_portfolio = portfolio_service.get_portfolio_by_id(portfolio_id)
+    deleted_portfolio = await portfolio_service.get_portfolio_by_id(portfolio_id)
     assert deleted_portfolio is None
 
-def test_delete_portfolio_reassigns_default(portfolio_service: PortfolioService, user_service: UserService, db_client: firestore.Client, test_user: dict):
+async def test_delete_portfolio_reassigns_default(portfolio_service: PortfolioService, user_service: UserService, db_client: firestore.Client, test_user: dict):
     """
     Tests that deleting a default portfolio reassigns the default to another one.
     """
@@ -165,25 +227,25 @@ def test_delete_portfolio_reassigns_default(portfolio_service: PortfolioService,
     # 1. Create two portfolios
     p1_data = {"name": "Portfolio One", "defaultCurrency": "USD", "cashReserve": {"totalAmount": 100, "warChestAmount": 10}}
     p2_data = {"name": "Portfolio Two", "defaultCurrency": "EUR", "cashReserve": {"totalAmount": 200, "warChestAmount": 20}}
-    portfolio1 = portfolio_service.create_portfolio(user_id, p1_data)
-    portfolio2 = portfolio_service.create_portfolio(user_id, p2_data)
+    portfolio1 = await portfolio_service.create_portfolio(user_id, p1_data)
+    portfolio2 = await portfolio_service.create_portfolio(user_id, p2_data)
 
     # 2. Set portfolio1 as the default
-    user_service.update_user_settings(user_id, {"defaultPortfolioId": portfolio1.portfolioId})
-    user_before = user_service.get_user_by_uid(user_id)
+    await user_service.update_user_settings(user_id, {"defaultPortfolioId": portfolio1.portfolioId})
+    user_before = await user_service.get_user_by_uid(user_id)
     assert user_before.defaultPortfolioId == portfolio1.portfolioId
 
     # ACT: Delete the default portfolio
-    portfolio_service.delete_portfolio(user_id, portfolio1.portfolioId, user_service)
+    await portfolio_service.delete_portfolio(user_id, portfolio1.portfolioId, user_service)
 
     # ASSERT
     # 1. Check that portfolio1 is gone
-    assert portfolio_service.get_portfolio_by_id(portfolio1.portfolioId) is None
+    assert await portfolio_service.get_portfolio_by_id(portfolio1.portfolioId) is None
     # 2. Check that the user's default has been updated to portfolio2
-    user_after = user_service.get_user_by_uid(user_id)
+    user_after = await user_service.get_user_by_uid(user_id)
     assert user_after.defaultPortfolioId == portfolio2.portfolioId
 
-def test_delete_portfolio_sets_default_to_none(portfolio_service: PortfolioService, user_service: UserService, created_portfolio: PortfolioDB):
+async def test_delete_portfolio_sets_default_to_none(portfolio_service: PortfolioService, user_service: UserService, created_portfolio: PortfolioDB):
     """
     Tests that deleting the only portfolio (which is the default) sets the user's default to None.
     """
@@ -192,13 +254,13 @@ def test_delete_portfolio_sets_default_to_none(portfolio_service: PortfolioServi
     portfolio_id = created_portfolio.portfolioId
 
     # 1. Set the created portfolio as the default
-    user_service.update_user_settings(user_id, {"defaultPortfolioId": portfolio_id})
-    user_before = user_service.get_user_by_uid(user_id)
+    await user_service.update_user_settings(user_id, {"defaultPortfolioId": portfolio_id})
+    user_before = await user_service.get_user_by_uid(user_id)
     assert user_before.defaultPortfolioId == portfolio_id
 
     # ACT: Delete the only portfolio
-    portfolio_service.delete_portfolio(user_id, portfolio_id, user_service)
+    await portfolio_service.delete_portfolio(user_id, portfolio_id, user_service)
 
     # ASSERT
-    user_after = user_service.get_user_by_uid(user_id)
+    user_after = await user_service.get_user_by_uid(user_id)
     assert user_after.defaultPortfolioId is None
\ No newline at end of file
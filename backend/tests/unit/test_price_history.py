@@ -0,0 +1,80 @@
+import pytest
+from uuid import uuid4
+from datetime import date
+from firebase_admin import firestore
+import numpy as np
+import pandas as pd
+
+from src.core.unit_of_work import unit_of_work
+from src.services.market_data_service import price_history
+from src.services.market_data_service.price_history import PriceHistory, PriceHistoryStore
+
+# --- Fixtures ---
+
+def _frame(end: str, periods: int, start_price: float = 100.0) -> pd.DataFrame:
+    index = pd.bdate_range(end=end, periods=periods, tz="UTC")
+    closes = np.arange(periods, dtype=float) + start_price
+    return pd.DataFrame({"open": closes, "high": closes + 1, "low": closes - 1, "close": closes, "volume": np.full(periods, 1000)}, index=index)
+
+# --- Unit Tests for PriceHistory ---
+
+def test_chunks_round_trip_without_copying():
+    """
+    Tests that a single decoded chunk is a read-only view of the stored bytes.
+    """
+    # ARRANGE
+    history = PriceHistory.from_frame(_frame("2025-06-30", 10))
+    [(index, document)] = history.encode_chunks()
+
+    # ACT
+    decoded = PriceHistory.decode_chunks([document])
+
+    # ASSERT
+    assert index == 0 and document["rows"] == 10
+    assert decoded.last_date() == date(2025, 6, 30)
+    np.testing.assert_array_equal(decoded["close"], history["close"])
+    assert not decoded["close"].flags.writeable
+    assert not decoded["close"].flags.owndata
+    pd.testing.assert_frame_equal(decoded.to_frame(), _frame("2025-06-30", 10), check_freq=False)
+
+def test_append_keeps_only_newer_rows():
+    history = PriceHistory.from_frame(_frame("2025-06-26", 5))
+
+    extended = history.append(_frame("2025-06-30", 5))
+
+    assert len(extended) == 7
+    assert extended.last_date() == date(2025, 6, 30)
+    assert history.append(_frame("2025-06-26", 3)) is history
+
+def test_appends_rewrite_only_the_last_chunk(monkeypatch):
+    monkeypatch.setattr(price_history, "HISTORY_CHUNK_ROWS", 4)
+    history = PriceHistory.from_frame(_frame("2025-06-30", 10))
+
+    assert [index for index, _ in history.encode_chunks()] == [0, 1, 2]
+    # 9 rows were stored before: only chunk 2 (rows 8-9) changes.
+    assert [index for index, _ in history.encode_chunks(first_chunk=9 // 4)] == [2]
+    decoded = PriceHistory.decode_chunks(document for _, document in history.encode_chunks())
+    np.testing.assert_array_equal(decoded["date"], history["date"])
+
+# --- Unit Tests for PriceHistoryStore ---
+
+async def test_store_loads_many_tickers(async_db_client: firestore.AsyncClient):
+    """
+    Tests that staged histories are read back for several tickers at once.
+    """
+    # ARRANGE
+    store = PriceHistoryStore(async_db_client)
+    tickers = [f"H{uuid4().hex[:8].upper()}" for _ in range(2)]
+    async with unit_of_work(async_db_client) as uow:
+        for offset, ticker in enumerate(tickers):
+            history = PriceHistory.from_frame(_frame("2025-06-30", 20, start_price=100.0 * (offset + 1)))
+            fields = store.stage_write(uow, ticker, history)
+            uow.set(async_db_client.collection("marketData").document(ticker), {"ticker": ticker, **fields})
+
+    # ACT
+    loaded = await store.load_many(tickers + ["UNKNOWN"])
+
+    # ASSERT
+    assert [len(loaded[ticker]) for ticker in tickers] == [20, 20]
+    assert loaded[tickers[1]]["close"][0] == pytest.approx(200.0)
+    assert len(loaded["UNKNOWN"]) == 0
@@ -0,0 +1,85 @@
+import json
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from firebase_admin import firestore
+
+from src.core.query_catalog import QUERY_CATALOG, QuerySpec, firestore_indexes_document
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+INDEXES_PATH = BACKEND_DIR.parent / "firestore.indexes.json"
+
+def _sample_values(spec: QuerySpec) -> dict:
+    values = {field: "sample" for field in spec.equality}
+    values.update({field: ["sample"] for field in spec.membership})
+    if spec.range_field is not None:
+        values[spec.range_field] = [(">=", datetime(2024, 1, 1, tzinfo=timezone.utc))]
+    return values
+
+# --- Static checks ---
+
+def test_indexes_file_matches_query_catalog():
+    """
+    Tests that firestore.indexes.json is up to date. Regenerate it with
+    `task generate-firestore-indexes` after changing the query catalog.
+    """
+    with open(INDEXES_PATH, encoding="utf-8") as f:
+        deployed = json.load(f)
+
+    assert deployed == firestore_indexes_document()
+
+def test_every_catalogued_query_is_indexed():
+    """
+    Tests that each query either runs on single-field indexes or has its composite index deployed.
+    """
+    with open(INDEXES_PATH, encoding="utf-8") as f:
+        deployed_indexes = json.load(f)["indexes"]
+
+    missing = [spec.name for spec in QUERY_CATALOG if spec.required_index() not in (None, *deployed_indexes)]
+
+    assert missing == []
+
+def test_services_only_issue_catalogued_queries():
+    """
+    Tests that no service filters or orders a query by hand, so every query is covered by the catalog.
+    """
+    uncatalogued = []
+    for path in sorted((BACKEND_DIR / "src" / "services").rglob("*.py")):
+        source = path.read_text(encoding="utf-8")
+        # NumPy's np.where is not a query.
+        for match in re.finditer(r"(?<!\bnp)\.where\(|\.order_by\((?!DOCUMENT_ID_FIELD)", source):
+            line = source.count("\n", 0, match.start()) + 1
+            uncatalogued.append(f"{path.relative_to(BACKEND_DIR)}:{line}")
+
+    assert uncatalogued == []
+
+def test_composite_index_puts_equality_fields_before_the_order_field():
+    """
+    Tests the field order of a derived composite index.
+    """
+    spec = QuerySpec("example", "alerts", equality=("userId",), range_field="triggeredAt", order_by=(("triggeredAt", "DESCENDING"),))
+
+    assert spec.index_fields() == [("userId", "ASCENDING"), ("triggeredAt", "DESCENDING")]
+    assert QuerySpec("single", "portfolios", equality=("userId",)).required_index() is None
+
+# --- Emulator check ---
+
+@pytest.mark.parametrize("spec", QUERY_CATALOG, ids=lambda spec: spec.name)
+async def test_catalogued_query_runs(spec: QuerySpec, async_db_client: firestore.AsyncClient):
+    """
+    Tests that every catalogued query is accepted by Firestore. Subcollection
+    specs run under a sample parent document.
+    """
+    # ARRANGE
+    if spec.subcollection:
+        source = async_db_client.collection("parents").document("sample").collection(spec.collection)
+    else:
+        source = async_db_client.collection(spec.collection)
+
+    # ACT
+    results = [doc async for doc in spec.build(source, **_sample_values(spec)).stream()]
+
+    # ASSERT
+    assert results == []
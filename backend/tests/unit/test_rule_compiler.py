@@ -0,0 +1,94 @@
+from uuid import uuid4
+from datetime import datetime, timedelta, timezone
+
+from src.core.internal_models import ConditionDB, HoldingDB, MarketDataDB, RuleDB, RuleSetDB
+from src.monitoring.compiler import EvaluationContext, clear_compiled_rule_sets, compile_condition, compile_rule, compile_rule_set
+from src.monitoring.market import COLUMN_INDEX, TickerMarket
+from src.monitoring.snapshots import Valuation
+from src.services.market_data_service.price_history import PriceHistory
+
+# --- Fixtures ---
+
+def _context(**fields) -> EvaluationContext:
+    row = MarketDataDB(date=datetime(2025, 6, 30, tzinfo=timezone.utc), ticker="TEST", open=100.0, high=100.0, low=100.0, close=100.0, volume=1000, **fields)
+    holding = HoldingDB(
+        holdingId=uuid4(), portfolioId=uuid4(), userId="user-1", ticker="TEST", securityType="STOCK", assetClass="EQUITY", currency="EUR",
+        lots=[{"lotId": uuid4(), "purchaseDate": datetime(2025, 1, 2, tzinfo=timezone.utc), "quantity": 1.0, "purchasePrice": 100.0}],
+    )
+    return EvaluationContext(holding, TickerMarket("TEST", [row], PriceHistory.empty()), Valuation())
+
+def _condition(kind: str, **parameters) -> ConditionDB:
+    return ConditionDB(conditionId=uuid4(), type=kind, parameters=parameters)
+
+def _rule(operator: str, *conditions: ConditionDB) -> RuleDB:
+    return RuleDB(ruleId=uuid4(), ruleType="BUY", logicalOperator=operator, conditions=list(conditions), status="ENABLED")
+
+RSI_BELOW_30 = _condition("RSI_LEVEL", period=14, operator="below", threshold=30)
+
+# --- Unit Tests for the rule compiler ---
+
+def test_market_values_hold_indicators_by_column_index():
+    context = _context(rsi14=25.0, sma50=98.5, macd={"value": 0.4, "signal": 0.1, "histogram": 0.3})
+    latest = context.market.values[-1]
+
+    assert latest[COLUMN_INDEX["rsi14"]] == 25.0
+    assert latest[COLUMN_INDEX["sma50"]] == 98.5
+    assert latest[COLUMN_INDEX["macd_histogram"]] == 0.3
+
+def test_missing_indicator_is_not_met():
+    assert compile_condition(RSI_BELOW_30).check(_context()) is None
+
+def test_invalid_parameters_compile_to_a_condition_that_is_never_met(capsys):
+    """
+    Tests that parameters are validated once at compile time: an AND rule
+    with an invalid condition is dropped, an OR rule keeps its valid ones.
+    """
+    # ARRANGE
+    invalid = _condition("PRICE_VS_SMA", period=13, operator="cross_above")
+
+    # ACT
+    and_rule = compile_rule(_rule("AND", RSI_BELOW_30, invalid))
+    or_rule = compile_rule(_rule("OR", RSI_BELOW_30, invalid))
+
+    # ASSERT
+    assert and_rule is None
+    assert [compiled.condition for compiled in or_rule.conditions] == [RSI_BELOW_30]
+    assert "'period' must be one of 7, 20, 50, 200" in capsys.readouterr().out
+
+def test_and_and_or_short_circuit():
+    # ARRANGE
+    context = _context(rsi14=25.0)
+    never_checked = _condition("RSI_LEVEL", period=14, operator="above", threshold=20)
+    checked = []
+
+    def check(compiled, context):
+        checked.append(compiled.condition)
+        return compiled.check(context)
+
+    # ACT
+    or_met = compile_rule(_rule("OR", RSI_BELOW_30, never_checked)).evaluate(context, check)
+    checked_by_or, checked[:] = list(checked), []
+    and_met = compile_rule(_rule("AND", _condition("RSI_LEVEL", period=14, operator="above", threshold=70), never_checked)).evaluate(context, check)
+
+    # ASSERT
+    assert [actual for _, actual in or_met] == [25.0]
+    assert checked_by_or == [RSI_BELOW_30]
+    assert and_met is None
+    assert len(checked) == 1
+
+def test_compiled_rule_sets_are_cached_until_modified():
+    # ARRANGE
+    clear_compiled_rule_sets()
+    modified_at = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    rule_set = RuleSetDB(ruleSetId=uuid4(), userId="user-1", parentId=uuid4(), parentType="PORTFOLIO", rules=[_rule("AND", RSI_BELOW_30)], modifiedAt=modified_at)
+    edited = rule_set.model_copy(update={"modifiedAt": modified_at + timedelta(minutes=1), "rules": []})
+
+    # ACT
+    first = compile_rule_set(rule_set)
+    again = compile_rule_set(rule_set.model_copy())
+    after_edit = compile_rule_set(edited)
+
+    # ASSERT
+    assert again is first
+    assert len(first.rules) == 1
+    assert after_edit.rules == ()
@@ -0,0 +1,114 @@
+import pytest
+from uuid import uuid4
+from datetime import datetime, timezone
+from firebase_admin import firestore
+
+from src.api.models import RuleSetSource
+from src.core.internal_models import HoldingDB
+from src.services.rule_set_service import RuleSetService
+
+# --- Fixtures ---
+
+@pytest.fixture(scope="function")
+def rule_set_service(async_db_client: firestore.AsyncClient) -> RuleSetService:
+    return RuleSetService(async_db_client)
+
+def _seed_portfolio(db_client: firestore.Client, user_id: str, rule_set_id: str = None) -> str:
+    portfolio_id = str(uuid4())
+    db_client.collection("portfolios").document(portfolio_id).set({"portfolioId": portfolio_id, "userId": user_id, "name": "Test", "ruleSetId": rule_set_id})
+    return portfolio_id
+
+def _seed_rule_set(db_client: firestore.Client, user_id: str, parent_id: str, parent_type: str = "PORTFOLIO") -> str:
+    rule_set_id = str(uuid4())
+    db_client.collection("rulesets").document(rule_set_id).set({
+        "ruleSetId": rule_set_id, "userId": user_id, "parentId": parent_id, "parentType": parent_type, "rules": [],
+        "createdAt": datetime.now(timezone.utc), "modifiedAt": datetime.now(timezone.utc),
+    })
+    return rule_set_id
+
+def _holding(user_id: str, portfolio_id: str, rule_set_id: str = None) -> HoldingDB:
+    return HoldingDB(
+        holdingId=uuid4(), portfolioId=portfolio_id, userId=user_id, ticker="AAPL", securityType="STOCK",
+        assetClass="EQUITY", currency="USD", ruleSetId=rule_set_id, lots=[],
+    )
+
+# --- Unit Tests for RuleSetService ---
+
+async def test_effective_rule_sets_are_resolved_in_bulk(rule_set_service: RuleSetService, db_client: firestore.Client):
+    """
+    Tests R_2000 for many holdings at once: a holding's own rule set wins,
+    otherwise its portfolio's applies, otherwise none.
+    """
+    # ARRANGE
+    with_rules = _seed_portfolio(db_client, "user-1")
+    portfolio_rule_set = _seed_rule_set(db_client, "user-1", with_rules)
+    db_client.collection("portfolios").document(with_rules).update({"ruleSetId": portfolio_rule_set})
+    without_rules = _seed_portfolio(db_client, "user-2")
+    holding_rule_set = _seed_rule_set(db_client, "user-1", str(uuid4()), parent_type="HOLDING")
+    specific = _holding("user-1", with_rules, holding_rule_set)
+    inherited = _holding("user-1", with_rules)
+    uncovered = _holding("user-2", without_rules)
+
+    # ACT
+    resolver = await rule_set_service.load_effective_rule_sets()
+
+    # ASSERT
+    assert resolver.resolve(specific)[1] == RuleSetSource.SPECIFIC
+    assert resolver.resolve(inherited)[1] == RuleSetSource.INHERITED
+    assert resolver.resolve(uncovered) == (None, None)
+    resolved = resolver.resolve_all([specific, inherited, uncovered])
+    assert {holding_id: str(rule_set.ruleSetId) for holding_id, rule_set in resolved.items()} == {
+        str(specific.holdingId): holding_rule_set,
+        str(inherited.holdingId): portfolio_rule_set,
+    }
+
+async def test_user_resolver_only_sees_the_users_rule_sets(rule_set_service: RuleSetService, db_client: firestore.Client):
+    # ARRANGE
+    own_portfolio = _seed_portfolio(db_client, "user-1")
+    _seed_portfolio(db_client, "user-2")
+    other_rule_set = _seed_rule_set(db_client, "user-2", str(uuid4()))
+
+    # ACT
+    resolver = await rule_set_service.load_effective_rule_sets("user-1")
+
+    # ASSERT
+    assert set(resolver.portfolio_rule_sets) == {own_portfolio}
+    assert resolver.resolve(_holding("user-1", own_portfolio, other_rule_set)) == (None, None)
+
+async def test_cached_resolver_is_reloaded_for_a_rule_set_it_does_not_know(rule_set_service: RuleSetService, db_client: firestore.Client):
+    # ARRANGE
+    portfolio_id = _seed_portfolio(db_client, "user-1")
+    await rule_set_service.get_effective_rule_sets("user-1")
+    new_rule_set = _seed_rule_set(db_client, "user-1", str(uuid4()), parent_type="HOLDING")
+
+    # ACT
+    rule_set, source = await rule_set_service.get_effective_rule_set("user-1", _holding("user-1", portfolio_id, new_rule_set))
+
+    # ASSERT
+    assert str(rule_set.ruleSetId) == new_rule_set
+    assert source == RuleSetSource.SPECIFIC
+
+async def test_unknown_rule_set_reloads_the_resolver_only_once(rule_set_service: RuleSetService, db_client: firestore.Client, monkeypatch):
+    """
+    Tests that a holding referring to a deleted rule set does not reload the
+    cached resolver on every request.
+    """
+    # ARRANGE
+    user_id = f"user-{uuid4()}"
+    portfolio_id = _seed_portfolio(db_client, user_id)
+    holding = _holding(user_id, portfolio_id, str(uuid4()))
+    loads = []
+    load = rule_set_service.load_effective_rule_sets
+
+    async def counting_load(user_id=None):
+        loads.append(user_id)
+        return await load(user_id)
+    monkeypatch.setattr(rule_set_service, "load_effective_rule_sets", counting_load)
+
+    # ACT
+    results = [await rule_set_service.get_effective_rule_set(user_id, holding) for _ in range(3)]
+
+    # ASSERT
+    assert results == [(None, None)] * 3
+    # The first load fills the cache; the unknown ID reloads it once.
+    assert len(loads) == 2
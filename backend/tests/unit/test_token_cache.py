@@ -0,0 +1,132 @@
+import time
+import pytest
+
+from src.core.cache import TTLCache
+from src.core import token_verification
+
+# --- Fixtures ---
+
+class FakeClock:
+    """A controllable clock for expiry tests."""
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture(scope="function")
+def clock() -> FakeClock:
+    return FakeClock()
+
+@pytest.fixture(scope="function")
+def verifier_calls(monkeypatch) -> list:
+    """
+    Switches token verification to a non-test environment and records every
+    call that reaches the Admin SDK.
+    """
+    calls = []
+
+    def fake_verify_id_token(token):
+        calls.append(token)
+        return {"uid": f"uid-{token}", "email": f"{token}@example.com", "exp": time.time() + 600}
+
+    monkeypatch.setenv("ENV", "dev")
+    monkeypatch.setattr(token_verification.auth, "verify_id_token", fake_verify_id_token)
+    token_verification.clear_token_cache()
+    yield calls
+    token_verification.clear_token_cache()
+
+# --- Unit Tests for TTLCache ---
+
+def test_ttl_cache_hit_and_miss_counters(clock: FakeClock):
+    """
+    Tests that hits and misses are counted.
+    """
+    # ARRANGE
+    cache = TTLCache(maxsize=2, ttl_seconds=60, clock=clock)
+    cache.set("a", 1)
+
+    # ACT
+    hit = cache.get("a")
+    miss = cache.get("b")
+
+    # ASSERT
+    assert hit == 1
+    assert miss is None
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+
+def test_ttl_cache_evicts_least_recently_used(clock: FakeClock):
+    """
+    Tests that the least recently used entry is evicted when the cache is full.
+    """
+    # ARRANGE
+    cache = TTLCache(maxsize=2, ttl_seconds=60, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # 'b' is now the least recently used entry
+
+    # ACT
+    cache.set("c", 3)
+
+    # ASSERT
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats().evictions == 1
+
+def test_ttl_cache_entry_expires_at_explicit_expiry(clock: FakeClock):
+    """
+    Tests that an explicit expiry earlier than the TTL is honoured.
+    """
+    # ARRANGE
+    cache = TTLCache(maxsize=10, ttl_seconds=3600, clock=clock)
+    cache.set("token", {"uid": "u1"}, expires_at=clock.now + 10)
+
+    # ACT
+    clock.now += 11
+
+    # ASSERT
+    assert cache.get("token") is None
+    assert len(cache) == 0
+
+def test_ttl_cache_ignores_already_expired_entries(clock: FakeClock):
+    """
+    Tests that entries which are already expired are not stored.
+    """
+    cache = TTLCache(maxsize=10, ttl_seconds=60, clock=clock)
+    cache.set("token", "value", expires_at=clock.now - 1)
+    assert len(cache) == 0
+
+# --- Unit Tests for verify_id_token ---
+
+def test_verify_id_token_is_cached(verifier_calls: list):
+    """
+    Tests that a token is verified by the Admin SDK only once.
+    """
+    # ACT
+    first = token_verification.verify_id_token("token-1")
+    second = token_verification.verify_id_token("token-1")
+
+    # ASSERT
+    assert first == second
+    assert verifier_calls == ["token-1"]
+    stats = token_verification.get_token_cache_stats()
+    assert stats.hits == 1
+    assert stats.misses == 1
+
+def test_verify_id_token_caches_per_token(verifier_calls: list):
+    """
+    Tests that different tokens are verified independently.
+    """
+    token_verification.verify_id_token("token-1")
+    token_verification.verify_id_token("token-2")
+    assert verifier_calls == ["token-1", "token-2"]
+
+def test_verify_id_token_in_test_env_returns_mock_token(monkeypatch):
+    """
+    Tests that in the test environment the token is treated as a raw UID.
+    """
+    monkeypatch.setenv("ENV", "test")
+    decoded = token_verification.verify_id_token("some-uid")
+    assert decoded == {"uid": "some-uid", "email": "some-uid@example.com"}
@@ -0,0 +1,63 @@
+import pytest
+from firebase_admin import firestore
+
+from src.core.unit_of_work import UnitOfWork, unit_of_work
+
+# --- Unit Tests for UnitOfWork ---
+
+async def test_writes_are_applied_together_on_exit(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that staged writes are invisible until the unit of work commits.
+    """
+    # ARRANGE
+    first_ref = async_db_client.collection("uowTest").document("first")
+    second_ref = async_db_client.collection("uowTest").document("second")
+
+    # ACT
+    async with unit_of_work(async_db_client) as work:
+        work.set(first_ref, {"value": 1})
+        work.set(second_ref, {"value": 2})
+        assert not db_client.collection("uowTest").document("first").get().exists
+        assert len(work) == 2
+
+    # ASSERT
+    assert work.committed
+    assert db_client.collection("uowTest").document("first").get().to_dict() == {"value": 1}
+    assert db_client.collection("uowTest").document("second").get().to_dict() == {"value": 2}
+
+async def test_nothing_is_written_when_the_block_raises(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that an exception inside the block discards all staged writes.
+    """
+    # ARRANGE
+    doc_ref = async_db_client.collection("uowTest").document("doomed")
+    callbacks = []
+
+    # ACT
+    with pytest.raises(RuntimeError):
+        async with unit_of_work(async_db_client) as work:
+            work.set(doc_ref, {"value": 1})
+            work.after_commit(lambda: callbacks.append("called"))
+            raise RuntimeError("boom")
+
+    # ASSERT
+    assert not db_client.collection("uowTest").document("doomed").get().exists
+    assert callbacks == []
+
+async def test_nested_block_joins_the_outer_unit(async_db_client: firestore.AsyncClient, db_client: firestore.Client):
+    """
+    Tests that passing an existing unit of work defers the commit to its owner.
+    """
+    # ARRANGE
+    doc_ref = async_db_client.collection("uowTest").document("joined")
+    outer = UnitOfWork(async_db_client)
+
+    # ACT
+    async with unit_of_work(async_db_client, outer) as inner:
+        inner.set(doc_ref, {"value": 1})
+
+    # ASSERT
+    assert inner is outer
+    assert not db_client.collection("uowTest").document("joined").get().exists
+    await outer.commit()
+    assert db_client.collection("uowTest").document("joined").get().exists
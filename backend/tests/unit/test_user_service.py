@@ -11,15 +11,15 @@ from src.core.internal_models import UserDB, NotificationChannel
 
 # --- Fixtures for Service-Level Testing ---
 
-@pytest.fixture(scope="module")
-def portfolio_service(db_client: firestore.Client) -> PortfolioService:
+@pytest.fixture(scope="function")
+def portfolio_service(async_db_client: firestore.AsyncClient) -> PortfolioService:
     """Provides an instance of the PortfolioService for use in tests."""
-    return PortfolioService(db_client)
+    return PortfolioService(async_db_client)
 
-@pytest.fixture(scope="module")
-def user_service(db_client: firestore.Client, portfolio_service: PortfolioService) -> UserService:
+@pytest.fixture(scope="function")
+def user_service(async_db_client: firestore.AsyncClient, portfolio_service: PortfolioService) -> UserService:
     """Provides an instance of the UserService for testing."""
-    return UserService(db_client, portfolio_service)
+    return UserService(async_db_client, portfolio_service)
 
 @pytest.fixture(scope="function")
 def created_user(db_client: firestore.Client) -> dict:
@@ -63,7 +63,7 @@ def created_user(db_client: firestore.Client) -> dict:
 
 # --- Unit Tests for UserService ---
 
-def test_get_user_by_uid_success(user_service: UserService, created_user: dict):
+async def test_get_user_by_uid_success(user_service: UserService, created_user: dict):
     """
     Tests that a user can be successfully retrieved by their UID.
     """
@@ -71,7 +71,7 @@ def test_get_user_by_uid_success(user_service: UserService, created_user: dict):
     user_id = created_user["uid"]
 
     # ACT: Call the service method directly.
-    retrieved_user = user_service.get_user_by_uid(user_id)
+    retrieved_user = await user_service.get_user_by_uid(user_id)
 
     # ASSERT: Check that the returned object is correct.
     assert retrieved_user is not None
@@ -79,7 +79,7 @@ def test_get_user_by_uid_success(user_service: UserService, created_user: dict):
     assert retrieved_user.uid == user_id
     assert retrieved_user.email == created_user["email"]
 
-def test_get_user_by_uid_not_found(user_service: UserService):
+async def test_get_user_by_uid_not_found(user_service: UserService):
     """
     Tests that get_user_by_uid returns None for a non-existent user.
     """
@@ -87,12 +87,12 @@ def test_get_user_by_uid_not_found(user_service: UserService):
     non_existent_uid = "i-do-not-exist"
 
     # ACT: Call the service method.
-    retrieved_user = user_service.get_user_by_uid(non_existent_uid)
+    retrieved_user = await user_service.get_user_by_uid(non_existent_uid)
 
     # ASSERT: Check that the result is None.
     assert retrieved_user is None
 
-def test_update_user_settings_success(user_service: UserService, db_client: firestore.Client, created_user: dict):
+async def test_update_user_settings_success(user_service: UserService, db_client: firestore.Client, created_user: dict):
     """
     Tests that user settings can be successfully updated.
     """
@@ -115,7 +115,7 @@ def test_update_user_settings_success(user_service: UserService, db_client: fire
     }
 
     # ACT: Call the service method to update the user.
-    updated_user = user_service.update_user_settings(user_id, update_data)
+    updated_user = await user_service.update_user_settings(user_id, update_data)
 
     # ASSERT:
     # 1. Check the returned UserDB object.
@@ -131,7 +131,7 @@ def test_update_user_settings_success(user_service: UserService, db_client: fire
     assert user_doc.to_dict()["defaultPortfolioId"] == str(new_portfolio_id)
     assert user_doc.to_dict()["modifiedAt"] > created_user["modifiedAt"]
 
-def test_update_user_settings_invalid_portfolio(user_service: UserService, created_user: dict):
+async def test_update_user_settings_invalid_portfolio(user_service: UserService, created_user: dict):
     """
     Tests that the service raises a ValueError if the user tries to set a
     default portfolio that does not exist.
@@ -143,6 +143,60 @@ def test_update_user_settings_invalid_portfolio(user_service: UserService, creat
 
     # ACT & ASSERT: Use pytest.raises to confirm that the expected exception is thrown.
     with pytest.raises(ValueError, match="Invalid default portfolio specified"):
-        user_service.update_user_settings(user_id, update_data)
+        await user_service.update_user_settings(user_id, update_data)
         
-        
\ No newline at end of file
+        
+async def test_get_user_by_uid_is_cached_within_service(user_service: UserService, db_client: firestore.Client, created_user: dict):
+    """
+    Tests that repeated reads through the same service do not hit Firestore again.
+    """
+    # ARRANGE
+    user_id = created_user["uid"]
+    first = await user_service.get_user_by_uid(user_id)
+
+    # ACT: Change the document behind the service's back.
+    db_client.collection("users").document(user_id).update({"username": "Changed Directly"})
+    second = await user_service.get_user_by_uid(user_id)
+
+    # ASSERT
+    assert second.username == first.username == "Service Test User"
+
+async def test_update_user_settings_invalidates_cached_user(user_service: UserService, portfolio_service: PortfolioService, db_client: firestore.Client, async_db_client: firestore.AsyncClient, created_user: dict):
+    """
+    Tests that a settings update is visible to subsequent reads, including
+    reads through a different service instance.
+    """
+    # ARRANGE
+    user_id = created_user["uid"]
+    assert await user_service.get_user_by_uid(user_id) is not None
+    new_portfolio_id = uuid4()
+    db_client.collection("portfolios").document(str(new_portfolio_id)).set({
+        "portfolioId": str(new_portfolio_id),
+        "userId": user_id,
+        "name": "Another Portfolio",
+    })
+
+    # ACT
+    await user_service.update_user_settings(user_id, {"defaultPortfolioId": new_portfolio_id})
+
+    # ASSERT
+    assert (await user_service.get_user_by_uid(user_id)).defaultPortfolioId == new_portfolio_id
+    other_service = UserService(async_db_client, portfolio_service)
+    assert (await other_service.get_user_by_uid(user_id)).defaultPortfolioId == new_portfolio_id
+
+async def test_update_user_settings_returns_changes_the_user_cache_has_not_seen(user_service: UserService, db_client: firestore.Client, created_user: dict):
+    """
+    Tests that the updated user is built from the stored document, not from a
+    cached copy that another instance's write has made stale.
+    """
+    # ARRANGE
+    user_id = created_user["uid"]
+    await user_service.get_user_by_uid(user_id)
+    db_client.collection("users").document(user_id).update({"username": "Renamed Elsewhere"})
+
+    # ACT
+    updated_user = await user_service.update_user_settings(user_id, {"notificationPreferences": ["PUSH"]})
+
+    # ASSERT
+    assert updated_user.username == "Renamed Elsewhere"
+    assert updated_user.notificationPreferences == [NotificationChannel.PUSH]
@@ -0,0 +1,87 @@
+import math
+import pytest
+from uuid import uuid4
+from datetime import date, datetime, timezone
+
+from src.core.config_models import TaxConfig
+from src.core.internal_models import HoldingDB, LotDB
+from src.core.model_mappers import holding_db_to_holding, lot_book_to_holding_summary_list
+from src.core.valuation import LotBook
+
+DAY = date(2025, 6, 30)
+TAX_CONFIG = TaxConfig(**{
+    "EQUITY": [{"description": "Flat rate.", "taxRate": 25.0}],
+    "CRYPTO": [{"description": "Tax-free after a year.", "taxRate": 0, "condition": "holdingDurationDays > 365"}, {"description": "Flat rate.", "taxRate": 25.0}],
+    "COMMODITY": [],
+})
+
+# --- Fixtures ---
+
+def _lot(purchased: date, quantity: float, price: float) -> LotDB:
+    return LotDB(lotId=uuid4(), purchaseDate=datetime(purchased.year, purchased.month, purchased.day, tzinfo=timezone.utc), quantity=quantity, purchasePrice=price)
+
+def _holding(portfolio_id: str, ticker: str, asset_class: str, lots: list) -> HoldingDB:
+    return HoldingDB(
+        holdingId=uuid4(), portfolioId=portfolio_id, userId="user-1", ticker=ticker, securityType="STOCK",
+        assetClass=asset_class, currency="EUR", lots=lots,
+    )
+
+def _scalar_valuation(holding: HoldingDB, price: float) -> tuple:
+    """The per-lot loop the engine replaces, as a reference."""
+    cost = value = tax = 0.0
+    for lot in holding.lots:
+        lot_cost, lot_value = lot.quantity * lot.purchasePrice, lot.quantity * price
+        cost, value = cost + lot_cost, value + lot_value
+        if lot_value > lot_cost:
+            tax += (lot_value - lot_cost) * TAX_CONFIG.tax_rate(holding.assetClass, (DAY - lot.purchaseDate.date()).days) / 100
+    return cost, value, tax
+
+# --- Unit Tests for LotBook ---
+
+def test_lots_holdings_and_portfolios_match_a_per_lot_calculation():
+    # ARRANGE
+    first, second = str(uuid4()), str(uuid4())
+    holdings = [
+        _holding(first, "AAPL", "EQUITY", [_lot(date(2024, 1, 2), 10, 150.0), _lot(date(2025, 3, 3), 5, 250.0)]),
+        _holding(first, "BTC", "CRYPTO", [_lot(date(2023, 5, 1), 0.5, 20000.0), _lot(date(2025, 5, 1), 0.1, 50000.0)]),
+        _holding(second, "AAPL", "EQUITY", []),
+        _holding(second, "GLD", "COMMODITY", [_lot(date(2024, 6, 3), 3, 180.0)]),
+    ]
+    prices = {"AAPL": 200.0, "BTC": 60000.0, "GLD": 210.0}
+    book = LotBook(holdings)
+
+    # ACT
+    valued = book.value(prices, DAY, TAX_CONFIG)
+
+    # ASSERT
+    assert book.portfolio_ids == [first, second]
+    for index, holding in enumerate(holdings):
+        cost, value, tax = _scalar_valuation(holding, prices[holding.ticker])
+        valuation = valued.holding(index)
+        assert (valuation.totalCost, valuation.currentValue, valuation.capitalGainTax) == pytest.approx((cost, value, tax))
+    # The old crypto lot is tax-free, the recent one taxed; commodities have no rules.
+    assert valued.lot_tax[book.lot_rows(1)[0]] == 0.0
+    assert valued.lot_tax[book.lot_rows(1)[1]] == pytest.approx(0.1 * 10000.0 * 0.25)
+    assert valued.portfolio(0).currentValue == pytest.approx(10 * 200.0 + 5 * 200.0 + 0.6 * 60000.0)
+    assert valued.portfolio(1).totalCost == pytest.approx(540.0)
+
+def test_holding_without_a_price_is_unpriced_and_so_is_its_portfolio():
+    # ARRANGE
+    portfolio_id = str(uuid4())
+    holdings = [
+        _holding(portfolio_id, "AAPL", "EQUITY", [_lot(date(2024, 1, 2), 10, 150.0)]),
+        _holding(portfolio_id, "NEW", "EQUITY", [_lot(date(2024, 1, 2), 1, 10.0)]),
+    ]
+    book = LotBook(holdings)
+
+    # ACT
+    valued = book.value({"AAPL": 200.0}, DAY, TAX_CONFIG)
+    holding = holding_db_to_holding(book, valued, 1)
+    summaries = lot_book_to_holding_summary_list(book, valued)
+
+    # ASSERT
+    assert valued.holding_priced.tolist() == [True, False]
+    assert math.isnan(valued.portfolio(0).currentValue)
+    assert holding.lots[0].computedInfo is None
+    assert holding_db_to_holding(book, valued, 0).lots[0].computedInfo.afterTaxProfit == pytest.approx(500.0 * 0.75)
+    assert (summaries[1].totalCost, summaries[1].currentValue) == (10.0, 10.0)
@@ -1,5 +1,4 @@
 import asyncio
-import httpx
 import sys
 import os
 
@@ -8,56 +7,36 @@ backend_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'ba
 sys.path.insert(0, backend_root)
 
 from src.settings import settings
+from src.services.market_data_service import alpha_vantage_service
 
 # --- Configuration ---
 API_KEY = settings.ALPHA_VANTAGE_API_KEY
-BASE_URL = "https://www.alphavantage.co/query"
 TICKER = "GOOGL"
 VIX_PROXY_TICKER = "VIXY"
 
 # --- DEPRECATION NOTICE ---
 # The Sentinel backend no longer fetches individual technical indicators directly
 # from the Alpha Vantage API. Instead, it fetches only the raw daily OHLCV data
-# and calculates all required indicators internally using the 'finta' library.
+# and calculates all required indicators internally with its vectorized
+# indicator engine (backend/src/services/market_data_service/indicators.py).
 #
 # This script has been updated to reflect this change. It now only tests the
 # basic API connectivity and the fetching of the TIME_SERIES_DAILY function,
 # which is the only function the backend relies on. The previous functions for
 # fetching SMA, VWMA, RSI, etc., have been removed as they are obsolete.
-
-async def fetch_alpha_vantage(params: dict):
-    """A helper function to make requests to the Alpha Vantage API."""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(BASE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            # The free tier has a strict rate limit, check for the note
-            if "Note" in data:
-                print(f"API Rate Limit Note: {data['Note']}")
-            return data
-    except httpx.HTTPStatusError as e:
-        return {"Error": f"HTTP error occurred: {e}"}
-    except Exception as e:
-        return {"Error": f"An unexpected error occurred: {e}"}
+# Requests go through the backend's shared, rate-limited client.
 
 async def get_ohlc(ticker: str):
     """Fetches the latest daily Open, High, Low, Close data."""
     print(f"--- Fetching Daily OHLC for {ticker} ---")
-    params = {
-        "function": "TIME_SERIES_DAILY",
-        "symbol": ticker,
-        "apikey": API_KEY,
-        "outputsize": "compact"
-    }
-    data = await fetch_alpha_vantage(params)
-    if "Time Series (Daily)" in data:
-        latest_date = next(iter(data["Time Series (Daily)"]))
-        print("Successfully fetched latest data point:")
-        print(data["Time Series (Daily)"][latest_date])
-    else:
+    try:
+        series = await alpha_vantage_service.fetch_daily_series(ticker, outputsize="compact")
+    except alpha_vantage_service.MarketDataError as e:
         print("Failed to fetch data:")
-        print(data)
+        print(e)
+        return
+    print("Successfully fetched latest data point:")
+    print(series.iloc[-1].to_dict())
 
 async def main():
     """Runs the updated API test call."""
@@ -74,6 +53,7 @@ async def main():
     
     await get_ohlc(VIX_PROXY_TICKER)
     
+    await alpha_vantage_service.close_client()
     print("Test complete.")
 
 if __name__ == "__main__":
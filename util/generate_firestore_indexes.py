@@ -0,0 +1,29 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+from src.core.query_catalog import QUERY_CATALOG, firestore_indexes_document  # noqa: E402
+
+def generate_firestore_indexes():
+    """
+    Generates firestore.indexes.json from the query catalog in
+    backend/src/core/query_catalog.py.
+    """
+    indexes_path = ROOT_DIR / "firestore.indexes.json"
+    document = firestore_indexes_document()
+
+    for spec in QUERY_CATALOG:
+        index = spec.required_index()
+        fields = ", ".join(f"{field['fieldPath']} {field['order']}" for field in index["fields"]) if index else "single-field indexes"
+        print(f"  {spec.name} ({spec.collection}): {fields}")
+
+    with open(indexes_path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+    print(f"\nSuccessfully wrote {len(document['indexes'])} composite indexes to: {indexes_path}")
+
+if __name__ == "__main__":
+    generate_firestore_indexes()